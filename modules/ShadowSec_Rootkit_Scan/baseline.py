@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ShadowSec Rootkit Scan — baseline incremental de hashes (SQLite)
+
+Autor: Luciano Valadão
+
+Objetivo:
+Guardar SHA-256 de binários críticos entre execuções, indexado pelo caminho canônico
+(realpath) e pela tupla de stat (inode, tamanho, mtime_ns, ctime_ns). Só arquivos cuja
+tupla mudou são re-hasheados; o restante é conferido direto no banco. O resultado é um
+relatório de drift (novo / alterado / removido) em vez de uma simples lista de hashes.
+Os nomes pelos quais o arquivo é alcançado (symlinks, /bin → /usr/bin) ficam guardados
+como aliases, só como informação: um symlink novo nunca "toma" a linha de um binário.
+"""
+import os
+import stat
+import hashlib
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+BUF_SIZE = 1024 * 1024  # leitura em blocos de 1 MiB
+
+# Primeiro local gravável vence (root → /var/lib; usuário comum → ao lado do script)
+DB_PATHS = [
+    "/var/lib/shadowsec/rtk_baseline.db",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "rtk_baseline.db"),
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path     TEXT PRIMARY KEY,
+    ino      INTEGER NOT NULL,
+    size     INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    ctime_ns INTEGER NOT NULL,
+    sha256   TEXT NOT NULL,
+    aliases  TEXT NOT NULL DEFAULT ''
+)
+"""
+
+
+def open_db(path=None):
+    candidates = [path] if path else DB_PATHS
+    for p in candidates:
+        try:
+            os.makedirs(os.path.dirname(p) or ".", exist_ok=True)
+            conn = sqlite3.connect(p)
+            conn.execute(SCHEMA)
+            if "aliases" not in [r[1] for r in conn.execute("PRAGMA table_info(files)")]:
+                _migrate_realpath(conn)
+            return conn
+        except (OSError, sqlite3.Error):
+            continue
+    raise OSError("Nenhum local gravável para o banco de baseline")
+
+
+def _migrate_realpath(conn):
+    """Bancos antigos eram indexados pelo nome do alias: re-indexa cada linha pelo realpath."""
+    with conn:
+        conn.execute("ALTER TABLE files ADD COLUMN aliases TEXT NOT NULL DEFAULT ''")
+        rows = [r[0] for r in conn.execute("SELECT path FROM files")]
+        present = set(rows)
+        for path in rows:
+            real = os.path.realpath(path)
+            if real == path:
+                conn.execute("UPDATE files SET aliases = ? WHERE path = ?", (path, path))
+            elif real in present:
+                conn.execute("DELETE FROM files WHERE path = ?", (path,))
+            else:
+                conn.execute("UPDATE files SET path = ?, aliases = ? WHERE path = ?", (real, path, path))
+                present.add(real)
+
+
+def sha256_file(path):
+    """SHA-256 em processo, com buffer reaproveitado (hashlib libera o GIL em blocos grandes)."""
+    h = hashlib.sha256()
+    buf = bytearray(BUF_SIZE)
+    view = memoryview(buf)
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            h.update(view[:n])
+    return h.hexdigest()
+
+
+def expand_targets(files=(), dirs=()):
+    """
+    {caminho canônico (realpath): [aliases]} dos alvos, seguindo symlinks.
+    Aliases em ordem determinística: arquivos explícitos primeiro, depois cada diretório em
+    ordem alfabética. A identidade no baseline é sempre o caminho canônico.
+    """
+    out = {}
+
+    def add(path):
+        names = out.setdefault(os.path.realpath(path), [])
+        if path not in names:
+            names.append(path)
+
+    for p in files:
+        add(p)
+    for d in dirs:
+        try:
+            with os.scandir(d) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError:
+            continue
+        for e in entries:
+            add(e.path)
+    return out
+
+
+def scan(paths, scope_dirs=(), db_path=None, workers=None, accept=False):
+    """
+    Compara `paths` com o baseline. paths: saída de expand_targets() ou lista de caminhos
+    (agrupada pelo realpath do mesmo jeito).
+    Arquivos novos entram no baseline automaticamente; alterados e removidos só são
+    aceitos com accept=True (caso contrário continuam sendo reportados a cada scan).
+    scope_dirs: diretórios varridos — entradas do baseline neles (pelo caminho canônico ou
+    por algum alias) que não estão em `paths` contam como removidas.
+    Todos os caminhos do resultado são canônicos; "aliases" mapeia cada um aos seus nomes.
+    Retorna dict com listas: new, modified, missing, unchanged, errors
+    - new:       (path, sha256)
+    - modified:  (path, sha256_antigo, sha256_atual)  → conteúdo mudou
+    - missing:   path presente no baseline mas ausente no disco
+    - unchanged: path
+    - errors:    (path, mensagem)
+    """
+    conn = open_db(db_path)
+    known = {row[0]: row[1:] for row in conn.execute(
+        "SELECT path, ino, size, mtime_ns, ctime_ns, sha256, aliases FROM files")}
+
+    targets = paths if isinstance(paths, dict) else expand_targets(paths)
+    result = {"new": [], "modified": [], "missing": [], "unchanged": [], "errors": [], "rehashed": 0,
+              "aliases": {}}
+    to_hash = []
+    scope = {os.path.abspath(d) for d in scope_dirs} | {os.path.realpath(d) for d in scope_dirs}
+    for p, old in known.items():
+        names = [p] + [a for a in old[5].split("\n") if a]
+        if p not in targets and any(os.path.dirname(n) in scope for n in names):
+            result["missing"].append(p)
+            result["aliases"][p] = names[1:]
+    relabel = []
+    for p, names in targets.items():
+        result["aliases"][p] = names
+        aliases = "\n".join(names)
+        if p in known and known[p][5] != aliases:
+            relabel.append((aliases, p))
+        try:
+            st = os.stat(p)
+        except FileNotFoundError:
+            if p in known:
+                result["missing"].append(p)
+            continue
+        except OSError as e:
+            result["errors"].append((p, str(e)))
+            continue
+        if not stat.S_ISREG(st.st_mode):
+            continue
+        key = (st.st_ino, st.st_size, st.st_mtime_ns, st.st_ctime_ns)
+        old = known.get(p)
+        if old is not None and tuple(old[:4]) == key:
+            result["unchanged"].append(p)
+        else:
+            to_hash.append((p, key))
+
+    def _hash(item):
+        p, key = item
+        try:
+            return p, key, sha256_file(p), None
+        except OSError as e:
+            return p, key, None, str(e)
+
+    rows = []
+    with ThreadPoolExecutor(max_workers=workers or min(8, os.cpu_count() or 2)) as pool:
+        for p, key, digest, err in pool.map(_hash, to_hash):
+            if err:
+                result["errors"].append((p, err))
+                continue
+            result["rehashed"] += 1
+            old = known.get(p)
+            if old is None:
+                result["new"].append((p, digest))
+            elif old[4] != digest:
+                result["modified"].append((p, old[4], digest))
+                if not accept:
+                    continue
+            else:
+                # só metadados mudaram (ex.: touch, reinstalação idêntica)
+                result["unchanged"].append(p)
+            rows.append((p, *key, digest, "\n".join(targets[p])))
+
+    with conn:
+        conn.executemany("UPDATE files SET aliases = ? WHERE path = ?", relabel)
+        conn.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        if accept:
+            conn.executemany("DELETE FROM files WHERE path = ?", [(p,) for p in result["missing"]])
+    conn.close()
+    return result
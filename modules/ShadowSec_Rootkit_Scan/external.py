@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ShadowSec Rootkit Scan — execução gerenciada de scanners externos (rkhunter, chkrootkit)
+
+Autor: Luciano Valadão
+
+Objetivo:
+Rodar scanners externos como subprocessos gerenciados:
+- orçamento de tempo (wall-clock) por scanner
+- cada scanner em seu próprio grupo de processos → ao estourar o tempo, o grupo
+  inteiro recebe SIGTERM e, após uma tolerância, SIGKILL
+- saída capturada linha a linha (vai para o relatório, não só para o terminal)
+- código de saída e duração registrados
+- scanners independentes rodam em paralelo
+"""
+import os
+import time
+import shutil
+import signal
+import threading
+import subprocess
+from collections import namedtuple
+
+SCANNERS = {
+    "rkhunter": ["rkhunter", "--check", "--sk", "--cronjob"],
+    "chkrootkit": ["chkrootkit"],
+}
+
+DEFAULT_BUDGET = float(os.environ.get("SHADOWSEC_RTK_EXTERNAL_TIMEOUT", 1800))
+KILL_GRACE = 5.0  # segundos entre SIGTERM e SIGKILL
+
+ScanRun = namedtuple("ScanRun", "name argv returncode duration_s timed_out output")
+
+
+def _kill_group(proc):
+    for sig in (signal.SIGTERM, signal.SIGKILL):
+        try:
+            os.killpg(proc.pid, sig)
+        except OSError:
+            return
+        try:
+            proc.wait(timeout=KILL_GRACE)
+            return
+        except subprocess.TimeoutExpired:
+            continue
+
+
+def run_managed(name, argv, budget=DEFAULT_BUDGET, on_line=None):
+    """
+    Executa argv com orçamento de `budget` segundos (None = sem limite).
+    on_line(name, linha) é chamado para cada linha de saída assim que ela chega.
+    """
+    t0 = time.monotonic()
+    lines = []
+    try:
+        proc = subprocess.Popen(argv, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                stdin=subprocess.DEVNULL, text=True, errors="replace",
+                                start_new_session=True)
+    except OSError as e:
+        return ScanRun(name, argv, None, 0.0, False, f"falha ao iniciar: {e}")
+
+    def reader():
+        for line in proc.stdout:
+            line = line.rstrip("\n")
+            lines.append(line)
+            if on_line:
+                on_line(name, line)
+
+    t = threading.Thread(target=reader, daemon=True)
+    t.start()
+    timed_out = False
+    try:
+        proc.wait(timeout=budget)
+    except subprocess.TimeoutExpired:
+        timed_out = True
+        _kill_group(proc)
+    # descendentes podem manter o pipe aberto mesmo após o kill → espera limitada
+    t.join(timeout=KILL_GRACE)
+    return ScanRun(name, argv, proc.returncode, round(time.monotonic() - t0, 2), timed_out, "\n".join(lines))
+
+
+def available():
+    """Scanners instalados: {nome: argv}."""
+    return {n: argv for n, argv in SCANNERS.items() if shutil.which(argv[0])}
+
+
+def run_all(budget=DEFAULT_BUDGET, on_line=None, scanners=None):
+    """Executa os scanners disponíveis em paralelo. Retorna lista de ScanRun na ordem de SCANNERS."""
+    scanners = available() if scanners is None else scanners
+    results = {}
+
+    def worker(n, argv):
+        results[n] = run_managed(n, argv, budget, on_line)
+
+    threads = [threading.Thread(target=worker, args=(n, a), daemon=True) for n, a in scanners.items()]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return [results[n] for n in scanners if n in results]
+
+
+def suspicious_lines(run):
+    """Linhas relevantes da saída: INFECTED (chkrootkit) e Warning (rkhunter)."""
+    out = []
+    for line in run.output.splitlines():
+        low = line.lower()
+        if "infected" in low and "not infected" not in low:
+            out.append(("critical", line.strip()))
+        elif low.startswith("warning:"):
+            out.append(("high", line.strip()))
+    return out
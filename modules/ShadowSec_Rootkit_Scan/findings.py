@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ShadowSec Rootkit Scan — achados estruturados (NDJSON)
+
+Autor: Luciano Valadão
+
+Objetivo:
+Permitir que cada checagem, além do texto do relatório humano, emita achados tipados
+(checagem, severidade, PID/caminho/porta, evidência). O escalonador coleta os achados
+de cada checagem e o NdjsonWriter grava uma linha JSON por achado, mais uma linha de
+resumo por checagem com a duração em ms — pronto para ingestão em SIEM sem regex.
+
+Dentro de uma checagem:
+    findings.emit("high", "binário deletado em execução", pid=123, path="/tmp/x")
+"""
+import json
+import socket
+import threading
+from datetime import datetime, timezone
+
+SEVERITIES = ("info", "low", "medium", "high", "critical")
+
+_local = threading.local()
+
+
+def begin(check_id):
+    """Inicia a coleta para a checagem executando no thread atual."""
+    _local.check = check_id
+    _local.items = []
+
+
+def end():
+    """Encerra a coleta e devolve os achados da checagem."""
+    items = getattr(_local, "items", None) or []
+    _local.check = None
+    _local.items = None
+    return items
+
+
+def emit(severity, evidence, pid=None, path=None, port=None, **extra):
+    """Registra um achado para a checagem corrente (ignorado fora de uma coleta)."""
+    if severity not in SEVERITIES:
+        raise ValueError(f"Severidade inválida: {severity}")
+    items = getattr(_local, "items", None)
+    if items is None:
+        return
+    item = {
+        "check": _local.check,
+        "severity": severity,
+        "pid": pid,
+        "path": path,
+        "port": port,
+        "evidence": evidence,
+    }
+    item.update(extra)
+    items.append(item)
+
+
+class NdjsonWriter:
+    """Uma linha JSON por achado + uma linha 'check' por checagem concluída."""
+
+    def __init__(self, path):
+        self.path = path
+        self.host = socket.gethostname()
+        self.scan_id = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        self.fh = open(path, "w", encoding="utf-8")
+
+    def _line(self, obj):
+        obj = {"host": self.host, "scan_id": self.scan_id, **obj}
+        self.fh.write(json.dumps(obj, ensure_ascii=False, default=str) + "\n")
+
+    def write_check(self, check_id, items, duration_ms, status="ok"):
+        ts = datetime.now(timezone.utc).isoformat()
+        for it in items:
+            self._line({"type": "finding", "ts": ts, "duration_ms": duration_ms, **it})
+        self._line({"type": "check", "ts": ts, "check": check_id, "status": status,
+                    "duration_ms": duration_ms, "findings": len(items)})
+        self.fh.flush()
+
+    def close(self):
+        self.fh.close()
+        return self.path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ShadowSec Rootkit Scan — execução em frota (vários hosts em paralelo)
+
+Autor: Luciano Valadão
+
+Objetivo:
+Enviar o scanner para uma lista de hosts, executá-lo em paralelo e reunir os resultados:
+- o scanner (rtk.py + módulos irmãos, toolkit/ e data_signatures/) é empacotado UMA vez
+  em um tar.gz em memória e enviado pela stdin da sessão — nada precisa estar instalado
+  no host além de python3, tar e sh
+- transporte SSH com ControlMaster (uma conexão TCP/autenticação por host, reaproveitada
+  entre a checagem prévia e o scan) ou transporte local via subprocesso (testes/lab)
+- concorrência limitada por um pool de threads (--jobs)
+- RAW/READABLE/FINDINGS de cada host voltam em um tar pela stdout e são extraídos em
+  <saída>/<host>/
+- relatório agregado ranqueando os hosts por achados (critical > high > medium > low)
+  e um NDJSON único com o campo "fleet_host" em cada linha
+
+Uso:
+    python3 fleet.py hosts.txt --mode quick --jobs 16 --sudo
+    python3 fleet.py --hosts localhost --transport local --mode quick
+"""
+import os
+import io
+import sys
+import json
+import time
+import shlex
+import shutil
+import tarfile
+import argparse
+import tempfile
+import subprocess
+from collections import namedtuple, Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+R = "\033[31m"
+G = "\033[32m"
+Y = "\033[33m"
+C = "\033[36m"
+RESET = "\033[0m"
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(os.path.dirname(HERE))
+RTK_REL = os.path.relpath(os.path.join(HERE, "rtk.py"), REPO_ROOT)
+
+# Conteúdo do pacote enviado aos hosts (relativo à raiz do repositório)
+PAYLOAD_DIRS = [os.path.relpath(HERE, REPO_ROOT), "toolkit", "data_signatures"]
+PAYLOAD_SKIP = ("__pycache__", ".db", ".json", ".pyc")
+
+DEFAULT_JOBS = int(os.environ.get("SHADOWSEC_FLEET_JOBS", 8))
+DEFAULT_HOST_TIMEOUT = float(os.environ.get("SHADOWSEC_FLEET_TIMEOUT", 3600))
+SCAN_MODES = ("quick", "full", "ghost")  # mesmos modos do rtk.py (MODES)
+SSH_OPTIONS = ["-o", "BatchMode=yes", "-o", "ConnectTimeout=10", "-o", "StrictHostKeyChecking=accept-new"]
+
+# Códigos de saída do script remoto (além dos do rtk.py: 0, 2, 3, 64)
+RC_NO_PYTHON = 90
+RC_BAD_PAYLOAD = 91
+
+HostResult = namedtuple("HostResult", "host returncode duration_s files counts error")
+
+SEVERITY_ORDER = ("critical", "high", "medium", "low", "info")
+
+
+# ========================= PACOTE =========================
+def build_payload():
+    """tar.gz (bytes) com o scanner e suas dependências, preservando a estrutura do repositório."""
+    def clean(info):
+        if any(s in info.name for s in PAYLOAD_SKIP):
+            return None
+        info.uid = info.gid = 0
+        info.uname = info.gname = "root"
+        return info
+
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w:gz") as tar:
+        for rel in PAYLOAD_DIRS:
+            tar.add(os.path.join(REPO_ROOT, rel), arcname=rel, filter=clean)
+    return buf.getvalue()
+
+
+def remote_script(scan_args, sudo=False):
+    """Script sh executado no host: extrai o pacote, roda o scan e devolve as saídas em tar pela stdout."""
+    rtk_cmd = f'python3 "$d/{RTK_REL}" ' + " ".join(shlex.quote(a) for a in scan_args)
+    script = (
+        f"command -v python3 >/dev/null 2>&1 || exit {RC_NO_PYTHON}\n"
+        "d=$(mktemp -d /tmp/shadowsec_fleet.XXXXXX) || exit 1\n"
+        "trap 'rm -rf \"$d\"' EXIT\n"
+        f"tar xzf - -C \"$d\" || exit {RC_BAD_PAYLOAD}\n"
+        "mkdir -p \"$d/out\"\n"
+        f"{rtk_cmd} --output-dir \"$d/out\" --format all > \"$d/out/console.log\" 2>&1\n"
+        "rc=$?\n"
+        "tar czf - -C \"$d/out\" .\n"
+        "exit $rc\n"
+    )
+    if sudo:
+        return f"sudo -n sh -c {shlex.quote(script)}"
+    return f"sh -c {shlex.quote(script)}"
+
+
+# ========================= TRANSPORTES =========================
+class LocalTransport:
+    """Executa o script no próprio host via subprocesso (substituto do SSH em testes)."""
+
+    name = "local"
+
+    def connect(self, host):
+        return None
+
+    def command(self, host, script):
+        return ["sh", "-c", script]
+
+    def close(self, hosts):
+        pass
+
+
+class SshTransport:
+    """SSH com ControlMaster: a primeira sessão abre a conexão mestre e as seguintes a reutilizam."""
+
+    name = "ssh"
+
+    def __init__(self, extra_options=()):
+        self.control_dir = tempfile.mkdtemp(prefix="shadowsec_ssh_")
+        self.options = SSH_OPTIONS + [
+            "-o", "ControlMaster=auto",
+            "-o", f"ControlPath={self.control_dir}/%C",
+            "-o", "ControlPersist=120",
+        ] + list(extra_options)
+
+    def connect(self, host):
+        """Abre a conexão mestre em segundo plano. Retorna None ou a mensagem de erro."""
+        # -f deixa o mestre vivo após o retorno; stdout/stderr não podem ser pipes, senão
+        # quem lê esperaria o EOF até o ControlPersist expirar
+        with tempfile.TemporaryFile() as err:
+            try:
+                rc = subprocess.run(["ssh"] + self.options + ["-M", "-N", "-f", "--", host],
+                                    stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                    stderr=err, timeout=60).returncode
+            except subprocess.TimeoutExpired:
+                return "tempo esgotado ao conectar"
+            if rc == 0:
+                return None
+            err.seek(0)
+            return err.read().decode(errors="replace").strip() or f"ssh falhou (código {rc})"
+
+    def command(self, host, script):
+        return ["ssh"] + self.options + ["--", host, script]
+
+    def close(self, hosts):
+        for host in hosts:
+            subprocess.run(["ssh"] + self.options + ["-O", "exit", "--", host],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        shutil.rmtree(self.control_dir, ignore_errors=True)
+
+
+# ========================= EXECUÇÃO POR HOST =========================
+def _safe_extract(data, dest):
+    """Extrai o tar devolvido pelo host recusando caminhos absolutos, '..' e não-arquivos."""
+    files = []
+    with tarfile.open(fileobj=io.BytesIO(data), mode="r:gz") as tar:
+        for m in tar.getmembers():
+            name = os.path.normpath(m.name)
+            if name == ".":
+                continue
+            if not m.isfile() or name.startswith(("/", "..")):
+                continue
+            m.name = name
+            tar.extract(m, dest)
+            files.append(os.path.join(dest, name))
+    return sorted(files)
+
+
+def count_findings(files):
+    """Conta achados por severidade nos NDJSON do host."""
+    counts = Counter()
+    for path in files:
+        if not path.endswith("_FINDINGS.ndjson"):
+            continue
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    obj = json.loads(line)
+                except ValueError:
+                    continue
+                if obj.get("type") == "finding":
+                    counts[obj.get("severity", "info")] += 1
+    return dict(counts)
+
+
+def scan_host(host, transport, payload, scan_args, output_dir, sudo=False, timeout=DEFAULT_HOST_TIMEOUT):
+    """Executa o scan em um host e extrai as saídas em output_dir/<host>/. Retorna HostResult."""
+    t0 = time.monotonic()
+    dest = os.path.join(output_dir, host.replace("/", "_"))
+
+    def result(rc, files=(), counts=None, error=None):
+        return HostResult(host, rc, round(time.monotonic() - t0, 2), list(files), counts or {}, error)
+
+    err = transport.connect(host)
+    if err:
+        return result(None, error=f"sem acesso: {err}")
+    # checagem prévia pela conexão já aberta
+    try:
+        pre = subprocess.run(transport.command(host, "command -v python3 >/dev/null && command -v tar >/dev/null"),
+                             stdin=subprocess.DEVNULL, capture_output=True, timeout=60)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        return result(None, error=f"sem acesso: {e}")
+    if pre.returncode != 0:
+        err = pre.stderr.decode(errors="replace").strip() or "python3/tar ausentes"
+        return result(pre.returncode, error=err)
+
+    try:
+        proc = subprocess.run(transport.command(host, remote_script(scan_args, sudo)),
+                              input=payload, capture_output=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return result(None, error=f"tempo esgotado ({timeout:g}s)")
+    except OSError as e:
+        return result(None, error=str(e))
+
+    if proc.returncode in (RC_NO_PYTHON, RC_BAD_PAYLOAD, 1, 255) or not proc.stdout:
+        err = proc.stderr.decode(errors="replace").strip() or f"código de saída {proc.returncode}"
+        return result(proc.returncode, error=err)
+    os.makedirs(dest, exist_ok=True)
+    try:
+        files = _safe_extract(proc.stdout, dest)
+    except (tarfile.TarError, OSError) as e:
+        return result(proc.returncode, error=f"saída inválida: {e}")
+    # sem NDJSON não há como afirmar que o host está limpo
+    if not any(f.endswith("_FINDINGS.ndjson") for f in files):
+        err = proc.stderr.decode(errors="replace").strip().splitlines()
+        return result(proc.returncode, files,
+                      error=f"nenhum FINDINGS.ndjson gerado{': ' + err[-1] if err else ''}")
+    return result(proc.returncode, files, count_findings(files))
+
+
+def run_fleet(hosts, transport, scan_args, output_dir, jobs=DEFAULT_JOBS, sudo=False,
+              timeout=DEFAULT_HOST_TIMEOUT, on_done=None):
+    """Escaneia `hosts` com no máximo `jobs` sessões simultâneas. Retorna lista de HostResult."""
+    payload = build_payload()
+    results = []
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+            futures = [pool.submit(scan_host, h, transport, payload, scan_args, output_dir, sudo, timeout)
+                       for h in hosts]
+            for fut in as_completed(futures):
+                res = fut.result()
+                results.append(res)
+                if on_done:
+                    on_done(res)
+    finally:
+        transport.close(hosts)
+    return results
+
+
+# ========================= AGREGAÇÃO =========================
+def rank_key(res):
+    """Hosts com erro primeiro, depois por quantidade de achados em ordem de severidade."""
+    return (res.error is None, tuple(-res.counts.get(s, 0) for s in SEVERITY_ORDER), res.host)
+
+
+def write_aggregate(results, output_dir):
+    """Gera fleet_<ts>_REPORT.txt e fleet_<ts>_FINDINGS.ndjson. Retorna (relatório, ndjson)."""
+    base = os.path.join(output_dir, f"fleet_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}")
+    report_path, nd_path = f"{base}_REPORT.txt", f"{base}_FINDINGS.ndjson"
+    ranked = sorted(results, key=rank_key)
+
+    with open(nd_path, "w", encoding="utf-8") as nd:
+        for res in ranked:
+            for path in res.files:
+                if path.endswith("_FINDINGS.ndjson"):
+                    with open(path, encoding="utf-8") as f:
+                        for line in f:
+                            try:
+                                obj = json.loads(line)
+                            except ValueError:
+                                continue  # linha truncada/lixo de um host não derruba o agregado
+                            nd.write(json.dumps({"fleet_host": res.host, **obj}, ensure_ascii=False) + "\n")
+
+    with open(report_path, "w", encoding="utf-8") as out:
+        out.write("========= SHADOWSEC ROOTKIT SCAN — FROTA =========\n\n")
+        out.write(f"Hosts: {len(results)} | com erro: {sum(1 for r in results if r.error)}\n\n")
+        out.write(f"{'#':>3}  {'HOST':<32} {'CRIT':>5} {'HIGH':>5} {'MED':>5} {'LOW':>5} {'RC':>4} {'TEMPO':>8}  STATUS\n")
+        for i, res in enumerate(ranked, 1):
+            c = res.counts
+            status = f"ERRO: {res.error}" if res.error else "ok"
+            rc = "-" if res.returncode is None else res.returncode
+            out.write(f"{i:>3}  {res.host:<32} {c.get('critical', 0):>5} {c.get('high', 0):>5} "
+                      f"{c.get('medium', 0):>5} {c.get('low', 0):>5} {rc:>4} {res.duration_s:>7}s  {status}\n")
+
+        for res in ranked:
+            if res.error or not (res.counts.get("critical") or res.counts.get("high")):
+                continue
+            out.write(f"\n===== {res.host} =====\n")
+            for path in res.files:
+                if not path.endswith("_FINDINGS.ndjson"):
+                    continue
+                with open(path, encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            obj = json.loads(line)
+                        except ValueError:
+                            continue
+                        if obj.get("type") == "finding" and obj.get("severity") in ("critical", "high"):
+                            out.write(f"[{obj['severity'].upper()}] {obj.get('check')}: {obj.get('evidence')}\n")
+            out.write(f"Relatórios: {os.path.dirname(res.files[0]) if res.files else '-'}\n")
+    return report_path, nd_path
+
+
+# ========================= CLI =========================
+def read_hosts(path):
+    """Um host por linha (user@host aceito); linhas vazias e comentários (#) ignorados."""
+    with open(path) as f:
+        return [line.split("#", 1)[0].strip() for line in f if line.split("#", 1)[0].strip()]
+
+
+def check_host(host):
+    """Recusa hosts que o ssh leria como opção (ex.: "-oProxyCommand=...")."""
+    if host.startswith("-") or any(c.isspace() for c in host):
+        raise ValueError(f"host inválido: {host!r}")
+    return host
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="ShadowSec Rootkit Scan em vários hosts.")
+    parser.add_argument("hosts_file", nargs="?", help="Arquivo com um host por linha.")
+    parser.add_argument("--hosts", help="Hosts separados por vírgula (alternativa ao arquivo).")
+    parser.add_argument("--mode", choices=SCAN_MODES,
+                        help="Modo do rtk.py (quick, full, ghost). Padrão: quick, se --checks não for informado.")
+    parser.add_argument("--checks", metavar="LISTA", help="Checagens do rtk.py separadas por vírgula.")
+    parser.add_argument("--timeout", type=float, metavar="SEG", help="--timeout repassado ao rtk.py (por checagem).")
+    parser.add_argument("--host-timeout", type=float, default=DEFAULT_HOST_TIMEOUT,
+                        help="Tempo limite total por host, em segundos.")
+    parser.add_argument("--jobs", type=int, default=DEFAULT_JOBS, help="Hosts escaneados simultaneamente.")
+    parser.add_argument("--output-dir", default="fleet_reports", help="Diretório das saídas agregadas.")
+    parser.add_argument("--transport", choices=("ssh", "local"), default="ssh",
+                        help="ssh (padrão) ou local (executa no próprio host, para testes).")
+    parser.add_argument("--sudo", action="store_true", help="Executa o scan remoto com sudo -n.")
+    parser.add_argument("--ssh-option", action="append", default=[], metavar="OPT",
+                        help="Opção extra do ssh (ex.: --ssh-option=-p2222). Pode repetir.")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    hosts = []
+    if args.hosts_file:
+        hosts += read_hosts(args.hosts_file)
+    if args.hosts:
+        hosts += [h.strip() for h in args.hosts.split(",") if h.strip()]
+    hosts = list(dict.fromkeys(hosts))
+    try:
+        hosts = [check_host(h) for h in hosts]
+    except ValueError as e:
+        print(f"{R}[!] {e}{RESET}", file=sys.stderr)
+        return 64
+    if not hosts:
+        print(f"{R}[!] Nenhum host informado.{RESET}", file=sys.stderr)
+        return 64
+
+    scan_args = ["--mode", args.mode or "quick"] if args.mode or not args.checks else []
+    if args.checks:
+        scan_args += ["--checks", args.checks]
+    if args.timeout:
+        scan_args += ["--timeout", str(args.timeout)]
+
+    transport = LocalTransport() if args.transport == "local" else SshTransport(args.ssh_option)
+    os.makedirs(args.output_dir, exist_ok=True)
+    print(f"{C}[+] {len(hosts)} hosts | {args.jobs} simultâneos | transporte {transport.name}{RESET}")
+
+    def on_done(res):
+        if res.error:
+            print(f"{R}[✗] {res.host}: {res.error}{RESET}")
+        else:
+            c = res.counts
+            color = R if c.get("critical") or c.get("high") else G
+            print(f"{color}[✓] {res.host}: critical={c.get('critical', 0)} high={c.get('high', 0)} "
+                  f"medium={c.get('medium', 0)} ({res.duration_s}s){RESET}")
+
+    results = run_fleet(hosts, transport, scan_args, args.output_dir, args.jobs, args.sudo,
+                        args.host_timeout, on_done)
+    report, nd = write_aggregate(results, args.output_dir)
+    print(f"\n{G}[✓] Relatório agregado:{RESET}\n → {report}\n → {nd}")
+    if any(r.error for r in results):
+        return 3
+    if any(r.counts.get("critical") or r.counts.get("high") for r in results):
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
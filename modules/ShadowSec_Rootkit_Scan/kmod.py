@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ShadowSec Rootkit Scan — inspeção de módulos do kernel (LKM)
+
+Autor: Luciano Valadão
+
+Objetivo:
+Cruzar três visões independentes dos módulos carregados:
+- /proc/modules            (o que o lsmod mostra)
+- /sys/module/<nome>       (kobjects; módulos carregáveis têm o arquivo `initstate`)
+- /proc/kallsyms           (dono "[módulo]" de cada símbolo)
+
+Um módulo que aparece em /sys/module ou possui símbolos em /proc/kallsyms mas some
+de /proc/modules foi removido da lista encadeada — técnica clássica de ocultação de
+LKM (Diamorphine, Reptile, ...). Os nomes são comparados com as assinaturas de
+data_signatures/lkm_signatures.dat via Aho-Corasick, e os resultados ficam em cache
+por (nome, endereço de carga, tamanho) entre execuções.
+"""
+import os
+import json
+from collections import namedtuple
+
+import signatures
+
+PROC_MODULES = "/proc/modules"
+SYS_MODULE = "/sys/module"
+KALLSYMS = "/proc/kallsyms"
+
+CACHE_PATHS = [
+    "/var/cache/shadowsec/rtk_kmod_cache.json",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "rtk_kmod_cache.json"),
+]
+
+ModRecord = namedtuple("ModRecord", "name size refcnt deps state address")
+
+
+# ========================= FONTES =========================
+def read_proc_modules(path=PROC_MODULES):
+    """{nome: ModRecord}; None se o kernel não expõe /proc/modules (kernel sem módulos)."""
+    try:
+        with open(path) as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return None
+    mods = {}
+    for line in lines:
+        cols = line.split()
+        if len(cols) < 6:
+            continue
+        deps = tuple(d for d in cols[3].split(",") if d and d != "-")
+        mods[cols[0]] = ModRecord(cols[0], int(cols[1]), int(cols[2]), deps, cols[4], cols[5])
+    return mods
+
+
+def read_sys_modules(path=SYS_MODULE):
+    """
+    Módulos carregáveis vistos em /sys/module: {nome: {"initstate", "taint", "coresize"}}.
+    Built-ins (sem `initstate`) são ignorados.
+    """
+    mods = {}
+    try:
+        entries = os.listdir(path)
+    except OSError:
+        return mods
+    for name in entries:
+        base = os.path.join(path, name)
+        info = {}
+        for attr in ("initstate", "taint", "coresize"):
+            try:
+                with open(os.path.join(base, attr)) as f:
+                    info[attr] = f.read().strip()
+            except OSError:
+                info[attr] = None
+        if info["initstate"] is not None:
+            mods[name] = info
+    return mods
+
+
+def read_kallsyms_owners(path=KALLSYMS):
+    """Nomes de módulos donos de símbolos em /proc/kallsyms (linhas terminadas em [módulo])."""
+    owners = set()
+    try:
+        with open(path) as f:
+            for line in f:
+                if line.endswith("]\n"):
+                    owners.add(line[line.rfind("[") + 1:-2])
+    except OSError:
+        pass
+    # alguns kernels anotam símbolos de BPF/ftrace/kprobes como pseudo-módulos
+    # ([bpf], [__builtin__ftrace], [__builtin__kprobes], ...) — não são módulos carregados
+    owners.discard("bpf")
+    return {o for o in owners if not o.startswith("__builtin__")}
+
+
+# ========================= CACHE =========================
+def _load_cache(sig_hash):
+    for p in CACHE_PATHS:
+        try:
+            with open(p) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if data.get("signatures") == sig_hash:
+            return data.get("entries", {})
+        return {}
+    return {}
+
+
+def _save_cache(sig_hash, entries):
+    data = {"signatures": sig_hash, "entries": entries}
+    for p in CACHE_PATHS:
+        try:
+            os.makedirs(os.path.dirname(p), exist_ok=True)
+            with open(p, "w") as f:
+                json.dump(data, f)
+            return
+        except OSError:
+            continue
+
+
+def _norm(name):
+    # /sys/module e kallsyms usam '_' onde o nome do arquivo .ko pode ter '-'
+    return name.replace("-", "_")
+
+
+# ========================= INSPEÇÃO =========================
+def inspect(proc_path=PROC_MODULES, sys_path=SYS_MODULE, kallsyms_path=KALLSYMS,
+            sig_path=signatures.LKM_SIGNATURES, use_cache=True):
+    """
+    Retorna dict:
+    - modular:   False se o kernel não tem suporte a módulos (/proc/modules ausente)
+    - modules:   {nome: ModRecord} de /proc/modules
+    - matches:   {nome: [(substring, descrição)]} de qualquer uma das três fontes
+    - hidden_sys:      em /sys/module mas não em /proc/modules
+    - hidden_kallsyms: com símbolos em kallsyms mas não em /proc/modules
+    - unlisted_sys:    em /proc/modules mas sem kobject em /sys/module
+    - tainted:   {nome: flags} (O = fora da árvore, E = não assinado, ...)
+    """
+    automaton, sig_hash = signatures.load_lkm_signatures(sig_path)
+    proc_mods = read_proc_modules(proc_path)
+    sys_mods = read_sys_modules(sys_path)
+    owners = read_kallsyms_owners(kallsyms_path)
+
+    listed = {_norm(n) for n in (proc_mods or {})}
+    result = {
+        "modular": proc_mods is not None,
+        "modules": proc_mods or {},
+        "matches": {},
+        "hidden_sys": set(),
+        "hidden_kallsyms": set(),
+        "unlisted_sys": set(),
+        "tainted": {n: i["taint"] for n, i in sys_mods.items() if i["taint"]},
+    }
+    if proc_mods is not None:
+        result["hidden_sys"] = {n for n in sys_mods if _norm(n) not in listed}
+        result["hidden_kallsyms"] = {n for n in owners if _norm(n) not in listed}
+        in_sys = {_norm(n) for n in sys_mods}
+        result["unlisted_sys"] = {n for n in proc_mods if _norm(n) not in in_sys}
+
+    cache = _load_cache(sig_hash) if use_cache else {}
+    fresh = {}
+    for name in set(proc_mods or {}) | set(sys_mods) | owners:
+        rec = (proc_mods or {}).get(name)
+        key = f"{name}@{rec.address}:{rec.size}" if rec else f"{name}@?"
+        hits = cache.get(key)
+        if hits is None:
+            hits = signatures.search(automaton, name.lower())
+        fresh[key] = hits
+        if hits:
+            result["matches"][name] = [tuple(h) for h in hits]
+    if use_cache:
+        _save_cache(sig_hash, fresh)
+    return result
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ShadowSec Rootkit Scan — subsistema de persistência (systemd, cron, rc, preload)
+
+Autor: Luciano Valadão
+
+Objetivo:
+Percorrer com os.scandir os pontos clássicos de persistência e extrair as entradas
+que executam algo:
+- units do systemd (sistema e por usuário, para todos os homes): ExecStart*/ExecStop*,
+  Environment (LD_PRELOAD etc.)
+- cron: /etc/crontab, /etc/cron.d, cron.{hourly,daily,weekly,monthly}, spool dos usuários
+- /etc/ld.so.preload, /etc/environment, /etc/profile.d, /etc/rc.local
+
+Um índice de conteúdo persistido (JSON) guarda, por arquivo, (mtime_ns, tamanho) e as
+entradas extraídas. Scans seguintes só releem arquivos cujo mtime/tamanho mudou e
+reportam entradas novas, modificadas e removidas.
+"""
+import os
+import re
+import json
+import pwd
+import stat
+import threading
+
+SYSTEMD_SYSTEM_DIRS = [
+    "/etc/systemd/system",
+    "/run/systemd/system",
+    "/lib/systemd/system",
+    "/usr/lib/systemd/system",
+    "/usr/local/lib/systemd/system",
+]
+SYSTEMD_USER_DIRS = [
+    "/etc/systemd/user",
+    "/usr/lib/systemd/user",
+]
+USER_UNIT_SUBDIR = ".config/systemd/user"
+
+CRON_FILES = ["/etc/crontab", "/etc/anacrontab"]
+CRON_DIRS = [
+    "/etc/cron.d", "/etc/cron.hourly", "/etc/cron.daily", "/etc/cron.weekly", "/etc/cron.monthly",
+    "/var/spool/cron/crontabs", "/var/spool/cron",
+]
+RC_FILES = ["/etc/ld.so.preload", "/etc/environment", "/etc/profile", "/etc/bash.bashrc", "/etc/rc.local"]
+RC_DIRS = ["/etc/profile.d"]
+
+INDEX_PATHS = [
+    "/var/lib/shadowsec/rtk_persistence_index.json",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "rtk_persistence_index.json"),
+]
+
+UNIT_SUFFIXES = (".service", ".timer", ".socket", ".path", ".conf")
+UNIT_KEYS_RE = re.compile(r"^\s*(Exec\w*|Environment|EnvironmentFile)\s*=\s*(.*)$")
+CRON_ENTRY_RE = re.compile(r"^\s*(@\w+|[\d*/,\-]+\s+[\d*/,\-]+\s+[\d*/,\-]+\s+[\w*/,\-]+\s+[\w*/,\-]+)\s+(.+)$")
+PRELOAD_RE = re.compile(r"LD_PRELOAD|LD_LIBRARY_PATH|LD_AUDIT")
+
+MAX_FILE = 1024 * 1024  # ignora arquivos gigantes (não são configs legítimas)
+
+_lock = threading.Lock()
+_last = None
+
+
+# ========================= ALVOS =========================
+def _homes():
+    homes = set()
+    try:
+        for pw in pwd.getpwall():
+            if pw.pw_dir and pw.pw_dir not in ("/", "/nonexistent"):
+                homes.add(pw.pw_dir)
+    except OSError:
+        pass
+    return sorted(homes)
+
+
+def _walk(root, recursive=True):
+    """Arquivos regulares sob root (segue um nível de symlink, como o systemd)."""
+    stack = [root]
+    while stack:
+        d = stack.pop()
+        try:
+            it = os.scandir(d)
+        except OSError:
+            continue
+        with it:
+            for e in it:
+                try:
+                    if e.is_dir(follow_symlinks=False):
+                        if recursive:
+                            stack.append(e.path)
+                    elif e.is_file():
+                        yield e.path
+                    elif e.is_symlink():
+                        # unit mascarada (→ /dev/null) ou link para fora do diretório
+                        yield e.path
+                except OSError:
+                    continue
+
+
+def user_unit_dirs():
+    """Diretórios de units de usuário: globais + ~/.config/systemd/user de cada home do passwd."""
+    return SYSTEMD_USER_DIRS + [os.path.join(h, USER_UNIT_SUBDIR) for h in _homes()]
+
+
+def unit_files():
+    """{caminho: "systemd" | "systemd-user"} de todas as units (e drop-ins .conf)."""
+    out = {}
+    for d in SYSTEMD_SYSTEM_DIRS:
+        for p in _walk(d):
+            if p.endswith(UNIT_SUFFIXES):
+                out[p] = "systemd"
+    for d in user_unit_dirs():
+        for p in _walk(d):
+            if p.endswith(UNIT_SUFFIXES):
+                out[p] = "systemd-user"
+    return out
+
+
+def targets():
+    """{caminho: tipo} de todos os arquivos de persistência a indexar."""
+    out = unit_files()
+    for p in CRON_FILES:
+        if os.path.isfile(p):
+            out[p] = "cron"
+    for d in CRON_DIRS:
+        for p in _walk(d, recursive=False):
+            out[p] = "cron"
+    for p in RC_FILES:
+        if os.path.lexists(p):
+            out[p] = "rc"
+    for d in RC_DIRS:
+        for p in _walk(d, recursive=False):
+            out[p] = "rc"
+    return out
+
+
+# ========================= PARSERS =========================
+def parse_file(path, kind):
+    """Extrai as linhas relevantes de um arquivo. Retorna lista de strings."""
+    try:
+        st = os.lstat(path)
+        if stat.S_ISLNK(st.st_mode):
+            target = os.readlink(path)
+            if target == "/dev/null":
+                return ["(unit mascarada → /dev/null)"]
+            entries = [f"symlink → {target}"]
+            if not os.path.isfile(path):
+                return entries
+        else:
+            entries = []
+        with open(path, "rb") as f:
+            raw = f.read(MAX_FILE)
+    except OSError:
+        return []
+    text = raw.decode("utf-8", "replace")
+
+    if kind.startswith("systemd"):
+        for line in text.splitlines():
+            m = UNIT_KEYS_RE.match(line)
+            if m:
+                entries.append(f"{m.group(1)}={m.group(2).strip()}")
+    elif kind == "cron":
+        if path.startswith(tuple(CRON_DIRS[1:5])):
+            # cron.{hourly,...}: o próprio arquivo é o script executado
+            entries.append("script executado pelo run-parts")
+        for line in text.splitlines():
+            s = line.strip()
+            if not s or s.startswith("#"):
+                continue
+            if CRON_ENTRY_RE.match(s) or PRELOAD_RE.search(s):
+                entries.append(s)
+    else:
+        for line in text.splitlines():
+            s = line.strip()
+            if not s or s.startswith("#"):
+                continue
+            if path == "/etc/ld.so.preload" or PRELOAD_RE.search(s):
+                entries.append(s)
+            elif path == "/etc/rc.local" and s not in ("exit 0",) and not s.startswith("#!"):
+                entries.append(s)
+    return entries
+
+
+# ========================= ÍNDICE =========================
+def load_index():
+    for p in INDEX_PATHS:
+        try:
+            with open(p) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            continue
+    return {}
+
+
+def save_index(index):
+    for p in INDEX_PATHS:
+        try:
+            os.makedirs(os.path.dirname(p), exist_ok=True)
+            tmp = p + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(index, f)
+            os.replace(tmp, p)
+            return p
+        except OSError:
+            continue
+    return None
+
+
+def scan(index=None, save=True):
+    """
+    Atualiza o índice e devolve as diferenças:
+    {"new": [(path, kind, entries)], "modified": [(path, kind, added, removed)],
+     "removed": [(path, kind)], "entries": {path: (kind, entries)}, "reread": n, "first_run": bool,
+     "index": novo_índice}
+    save=False deixa a gravação para quem reportar as diferenças (ver get_scan).
+    """
+    old = load_index() if index is None else index
+    first_run = not old
+    new_index = {}
+    result = {"new": [], "modified": [], "removed": [], "entries": {}, "reread": 0, "first_run": first_run,
+              "index": new_index}
+
+    for path, kind in targets().items():
+        try:
+            st = os.lstat(path)
+        except OSError:
+            continue
+        key = [st.st_mtime_ns, st.st_size]
+        prev = old.get(path)
+        if prev and prev["key"] == key:
+            entries = prev["entries"]
+        else:
+            entries = parse_file(path, kind)
+            result["reread"] += 1
+            if prev is None:
+                if entries:
+                    result["new"].append((path, kind, entries))
+            elif entries != prev["entries"]:
+                added = [e for e in entries if e not in prev["entries"]]
+                removed = [e for e in prev["entries"] if e not in entries]
+                result["modified"].append((path, kind, added, removed))
+        new_index[path] = {"key": key, "kind": kind, "entries": entries}
+        if entries:
+            result["entries"][path] = (kind, entries)
+
+    for path, prev in old.items():
+        if path not in new_index and prev.get("entries"):
+            result["removed"].append((path, prev.get("kind", "?")))
+    if save:
+        save_index(new_index)
+    return result
+
+
+def preload_hooks(entries):
+    """Entradas que definem LD_PRELOAD/LD_AUDIT/etc. ou o próprio /etc/ld.so.preload."""
+    out = []
+    for path, (kind, items) in sorted(entries.items()):
+        for e in items:
+            if path == "/etc/ld.so.preload" or PRELOAD_RE.search(e):
+                out.append((path, e))
+    return out
+
+
+def get_scan(refresh=False, commit=False):
+    """
+    Resultado do scan compartilhado entre as checagens da mesma execução (thread-safe).
+    O índice só é gravado com commit=True, pela checagem que reporta as diferenças —
+    senão um `--checks ld_preload` absorveria alterações de systemd/cron sem reportá-las.
+    """
+    global _last
+    with _lock:
+        if _last is None or refresh:
+            _last = scan(save=False)
+        if commit and not _last.get("saved"):
+            save_index(_last["index"])
+            _last["saved"] = True
+        return _last
+
+
+def reset():
+    """Descarta o resultado em cache; chamado no início de cada scan (menu, watch)."""
+    global _last
+    with _lock:
+        _last = None
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ShadowSec Rootkit Scan — motor de snapshot de processos via /proc
+
+Autor: Luciano Valadão
+
+Objetivo:
+Ler a tabela de processos UMA única vez, direto de /proc/<pid>/{stat,status,exe,cmdline},
+sem depender de ps/awk/lsof. Todas as checagens de processos do rtk.py consultam o mesmo
+snapshot, evitando varrer a tabela várias vezes em hosts com dezenas de milhares de PIDs.
+
+Também lê a tabela de sockets de /proc/net/{tcp,tcp6,udp,udp6} e associa cada socket
+ao PID dono via /proc/*/fd em uma única passada (substitui `ss -p` / `lsof -i`).
+
+Uso isolado (comparação de tempo contra o caminho antigo via shell):
+    sudo python3 procfs.py --bench
+"""
+import os
+import re
+import pwd
+import time
+import socket
+import struct
+import threading
+import subprocess
+from collections import namedtuple
+from functools import lru_cache
+
+PROC = "/proc"
+
+# Registro compacto por PID (namedtuple → sem __dict__ por instância)
+ProcRecord = namedtuple("ProcRecord", "pid ppid uid user state comm exe deleted cmdline threads")
+
+# Mesmos padrões usados pelas antigas pipelines ps/awk/grep
+ROOT_SUSPICIOUS_RE = re.compile(r"/tmp|dev/shm|var.tmp|home/|cache/")
+SUSPICIOUS_DIRS_RE = re.compile(r"/tmp|/var/tmp|/dev/shm|\.cache|\.local|\.hidden|\.\.")
+
+_lock = threading.Lock()
+_snapshot = None
+
+
+@lru_cache(maxsize=None)
+def uid_to_user(uid):
+    try:
+        return pwd.getpwuid(uid).pw_name
+    except KeyError:
+        return str(uid)
+
+
+def _read(path, mode="r"):
+    try:
+        with open(path, mode) as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def read_process(pid):
+    """Lê um único PID de /proc. Retorna ProcRecord ou None se o processo sumiu."""
+    base = f"{PROC}/{pid}"
+    stat_raw = _read(f"{base}/stat")
+    if stat_raw is None:
+        return None
+    # comm pode conter espaços e parênteses → separa pelo último ')'
+    lpar = stat_raw.find("(")
+    rpar = stat_raw.rfind(")")
+    comm = stat_raw[lpar + 1:rpar]
+    fields = stat_raw[rpar + 2:].split()
+    state = fields[0] if fields else "?"
+    ppid = int(fields[1]) if len(fields) > 1 else 0
+
+    uid = -1
+    status = _read(f"{base}/status")
+    if status:
+        for line in status.splitlines():
+            if line.startswith("Uid:"):
+                uid = int(line.split()[1])
+                break
+
+    try:
+        exe = os.readlink(f"{base}/exe")
+    except OSError:
+        exe = ""
+    deleted = exe.endswith(" (deleted)")
+
+    raw_cmd = _read(f"{base}/cmdline", "rb") or b""
+    cmdline = raw_cmd.rstrip(b"\0").replace(b"\0", b" ").decode("utf-8", "replace")
+
+    try:
+        threads = tuple(int(t) for t in os.listdir(f"{base}/task") if t != str(pid))
+    except OSError:
+        threads = ()
+
+    return ProcRecord(pid, ppid, uid, uid_to_user(uid) if uid >= 0 else "?",
+                      state, comm, exe, deleted, cmdline, threads)
+
+
+def take_snapshot():
+    """Percorre /proc uma vez e retorna {pid: ProcRecord}."""
+    procs = {}
+    for entry in os.listdir(PROC):
+        if not entry.isdigit():
+            continue
+        rec = read_process(int(entry))
+        if rec is not None:
+            procs[rec.pid] = rec
+    return procs
+
+
+def get_snapshot(refresh=False):
+    """Snapshot compartilhado entre as checagens (thread-safe)."""
+    global _snapshot
+    with _lock:
+        if _snapshot is None or refresh:
+            _snapshot = take_snapshot()
+        return _snapshot
+
+
+def invalidate():
+    """Descarta o snapshot atual; o próximo get_snapshot() relê /proc."""
+    global _snapshot
+    with _lock:
+        _snapshot = None
+
+
+def format_record(rec):
+    """Linha no estilo 'ps' para o relatório."""
+    cmd = rec.cmdline or f"[{rec.comm}]"
+    exe = f" exe={rec.exe}" if rec.exe else ""
+    return f"{rec.user:<10} {rec.pid:>7} {rec.ppid:>7} {rec.state} {cmd}{exe}"
+
+
+# ========================= CONSULTAS =========================
+def _target(rec):
+    return rec.exe or rec.cmdline.split(" ", 1)[0]
+
+
+def root_suspicious(procs):
+    return [r for r in procs.values() if r.uid == 0 and ROOT_SUSPICIOUS_RE.search(_target(r))]
+
+
+def suspicious_dirs(procs):
+    return [r for r in procs.values()
+            if SUSPICIOUS_DIRS_RE.search(r.exe) or SUSPICIOUS_DIRS_RE.search(r.cmdline)]
+
+
+def deleted_binaries(procs):
+    return [r for r in procs.values() if r.deleted]
+
+
+def _pid_max():
+    try:
+        return int(_read(f"{PROC}/sys/kernel/pid_max").strip())
+    except (AttributeError, ValueError):
+        return 32768
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+
+def _is_thread(pid):
+    status = _read(f"{PROC}/{pid}/status")
+    if not status:
+        return False
+    for line in status.splitlines():
+        if line.startswith("Tgid:"):
+            return int(line.split()[1]) != pid
+    return False
+
+
+def hidden_processes(procs, brute_force=True):
+    """
+    Cruza fontes independentes da tabela de processos:
+    - PIDs referenciados como PPid mas ausentes da listagem de /proc
+    - (brute_force) PIDs que respondem a kill(pid, 0) mas não aparecem em /proc
+    Candidatos são reconfirmados contra uma nova listagem para evitar falsos positivos
+    causados por processos que nasceram/morreram durante a varredura.
+    Retorna {"ppid_orphans": set, "kill_probe": set}.
+    """
+    listed = set(procs)
+    known = set(listed)
+    for rec in procs.values():
+        known.update(rec.threads)
+
+    orphans = {r.ppid for r in procs.values() if r.ppid > 0} - known
+
+    probed = set()
+    if brute_force:
+        for pid in range(1, _pid_max() + 1):
+            if pid not in known and _pid_alive(pid):
+                probed.add(pid)
+
+    candidates = orphans | probed
+    if candidates:
+        fresh = {int(p) for p in os.listdir(PROC) if p.isdigit()}
+        confirmed = {p for p in candidates
+                     if p not in fresh and _pid_alive(p) and not _is_thread(p)}
+        orphans &= confirmed
+        probed &= confirmed
+    return {"ppid_orphans": orphans, "kill_probe": probed}
+
+
+# ========================= SOCKETS (/proc/net) =========================
+SockRecord = namedtuple("SockRecord", "proto local_ip port remote_ip remote_port state uid inode")
+
+TCP_LISTEN = "0A"
+UDP_UNCONN = "07"
+
+
+def _decode_addr(hexaddr):
+    ip_hex, port_hex = hexaddr.split(":")
+    raw = bytes.fromhex(ip_hex)
+    if len(raw) == 4:
+        ip = socket.inet_ntop(socket.AF_INET, raw[::-1])
+    else:
+        # IPv6: quatro palavras de 32 bits, cada uma em ordem do host (little-endian)
+        words = struct.unpack("<4I", raw)
+        ip = socket.inet_ntop(socket.AF_INET6, struct.pack(">4I", *words))
+    return ip, int(port_hex, 16)
+
+
+def read_sockets(protos=("tcp", "tcp6", "udp", "udp6"), net_dir=f"{PROC}/net"):
+    """Lê as tabelas de sockets do kernel. Retorna lista de SockRecord."""
+    out = []
+    for proto in protos:
+        try:
+            with open(os.path.join(net_dir, proto)) as f:
+                next(f, None)  # cabeçalho
+                for line in f:
+                    cols = line.split()
+                    if len(cols) < 10:
+                        continue
+                    lip, lport = _decode_addr(cols[1])
+                    rip, rport = _decode_addr(cols[2])
+                    out.append(SockRecord(proto, lip, lport, rip, rport, cols[3], int(cols[7]), int(cols[9])))
+        except OSError:
+            continue
+    return out
+
+
+def listening_sockets(socks):
+    """TCP em LISTEN e UDP não conectado (equivalente a `ss -tuln`)."""
+    return [s for s in socks
+            if (s.proto.startswith("tcp") and s.state == TCP_LISTEN)
+            or (s.proto.startswith("udp") and s.state == UDP_UNCONN and s.remote_port == 0)]
+
+
+def socket_owners(pids=None):
+    """
+    Uma passada por /proc/<pid>/fd → {inode_do_socket: [pid, ...]}.
+    pids: iterável de PIDs (padrão: PIDs do snapshot atual).
+    """
+    owners = {}
+    for pid in (pids if pids is not None else get_snapshot()):
+        fd_dir = f"{PROC}/{pid}/fd"
+        try:
+            fds = os.listdir(fd_dir)
+        except OSError:
+            continue
+        for fd in fds:
+            try:
+                target = os.readlink(f"{fd_dir}/{fd}")
+            except OSError:
+                continue
+            if target.startswith("socket:["):
+                pids_for = owners.setdefault(int(target[8:-1]), [])
+                if pid not in pids_for:
+                    pids_for.append(pid)
+    return owners
+
+
+# ========================= BENCHMARK =========================
+LEGACY_COMMANDS = [
+    "ps aux | awk 'NR>1 && $1==\"root\" && $11 ~ /tmp|dev/shm|var.tmp|home/|cache/'",
+    "ls -l /proc/*/exe 2>/dev/null | grep ' (deleted)'",
+    "ps aux | grep -E '/tmp|/var/tmp|/dev/shm|\\.cache|\\.local|\\.hidden|\\.\\.' | grep -v grep",
+    "ps -eo pid --no-headers",
+    "lsof -nP -i -F p 2>/dev/null | grep '^p' | cut -c2-",
+]
+
+
+def benchmark(rounds=3):
+    """Compara o caminho antigo (shell=True) com o snapshot nativo. Retorna (legado_s, nativo_s)."""
+    def legacy():
+        for cmd in LEGACY_COMMANDS:
+            subprocess.run(cmd, shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def native():
+        procs = take_snapshot()
+        root_suspicious(procs)
+        deleted_binaries(procs)
+        suspicious_dirs(procs)
+        hidden_processes(procs, brute_force=False)
+
+    results = []
+    for fn in (legacy, native):
+        best = float("inf")
+        for _ in range(rounds):
+            t0 = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - t0)
+        results.append(best)
+    return tuple(results)
+
+
+if __name__ == "__main__":
+    import sys
+    if "--bench" in sys.argv:
+        n = len(take_snapshot())
+        legacy_s, native_s = benchmark()
+        print(f"Processos: {n}")
+        print(f"Shell (ps/awk/ls/lsof): {legacy_s * 1000:.1f} ms")
+        print(f"Snapshot /proc nativo:  {native_s * 1000:.1f} ms")
+        if native_s:
+            print(f"Ganho: {legacy_s / native_s:.1f}x")
+    else:
+        for rec in sorted(take_snapshot().values()):
+            print(format_record(rec))
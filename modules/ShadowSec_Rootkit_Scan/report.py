@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ShadowSec Rootkit Scan — gravação de relatórios em streaming
+
+Autor: Luciano Valadão
+
+Objetivo:
+Gravar os relatórios RAW e READABLE à medida que cada checagem termina, em vez de
+acumular o relatório inteiro em memória e reescrevê-lo no final. Cada seção é gravada
+e descartada; o uso de memória fica limitado ao tamanho da maior seção.
+
+O RAW pode ser comprimido (gzip, ou zstd se o pacote `zstandard` estiver instalado).
+"""
+import io
+import os
+import gzip
+import textwrap
+from datetime import datetime
+
+WRAP_WIDTH = 120
+COMPRESSORS = ("gzip", "zstd")
+
+
+def _open_raw(path, compress):
+    if compress is None:
+        return open(path, "w", encoding="utf-8"), path
+    if compress == "gzip":
+        path += ".gz"
+        return gzip.open(path, "wt", encoding="utf-8"), path
+    if compress == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError("Compressão zstd requer: pip install zstandard")
+        path += ".zst"
+        fh = open(path, "wb")
+        stream = zstandard.ZstdCompressor().stream_writer(fh, closefd=True)
+        return io.TextIOWrapper(stream, encoding="utf-8"), path
+    raise ValueError(f"Compressão desconhecida: {compress} (use {', '.join(COMPRESSORS)})")
+
+
+class ReportWriter:
+    """
+    Escreve RAW e READABLE em paralelo, seção por seção.
+
+        with ReportWriter(output_dir, compress="gzip") as rw:
+            rw.write(secao)
+        readable, raw = rw.readable_path, rw.raw_path
+    """
+
+    def __init__(self, output_dir=".", prefix="shadowsec_rtk", compress=None, width=WRAP_WIDTH):
+        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        self.base = os.path.join(output_dir, f"{prefix}_{timestamp}")
+        os.makedirs(output_dir, exist_ok=True)
+        self.width = width
+        self.raw, self.raw_path = _open_raw(f"{self.base}_RAW.log", compress)
+        self.readable_path = f"{self.base}_READABLE.txt"
+        self.readable = open(self.readable_path, "w", encoding="utf-8")
+
+    def write(self, text):
+        self.raw.write(text)
+        # READABLE: quebra linhas longas, linha a linha (custo linear)
+        for line in text.splitlines(keepends=True):
+            body = line.rstrip("\n")
+            if len(body) > self.width:
+                self.readable.write("\n".join(textwrap.wrap(body, width=self.width)))
+                self.readable.write("\n" if line.endswith("\n") else "")
+            else:
+                self.readable.write(line)
+        # libera os buffers a cada seção → relatório parcial sobrevive a uma interrupção
+        self.raw.flush()
+        self.readable.flush()
+
+    def close(self):
+        self.raw.close()
+        self.readable.close()
+        return self.readable_path, self.raw_path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
@@ -17,9 +17,25 @@ Gera dois tipos de relatório:
 """
 import os
 import subprocess
-import textwrap
 import sys
-from datetime import datetime  # ← Correto: importa a classe diretamente
+import argparse
+import signal
+
+# Raiz do repositório no path → módulos compartilhados em toolkit/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from toolkit import dpkg_verify  # verificação nativa de md5sums (substitui debsums)
+
+import procfs  # snapshot único da tabela de processos (/proc)
+import scheduler  # registro de checagens + execução paralela
+import baseline  # baseline SHA-256 incremental (SQLite)
+from report import ReportWriter  # relatórios RAW/READABLE gravados em streaming
+import findings  # achados estruturados → NDJSON
+import signatures  # tabelas compiladas de data_signatures/
+import watch  # modo vigia (diff contínuo de estado)
+import external  # rkhunter/chkrootkit com tempo limite e captura de saída
+import kmod  # inspeção de LKMs (/proc/modules × /sys/module × kallsyms)
+import persistence  # índice de systemd/cron/rc/preload (relê só o que mudou)
+from datetime import datetime
 
 # ========================= CORES ANSI =========================
 # Escape codes para saída colorida no terminal (UX e legibilidade)
@@ -53,10 +69,26 @@ def banner():
 
 # ========================= AUX =========================
 def run(cmd):
+    """
+    Executa comando via shell e devolve o stdout (vazio em caso de falha).
+    Respeita o orçamento de tempo da checagem corrente (--timeout): ao estourar,
+    o grupo de processos inteiro é morto.
+    """
     try:
-        return subprocess.check_output(cmd, shell=True, text=True, stderr=subprocess.DEVNULL).strip()
-    except:
+        proc = subprocess.Popen(cmd, shell=True, text=True, stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL, start_new_session=True)
+    except OSError:
         return ""
+    try:
+        out, _ = proc.communicate(timeout=scheduler.remaining())
+    except subprocess.TimeoutExpired:
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except OSError:
+            pass
+        proc.communicate()
+        return ""
+    return out.strip() if proc.returncode == 0 else ""
 
 def section(title):
     print(f"\n{Y}[★] {title}{RESET}")
@@ -67,34 +99,20 @@ def alert(msg):
 def success(msg):
     print(f"{G}[✓] {msg}{RESET}")
 
-def save_readable_report(report_content, output_dir=".", prefix="shadowsec_rtk"):
-    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")  # ← Correto agora
-    base_filename = f"{prefix}_{timestamp}"
-    raw_path = os.path.join(output_dir, f"{base_filename}_RAW.log")
-    readable_path = os.path.join(output_dir, f"{base_filename}_READABLE.txt")
-
-    # RAW
-    with open(raw_path, "w", encoding="utf-8") as f:
-        f.write(report_content)
-
-    # READABLE (quebra linhas longas)
-    wrapped = ""
-    for line in report_content.splitlines():
-        if len(line) > 120:
-            wrapped += "\n".join(textwrap.wrap(line, width=120)) + "\n"
-        else:
-            wrapped += line + "\n"
-
-    with open(readable_path, "w", encoding="utf-8") as f:
-        f.write(wrapped)
-
-    return readable_path, raw_path
+def save_readable_report(report_content, output_dir=".", prefix="shadowsec_rtk", compress=None):
+    """Grava um relatório já pronto (compatibilidade); scans usam ReportWriter em streaming."""
+    with ReportWriter(output_dir, prefix, compress=compress) as rw:
+        rw.write(report_content)
+    return rw.readable_path, rw.raw_path
 
 # ========================= CHECAGENS (retornam string para relatório) =========================
 def check_root_processes():
     section("Processos root suspeitos (em /tmp, /dev/shm, etc)")
-    out = run("ps aux | awk 'NR>1 && $1==\"root\" && $11 ~ /tmp|dev/shm|var.tmp|home/|cache/'")
-    if out:
+    found = procfs.root_suspicious(procfs.get_snapshot())
+    for r in found:
+        findings.emit("high", procfs.format_record(r), pid=r.pid, path=r.exe or None)
+    if found:
+        out = "\n".join(procfs.format_record(r) for r in found)
         print(out)
         return out
     else:
@@ -103,9 +121,12 @@ def check_root_processes():
 
 def check_deleted_binaries():
     section("Binários deletados em execução (clássico de rootkit)")
-    out = run("ls -l /proc/*/exe 2>/dev/null | grep ' (deleted)'")
-    if out:
+    found = procfs.deleted_binaries(procfs.get_snapshot())
+    for r in found:
+        findings.emit("high", f"/proc/{r.pid}/exe -> {r.exe}", pid=r.pid, path=r.exe)
+    if found:
         alert("BINÁRIOS DELETADOS ENCONTRADOS:")
+        out = "\n".join(f"/proc/{r.pid}/exe -> {r.exe}" for r in found)
         print(out)
         return out
     else:
@@ -114,150 +135,365 @@ def check_deleted_binaries():
 
 def check_suspicious_dirs():
     section("Processos rodando de diretórios temporários/ocultos")
-    dirs = r"/tmp|/var/tmp|/dev/shm|\.cache|\.local|\.hidden|\.\."
-    out = run(f"ps aux | grep -E '{dirs}' | grep -v grep")
-    if out:
+    found = procfs.suspicious_dirs(procfs.get_snapshot())
+    for r in found:
+        findings.emit("medium", procfs.format_record(r), pid=r.pid, path=r.exe or None)
+    if found:
+        out = "\n".join(procfs.format_record(r) for r in found)
         print(out)
         return out
     else:
         success("Nenhum processo em diretório suspeito.")
         return "Nenhum processo em diretório suspeito."
 
+# Assinaturas de portas de backdoor (data_signatures/backdoorports.dat), compiladas uma vez
+BACKDOOR_PORTS = signatures.load_backdoor_ports()
+
 def check_open_ports():
-    section("Portas abertas no sistema (ss + lsof)")
-    ss_out = run("ss -tulpn 2>/dev/null || netstat -tulpn 2>/dev/null")
-    lsof_out = run("lsof -i -nP 2>/dev/null || echo 'lsof não disponível'")
-    full_out = f"ss:\n{ss_out}\n\nlsof:\n{lsof_out}"
+    section("Portas em escuta (/proc/net × backdoorports.dat)")
+    procs = procfs.get_snapshot()
+    listening = procfs.listening_sockets(procfs.read_sockets())
+    owners = procfs.socket_owners(procs)
+
+    lines = [f"{'PROTO':<6} {'ENDEREÇO LOCAL':<46} {'UID':>6}  PROCESSO"]
+    flagged = []
+    for s in sorted(listening, key=lambda s: (s.proto, s.port)):
+        pids = owners.get(s.inode, [])
+        who = ", ".join(f"{p}/{procs[p].comm}" if p in procs else str(p) for p in pids) or "?"
+        addr = f"[{s.local_ip}]:{s.port}" if ":" in s.local_ip else f"{s.local_ip}:{s.port}"
+        line = f"{s.proto:<6} {addr:<46} {s.uid:>6}  {who}"
+        lines.append(line)
+        for desc in signatures.match_port(BACKDOOR_PORTS, s.port, s.proto):
+            flagged.append(f"{line}  ← {desc}")
+            findings.emit("high", f"porta de backdoor conhecida em escuta: {desc}",
+                          pid=pids[0] if pids else None, port=s.port, proto=s.proto, address=s.local_ip)
+
+    full_out = "\n".join(lines)
     print(full_out)
+    if flagged:
+        alert("PORTAS DE BACKDOOR CONHECIDAS EM ESCUTA:")
+        for f in flagged:
+            print(f"{R}→ {f}{RESET}")
+        full_out += "\n\nAssinaturas de backdoor encontradas:\n" + "\n".join(flagged)
+    else:
+        success(f"Nenhuma porta em escuta casa com as {len(BACKDOOR_PORTS)} assinaturas de backdoor.")
     return full_out
 
 def check_hidden_processes():
-    section("Processos ocultos — ps × /proc × lsof")
-    ps_pids = set(run("ps -eo pid --no-headers").split())
-    proc_pids = set(d for d in os.listdir("/proc") if d.isdigit())
-    lsof_out = run("lsof -nP -i -F p 2>/dev/null | grep '^p' | cut -c2-")
-    lsof_pids = set(lsof_out.split()) if lsof_out else set()
-
-    hidden_from_proc = ps_pids - proc_pids
-    hidden_from_lsof = ps_pids - lsof_pids
+    section("Processos ocultos — /proc × PPid × kill(0)")
+    hidden = procfs.hidden_processes(procfs.get_snapshot())
+    orphans = hidden["ppid_orphans"]
+    probed = hidden["kill_probe"]
+    for pid in sorted(orphans):
+        findings.emit("critical", "PID referenciado como PPid mas invisível em /proc", pid=pid)
+    for pid in sorted(probed):
+        findings.emit("critical", "PID responde a kill(0) mas invisível em /proc", pid=pid)
 
     result = ""
-    if hidden_from_proc or hidden_from_lsof:
+    if orphans or probed:
         alert("PROCESSOS OCULTOS DETECTADOS!")
-        if hidden_from_proc:
-            result += f"Invisíveis para /proc: {hidden_from_proc}\n"
-            print(f"{R}→ Invisíveis para /proc: {hidden_from_proc}{RESET}")
-        if hidden_from_lsof:
-            result += f"Invisíveis para lsof: {hidden_from_lsof}\n"
-            print(f"{R}→ Invisíveis para lsof: {hidden_from_lsof}{RESET}")
+        if orphans:
+            result += f"Pais invisíveis em /proc: {sorted(orphans)}\n"
+            print(f"{R}→ Pais invisíveis em /proc: {sorted(orphans)}{RESET}")
+        if probed:
+            result += f"Respondem a kill(0) mas invisíveis em /proc: {sorted(probed)}\n"
+            print(f"{R}→ Respondem a kill(0) mas invisíveis em /proc: {sorted(probed)}{RESET}")
     else:
         success("Nenhum processo oculto detectado.")
         result = "Nenhum processo oculto detectado."
     return result
 
 def check_kernel_modules():
-    section("Módulos do kernel suspeitos")
-    raw = run("lsmod")
+    section("Módulos do kernel — /proc/modules × /sys/module × kallsyms")
+    info = kmod.inspect()
+    if not info["modular"]:
+        msg = "Kernel sem suporte a módulos carregáveis (/proc/modules ausente)."
+        print(f"{C}{msg}{RESET}")
+        return msg
+
+    lines = [f"{'MÓDULO':<28} {'TAMANHO':>9} {'REFS':>4}  {'ESTADO':<8} {'ENDEREÇO':<18} DEPENDÊNCIAS"]
+    for m in sorted(info["modules"].values()):
+        lines.append(f"{m.name:<28} {m.size:>9} {m.refcnt:>4}  {m.state:<8} {m.address:<18} {','.join(m.deps) or '-'}")
+    out = "\n".join(lines)
+
     sus = []
-    # Keywords mais precisas (evita falsos positivos em módulos legítimos curtos)
-    keywords = ["rootkit", "rk_", "reptile", "diamorphine", "knull", "adorng", "xhide", "suterusu", "hideproc"]
-    for line in raw.splitlines()[1:]:
-        parts = line.split()
-        if len(parts) < 1: continue
-        name = parts[0].lower()
-        if any(k in name for k in keywords):
-            sus.append(line.strip())
-            alert(f"POSSÍVEL ROOTKIT LKM → {parts[0]}")
+    for name, hits in sorted(info["matches"].items()):
+        desc = "; ".join(d for _, d in hits)
+        sus.append(f"{name} → {desc}")
+        alert(f"POSSÍVEL ROOTKIT LKM → {name} ({desc})")
+        findings.emit("critical", f"nome de módulo casa com assinatura: {desc}", module=name)
+    for name in sorted(info["hidden_sys"]):
+        sus.append(f"{name} → presente em /sys/module mas oculto de /proc/modules")
+        alert(f"MÓDULO OCULTO (sysfs) → {name}")
+        findings.emit("critical", "módulo em /sys/module ausente de /proc/modules", module=name)
+    for name in sorted(info["hidden_kallsyms"]):
+        sus.append(f"{name} → possui símbolos em /proc/kallsyms mas oculto de /proc/modules")
+        alert(f"MÓDULO OCULTO (kallsyms) → {name}")
+        findings.emit("critical", "módulo com símbolos em kallsyms ausente de /proc/modules", module=name)
+    for name in sorted(info["unlisted_sys"]):
+        sus.append(f"{name} → listado em /proc/modules sem kobject em /sys/module")
+        findings.emit("high", "módulo sem kobject em /sys/module", module=name)
+    for name, taint in sorted(info["tainted"].items()):
+        if "O" in taint or "E" in taint:
+            findings.emit("low", f"módulo contamina o kernel (taint {taint})", module=name)
+
     if not sus:
         success("Nenhum módulo suspeito encontrado.")
-    return raw + "\n\n" + ("Módulos suspeitos encontrados:\n" + "\n".join(sus) if sus else "Nenhum módulo suspeito.")
+    tainted = ", ".join(f"{n}({t})" for n, t in sorted(info["tainted"].items()))
+    if tainted:
+        out += f"\n\nMódulos com taint: {tainted}"
+    print(out)
+    return out + "\n\n" + ("Módulos suspeitos encontrados:\n" + "\n".join(sus) if sus else "Nenhum módulo suspeito.")
 
 def check_systemd_persistence():
-    section("Persistência via systemd")
-    paths = ["/etc/systemd/system/", "~/.config/systemd/user/"]
-    output = ""
-    for p in paths:
-        path = os.path.expanduser(p)
-        if os.path.isdir(path):
-            output += f"{path}:\n"
-            out = run(f"ls -la '{path}' 2>/dev/null | tail -n +3")
-            output += out + "\n\n"
-            print(f"{C}{path}{RESET}")
-            print(out if out else "vazio")
-        else:
-            output += f"{path} → não existe\n"
-            print(f"{Y}{path} → não existe{RESET}")
-    return output.strip()
+    section("Persistência — systemd, cron, rc.local, profile.d")
+    scan = persistence.get_scan(commit=True)
+    lines = []
+    for path, (kind, entries) in sorted(scan["entries"].items()):
+        lines.append(f"[{kind}] {path}")
+        lines.extend(f"    {e}" for e in entries)
+    out = "\n".join(lines) or "Nenhuma entrada de persistência encontrada."
+
+    if scan["first_run"]:
+        print(f"{C}Primeira execução: índice de persistência criado ({len(scan['entries'])} arquivos).{RESET}")
+        print(out)
+        return out
 
-def check_debsums():
-    section("Integridade de pacotes (debsums)")
-    if os.system("command -v debsums >/dev/null") == 0:
-        print(f"{C}Executando debsums -cs...{RESET}")
-        out = run("debsums -cs 2>/dev/null")
-        if out:
-            alert("PACOTES ALTERADOS ENCONTRADOS:")
-            print(out)
-            return out
-        else:
-            success("Todos os pacotes estão íntegros!")
-            return "Todos os pacotes estão íntegros."
+    changes = []
+    for path, kind, entries in scan["new"]:
+        changes.append(f"[NOVO] [{kind}] {path}")
+        changes.extend(f"    + {e}" for e in entries)
+        findings.emit("high", f"nova entrada de persistência ({kind})", path=path, entries=entries)
+    for path, kind, added, removed in scan["modified"]:
+        changes.append(f"[MODIFICADO] [{kind}] {path}")
+        changes.extend(f"    + {e}" for e in added)
+        changes.extend(f"    - {e}" for e in removed)
+        findings.emit("high", f"entrada de persistência modificada ({kind})", path=path,
+                      added=added, removed=removed)
+    for path, kind in scan["removed"]:
+        changes.append(f"[REMOVIDO] [{kind}] {path}")
+        findings.emit("low", f"entrada de persistência removida ({kind})", path=path)
+
+    if changes:
+        alert("ALTERAÇÕES EM PONTOS DE PERSISTÊNCIA!")
+        print("\n".join(changes))
+        out += "\n\nAlterações desde o último scan:\n" + "\n".join(changes)
     else:
-        msg = "debsums não instalado → sudo apt install debsums"
+        success(f"Nenhuma alteração em {len(scan['entries'])} arquivos de persistência "
+                f"(relidos: {scan['reread']}).")
+    return out
+
+def check_debsums():
+    section("Integridade de pacotes (md5sums do dpkg)")
+    if not os.path.isdir(dpkg_verify.DPKG_INFO):
+        msg = f"{dpkg_verify.DPKG_INFO} não encontrado (sistema não baseado em dpkg)"
         print(f"{Y}{msg}{RESET}")
         return msg
+    print(f"{C}Verificando md5sums dos pacotes (equivalente a debsums -cs)...{RESET}")
+    changed = []
+    for res in dpkg_verify.verify_packages():
+        line = dpkg_verify.format_debsums(*res, changed_only=True)
+        if line:
+            if not changed:
+                alert("PACOTES ALTERADOS ENCONTRADOS:")
+            print(line)
+            changed.append(line)
+            findings.emit("high", f"arquivo de pacote alterado ({res[1]})", path=line, package=res[1])
+    if changed:
+        return "\n".join(changed)
+    else:
+        success("Todos os pacotes estão íntegros!")
+        return "Todos os pacotes estão íntegros."
 
 def check_ld_preload():
     section("LD_PRELOAD Hooks")
-    out = run("grep -R \"LD_PRELOAD\" /etc/ 2>/dev/null")
-    if out:
+    hooks = persistence.preload_hooks(persistence.get_scan()["entries"])
+    for path, entry in hooks:
+        findings.emit("high", entry, path=path)
+    if hooks:
         alert("LD_PRELOAD definido encontrado!")
+        out = "\n".join(f"{path}: {entry}" for path, entry in hooks)
         print(out)
         return out
     else:
         success("LD_PRELOAD limpo.")
         return "LD_PRELOAD limpo."
 
-def check_essential_binaries():
-    section("Hashes MD5 de binários críticos")
-    bins = [
-        "/bin/ls", "/bin/cat", "/bin/bash", "/usr/bin/sudo",
-        "/usr/bin/login", "/usr/bin/passwd", "/usr/bin/ssh",
-        "/usr/bin/ps", "/usr/bin/top", "/usr/bin/ss", "/usr/bin/lsof", "/bin/netstat"
-    ]
+ESSENTIAL_BINARIES = [
+    "/bin/ls", "/bin/cat", "/bin/bash", "/usr/bin/sudo",
+    "/usr/bin/login", "/usr/bin/passwd", "/usr/bin/ssh",
+    "/usr/bin/ps", "/usr/bin/top", "/usr/bin/ss", "/usr/bin/lsof", "/bin/netstat"
+]
+# Diretórios inteiros cobertos pelo baseline (além da lista acima)
+BASELINE_DIRS = ["/usr/bin", "/usr/sbin"]
+
+def check_essential_binaries(accept=False):
+    section("Baseline SHA-256 de binários críticos")
     result = ""
-    for b in bins:
-        if os.path.exists(b):
-            hash_out = run(f"md5sum {b}")
-            result += f"{hash_out}\n"
-        else:
+    for b in ESSENTIAL_BINARIES:
+        if not os.path.exists(b):
             result += f"[!] Binário ausente: {b}\n"
+
+    targets = baseline.expand_targets(ESSENTIAL_BINARIES, BASELINE_DIRS)
+    try:
+        drift = baseline.scan(targets, scope_dirs=BASELINE_DIRS, accept=accept)
+    except OSError as e:
+        msg = f"Baseline indisponível: {e}"
+        print(f"{Y}{msg}{RESET}")
+        return (result + msg).strip()
+
+    def aliases(p):
+        # nomes pelos quais o arquivo canônico é alcançado (informativo)
+        return [a for a in drift["aliases"].get(p, []) if a != p]
+
+    def label(p):
+        extra = aliases(p)
+        return f"{p} (aliases: {', '.join(extra)})" if extra else p
+
+    if drift["modified"] or drift["missing"]:
+        alert("DRIFT EM BINÁRIOS DO BASELINE!")
+    for p, old, new in drift["modified"]:
+        findings.emit("critical", f"SHA-256 divergente do baseline: {old} → {new}", path=p, aliases=aliases(p))
+        result += f"[ALTERADO] {label(p)}\n    baseline: {old}\n    atual:    {new}\n"
+    for p in drift["missing"]:
+        findings.emit("high", "binário do baseline removido", path=p, aliases=aliases(p))
+        result += f"[REMOVIDO] {label(p)}\n"
+    for p, digest in drift["new"]:
+        result += f"[NOVO] {digest}  {label(p)}\n"
+    for p, err in drift["errors"]:
+        result += f"[ERRO] {p}: {err}\n"
+    result += (f"\nArquivos verificados: {len(targets)} | re-hasheados: {drift['rehashed']} | "
+               f"inalterados: {len(drift['unchanged'])}")
+    if not (drift["modified"] or drift["missing"]):
+        success("Nenhum drift em relação ao baseline.")
     print(result.strip())
     return result.strip()
 
+def accept_baseline():
+    """
+    Aceita o estado atual dos binários como novo baseline (após um apt upgrade legítimo):
+    alterados são regravados e removidos saem do banco. Retorna o texto do relatório.
+    """
+    return check_essential_binaries(accept=True)
+
 def check_rkhunter_chkrootkit():
     section("Status de scanners externos")
-    rkh = "instalado" if os.system("command -v rkhunter >/dev/null") == 0 else "não instalado"
-    chk = "instalado" if os.system("command -v chkrootkit >/dev/null") == 0 else "não instalado"
-    msg = f"rkhunter: {rkh}\nchkrootkit: {chk}"
-    if rkh == "não instalado":
-        msg += "\n→ sudo apt install rkhunter"
-    if chk == "não instalado":
-        msg += "\n→ sudo apt install chkrootkit"
+    installed = external.available()
+    msg = "\n".join(f"{n}: {'instalado' if n in installed else 'não instalado'}" for n in external.SCANNERS)
+    for n in external.SCANNERS:
+        if n not in installed:
+            msg += f"\n→ sudo apt install {n}"
     print(msg)
     return msg
 
 def run_external_scanners():
     section("Executando scanners externos (se disponíveis)")
-    executed = []
-    if os.system("command -v rkhunter >/dev/null") == 0:
-        print(f"{C}→ rkhunter em execução...{RESET}")
-        os.system("rkhunter --check --sk --cronjob 2>/dev/null")
-        executed.append("rkhunter executado")
-    if os.system("command -v chkrootkit >/dev/null") == 0:
-        print(f"{C}→ chkrootkit em execução...{RESET}")
-        os.system("chkrootkit")
-        executed.append("chkrootkit executado")
-    return "\n".join(executed) if executed else "Nenhum scanner externo disponível."
+    installed = external.available()
+    if not installed:
+        msg = "Nenhum scanner externo disponível."
+        print(msg)
+        return msg
+
+    # orçamento: o menor entre o padrão e o que resta do --timeout da checagem
+    budget = external.DEFAULT_BUDGET
+    left = scheduler.remaining()
+    if left is not None:
+        budget = max(1.0, min(budget, left - external.KILL_GRACE - 1))
+    print(f"{C}→ {', '.join(installed)} em execução em paralelo (limite {budget:g}s)...{RESET}")
+
+    # progresso ao vivo no stderr (stdout da checagem é bufferizado pelo escalonador)
+    runs = external.run_all(budget, on_line=lambda n, line: print(f"[{n}] {line}", file=sys.stderr), scanners=installed)
+    result = ""
+    for r in runs:
+        status = "TEMPO ESGOTADO (grupo de processos encerrado)" if r.timed_out else f"código de saída {r.returncode}"
+        header = f"===== {r.name} ({' '.join(r.argv)}) — {status}, {r.duration_s}s ====="
+        result += f"{header}\n{r.output}\n\n"
+        findings.emit("info", header, scanner=r.name, returncode=r.returncode,
+                      scanner_duration_s=r.duration_s, timed_out=r.timed_out)
+        if r.timed_out:
+            alert(f"{r.name} excedeu {budget:g}s e foi encerrado.")
+            findings.emit("medium", f"{r.name} excedeu o tempo limite de {budget:g}s", scanner=r.name)
+        for sev, line in external.suspicious_lines(r):
+            findings.emit(sev, line, scanner=r.name)
+        print(f"{C}{header}{RESET}")
+    return result.strip()
+
+# ========================= REGISTRO DE CHECAGENS =========================
+# Ordem de registro = ordem das seções no relatório.
+# deps: checagens cujo resultado outra consome e que precisam terminar antes (o restante roda
+# em paralelo). Hoje nenhuma depende de outra: o dado compartilhado (persistence.get_scan) é
+# calculado uma vez sob lock por quem chegar primeiro.
+scheduler.register("root_processes", check_root_processes)
+scheduler.register("deleted_binaries", check_deleted_binaries)
+scheduler.register("suspicious_dirs", check_suspicious_dirs)
+scheduler.register("open_ports", check_open_ports)
+scheduler.register("hidden_processes", check_hidden_processes)
+scheduler.register("kernel_modules", check_kernel_modules)
+scheduler.register("systemd_persistence", check_systemd_persistence)
+scheduler.register("debsums", check_debsums)
+scheduler.register("ld_preload", check_ld_preload)
+scheduler.register("essential_binaries", check_essential_binaries)
+scheduler.register("rkhunter_chkrootkit", check_rkhunter_chkrootkit)
+scheduler.register("external_scanners", run_external_scanners)
+
+MODES = {
+    "quick": ["root_processes", "deleted_binaries", "suspicious_dirs", "open_ports", "kernel_modules"],
+    "full": list(scheduler.REGISTRY),
+    "ghost": ["hidden_processes", "open_ports"],
+}
+
+# Limite de checagens simultâneas (1 = sequencial, como na v1.0)
+MAX_WORKERS = int(os.environ.get("SHADOWSEC_RTK_WORKERS", scheduler.DEFAULT_WORKERS))
+
+# Compressão do RAW: None, "gzip" ou "zstd"
+RAW_COMPRESS = os.environ.get("SHADOWSEC_RTK_COMPRESS") or None
+
+FORMATS = ("all", "text", "ndjson")
+
+def _open_report(output_dir, compress):
+    """ReportWriter; sem o pacote zstandard, avisa e cai para gzip (menu e CLI)."""
+    try:
+        return ReportWriter(output_dir, compress=compress)
+    except RuntimeError as e:
+        print(f"{Y}[!] {e} — usando gzip.{RESET}", file=sys.stderr)
+        return ReportWriter(output_dir, compress="gzip")
+
+def run_scan(names, output_dir=".", max_workers=MAX_WORKERS, compress=RAW_COMPRESS,
+             fmt="all", timeout=None):
+    """
+    Executa as checagens `names` em paralelo e grava cada seção nos relatórios
+    assim que ela fica pronta (na ordem fixa informada).
+    fmt: "text" → RAW + READABLE; "ndjson" → só FINDINGS; "all" → os três.
+    Retorna (arquivos_gerados, resultados).
+    """
+    procfs.invalidate()  # cada scan parte de um snapshot novo de /proc
+    persistence.reset()  # e de um novo diff dos pontos de persistência
+    os.makedirs(output_dir, exist_ok=True)
+    base = os.path.join(output_dir, f"shadowsec_rtk_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}")
+    rw = _open_report(output_dir, compress) if fmt in ("all", "text") else None
+    nd = findings.NdjsonWriter(f"{rw.base if rw else base}_FINDINGS.ndjson") if fmt in ("all", "ndjson") else None
+    results = []
+    try:
+        if rw:
+            rw.write("========= SHADOWSEC ROOTKIT SCAN v1.0 =========\n\n")
+        on_complete = (lambda res: nd.write_check(res.name, res.findings, res.duration_ms, res.status)) if nd else None
+        for res in scheduler.run_checks(names, max_workers=max_workers, on_complete=on_complete, timeout=timeout):
+            results.append(res)
+            if rw:
+                rw.write(res.output + "\n\n")
+    finally:
+        files = []
+        if rw:
+            files += [rw.readable_path, rw.raw_path]
+            rw.close()
+        if nd:
+            files.append(nd.close())
+    return files, results
+
+def run_mode(mode, output_dir=".", max_workers=MAX_WORKERS, compress=RAW_COMPRESS):
+    """Atalho do menu: executa um modo e retorna (readable, raw, ndjson)."""
+    files, _ = run_scan(MODES[mode], output_dir, max_workers, compress)
+    return tuple(files)
 
 # ========================= MENU =========================
 def menu():
@@ -268,41 +504,32 @@ def menu():
     [1] Scan RÁPIDO (triagem rápida)
     [2] Scan COMPLETO (máxima detecção)
     [3] Caça fantasma (processos ocultos + portas)
-    [4] Sair
+    [4] Aceitar binários atuais como baseline (após atualização do sistema)
+    [5] Sair
         {RESET}""")
         op = input(f"\n{Y}Escolha o modo → {RESET}").strip()
 
-        report_content = "========= SHADOWSEC ROOTKIT SCAN v1.0 =========\n\n"
-
         if op == "1":
             print(f"{C}[+] MODO RÁPIDO ATIVADO{RESET}")
-            report_content += check_root_processes() + "\n\n"
-            report_content += check_deleted_binaries() + "\n\n"
-            report_content += check_suspicious_dirs() + "\n\n"
-            report_content += check_open_ports() + "\n\n"
-            report_content += check_kernel_modules() + "\n\n"
+            readable, raw, ndjson = run_mode("quick")
 
         elif op == "2":
             print(f"{C}[+] MODO COMPLETO ATIVADO{RESET}")
-            report_content += check_root_processes() + "\n\n"
-            report_content += check_deleted_binaries() + "\n\n"
-            report_content += check_suspicious_dirs() + "\n\n"
-            report_content += check_open_ports() + "\n\n"
-            report_content += check_hidden_processes() + "\n\n"
-            report_content += check_kernel_modules() + "\n\n"
-            report_content += check_systemd_persistence() + "\n\n"
-            report_content += check_debsums() + "\n\n"
-            report_content += check_ld_preload() + "\n\n"
-            report_content += check_essential_binaries() + "\n\n"
-            report_content += check_rkhunter_chkrootkit() + "\n\n"
-            report_content += run_external_scanners() + "\n\n"
+            readable, raw, ndjson = run_mode("full")
 
         elif op == "3":
             print(f"{C}[+] CAÇANDO FANTASMAS...{RESET}")
-            report_content += check_hidden_processes() + "\n\n"
-            report_content += check_open_ports() + "\n\n"
+            readable, raw, ndjson = run_mode("ghost")
+
+        elif op == "4":
+            confirm = input(f"{Y}[?] Aceitar o estado atual de {', '.join(BASELINE_DIRS)} como confiável? (s/n): {RESET}")
+            if confirm.strip().lower() == "s":
+                accept_baseline()
+                print(f"\n{G}[✓] Baseline atualizado.{RESET}")
+            input(f"\n{Y}Pressione ENTER para voltar ao menu…{RESET}")
+            continue
 
-        elif op in ["4", "sair", "exit", "q"]:
+        elif op in ["5", "sair", "exit", "q"]:
             print(f"{M}Saindo do ShadowSec Rootkit Scan...{RESET}")
             sys.exit(0)
 
@@ -311,14 +538,91 @@ def menu():
             input("Pressione ENTER para continuar...")
             continue
 
-        readable, raw = save_readable_report(report_content)
         print(f"\n{G}[✓] SCAN FINALIZADO! Relatórios salvos:{RESET}")
         print(f" → {readable} (legível)")
         print(f" → {raw} (bruto)")
+        print(f" → {ndjson} (achados estruturados)")
         input(f"\n{Y}Pressione ENTER para voltar ao menu…{RESET}")
 
+# ========================= CLI (não interativo) =========================
+def positive_seconds(value):
+    """type= do argparse: segundos > 0 (--watch 0 cairia no menu; negativo quebraria o sleep)."""
+    try:
+        secs = float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"número inválido: {value}")
+    if not secs > 0:
+        raise argparse.ArgumentTypeError(f"deve ser maior que zero: {value}")
+    return secs
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="ShadowSec Rootkit Scan — sem argumentos abre o menu interativo.")
+    parser.add_argument("--mode", choices=sorted(MODES), help="Modo de scan (quick, full, ghost).")
+    parser.add_argument("--checks", metavar="LISTA",
+                        help="Checagens separadas por vírgula (dependências entram automaticamente).")
+    parser.add_argument("--list-checks", action="store_true", help="Lista as checagens registradas e sai.")
+    parser.add_argument("--output-dir", default=".", help="Diretório dos relatórios (padrão: diretório atual).")
+    parser.add_argument("--format", choices=FORMATS, default="all",
+                        help="text = RAW+READABLE, ndjson = achados estruturados, all = ambos (padrão).")
+    parser.add_argument("--timeout", type=positive_seconds, metavar="SEG", help="Tempo limite por checagem, em segundos.")
+    parser.add_argument("--jobs", type=int, default=MAX_WORKERS, help="Checagens simultâneas (1 = sequencial).")
+    parser.add_argument("--compress", choices=("gzip", "zstd"), default=RAW_COMPRESS, help="Comprime o RAW.")
+    parser.add_argument("--watch", type=positive_seconds, metavar="INTERVALO",
+                        help="Modo vigia: reporta só diferenças (PIDs, LKMs, portas, units) a cada INTERVALO segundos.")
+    parser.add_argument("--watch-ndjson", metavar="ARQUIVO", help="Grava os eventos do modo vigia em NDJSON.")
+    parser.add_argument("--accept-baseline", action="store_true",
+                        help="Aceita o estado atual dos binários como baseline (após apt upgrade) e sai.")
+    return parser
+
+def cli(args):
+    """
+    Execução em lote (cron/ansible/frota). Códigos de saída:
+    0 = sem achados high/critical, 2 = achados high/critical, 3 = alguma checagem falhou/estourou o tempo.
+    """
+    names = list(MODES[args.mode]) if args.mode else []
+    if args.checks:
+        requested = [c.strip() for c in args.checks.split(",") if c.strip()]
+        try:
+            extra = scheduler.resolve(requested)
+        except KeyError as e:
+            print(f"{R}[!] {e.args[0]} — use --list-checks{RESET}", file=sys.stderr)
+            return 64
+        names = scheduler.resolve(names + extra)
+    files, results = run_scan(names, args.output_dir, args.jobs, args.compress, args.format, args.timeout)
+
+    print(f"\n{G}[✓] SCAN FINALIZADO! Relatórios salvos:{RESET}")
+    for f in files:
+        print(f" → {f}")
+    if any(r.status != "ok" for r in results):
+        code = 3
+    elif any(f["severity"] in ("high", "critical") for r in results for f in r.findings):
+        code = 2
+    else:
+        code = 0
+    if scheduler.abandoned(results):
+        # threads de checagens abandonadas não podem ser interrompidos; encerra sem esperá-los
+        sys.stdout.flush()
+        os._exit(code)
+    return code
+
 if __name__ == "__main__":
+    args = build_parser().parse_args()
+
+    if args.list_checks:
+        for name in scheduler.REGISTRY:
+            modes = ", ".join(m for m, lst in MODES.items() if name in lst)
+            print(f"{name:<22} [{modes}]")
+        sys.exit(0)
     if os.geteuid() != 0:
         print(f"{R}[!] Execute como root: sudo python3 rtk.py{RESET}")
         sys.exit(1)
-    menu()
+    if args.accept_baseline:
+        accept_baseline()
+        sys.exit(0)
+    if args.watch is not None:
+        watch.run(args.watch, ndjson_path=args.watch_ndjson)
+    elif args.mode or args.checks:
+        sys.exit(cli(args))
+    else:
+        menu()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ShadowSec Rootkit Scan — registro de checagens e escalonador paralelo
+
+Autor: Luciano Valadão
+
+Objetivo:
+Executar as checagens do rtk.py em threads próprios, respeitando dependências
+declaradas, com limite de concorrência configurável. As seções do relatório (e a
+saída no terminal) continuam saindo na ordem fixa do modo escolhido, mesmo que as
+checagens terminem fora de ordem.
+"""
+import io
+import os
+import sys
+import time
+import threading
+from collections import namedtuple
+from concurrent.futures import Future, wait, FIRST_COMPLETED
+
+import findings
+
+Check = namedtuple("Check", "name func deps")
+# Resultado de uma checagem: texto do relatório, achados estruturados, duração e status
+CheckResult = namedtuple("CheckResult", "name output findings duration_ms status terminal")
+
+# Ordem de registro = ordem canônica das seções
+REGISTRY = {}
+
+DEFAULT_WORKERS = max(1, min(8, os.cpu_count() or 2))
+
+
+def register(name, func, deps=()):
+    """Registra uma checagem. deps: nomes que precisam terminar antes dela."""
+    for d in deps:
+        if d not in REGISTRY:
+            raise KeyError(f"Dependência desconhecida para {name}: {d}")
+    REGISTRY[name] = Check(name, func, tuple(deps))
+    return func
+
+
+# ========================= SAÍDA POR THREAD =========================
+class _ThreadStdout(io.TextIOBase):
+    """
+    Proxy de sys.stdout: cada worker escreve no próprio buffer; o thread principal
+    escreve direto no terminal. Evita saída embaralhada entre checagens paralelas.
+    """
+
+    def __init__(self, real):
+        self.real = real
+        self.local = threading.local()
+
+    def write(self, s):
+        buf = getattr(self.local, "buf", None)
+        return (buf if buf is not None else self.real).write(s)
+
+    def flush(self):
+        self.real.flush()
+
+
+_deadline = threading.local()
+
+
+def remaining():
+    """
+    Segundos restantes do orçamento da checagem no thread atual (None = sem limite).
+    Usado pelos helpers de subprocess para matar comandos que estourem o tempo.
+    """
+    end = getattr(_deadline, "at", None)
+    return None if end is None else max(0.0, end - time.monotonic())
+
+
+def _call(check, proxy, timeout, started):
+    proxy.local.buf = io.StringIO()
+    findings.begin(check.name)
+    status = "ok"
+    t0 = time.perf_counter()
+    started[check.name] = time.monotonic()
+    _deadline.at = started[check.name] + timeout if timeout else None
+    try:
+        try:
+            out = check.func()
+        except Exception as e:
+            status = "error"
+            out = f"[!] Falha na checagem {check.name}: {e}"
+            print(out)
+        duration_ms = round((time.perf_counter() - t0) * 1000, 1)
+        return CheckResult(check.name, out, findings.end(), duration_ms, status,
+                           proxy.local.buf.getvalue())
+    finally:
+        proxy.local.buf = None
+        _deadline.at = None
+
+
+def _spawn(fn, *args):
+    """
+    Executa fn(*args) em um thread daemon próprio e devolve um Future.
+    Um pool fixo não serve: o worker preso numa checagem abandonada continuaria
+    ocupando a vaga e as próximas ficariam na fila atrás dele.
+    """
+    fut = Future()
+    fut.set_running_or_notify_cancel()
+
+    def target():
+        try:
+            fut.set_result(fn(*args))
+        except BaseException as e:
+            fut.set_exception(e)
+
+    threading.Thread(target=target, name=f"check-{args[0].name}", daemon=True).start()
+    return fut
+
+
+def _timed_out(name, timeout):
+    msg = f"[!] Checagem {name} excedeu o tempo limite de {timeout:g}s e foi abandonada."
+    return CheckResult(name, msg, [], round(timeout * 1000, 1), "timeout", f"\033[31m{msg}\033[0m\n")
+
+
+def resolve(names):
+    """Expande dependências e devolve a lista na ordem canônica do registro."""
+    wanted = set()
+
+    def add(n):
+        if n not in REGISTRY:
+            raise KeyError(f"Checagem desconhecida: {n}")
+        if n not in wanted:
+            wanted.add(n)
+            for d in REGISTRY[n].deps:
+                add(d)
+
+    for n in names:
+        add(n)
+    order = {n: i for i, n in enumerate(REGISTRY)}
+    return sorted(wanted, key=order.get)
+
+
+def run_checks(names, max_workers=None, on_complete=None, timeout=None):
+    """
+    Executa as checagens e produz CheckResult na ordem de `names`
+    conforme cada prefixo da sequência fica pronto.
+    on_complete(CheckResult) é chamado no thread principal assim que cada
+    checagem termina (fora de ordem) — usado pela saída NDJSON.
+    timeout: orçamento em segundos por checagem, contado a partir do início
+    dela; quem estoura é reportado com status "timeout" e abandonado.
+    max_workers=1 reproduz a execução sequencial original.
+    """
+    names = list(names)
+    max_workers = max(1, max_workers or DEFAULT_WORKERS)
+    done = {}
+    running = {}
+    started = {}
+    pending = list(names)
+    next_idx = 0
+
+    proxy = _ThreadStdout(sys.stdout)
+    sys.stdout = proxy
+    try:
+        while next_idx < len(names):
+            # inicia o que já pode rodar, até max_workers checagens vivas; as abandonadas
+            # por timeout saem de `running` e liberam a vaga na hora
+            for n in list(pending):
+                if len(running) >= max_workers:
+                    break
+                if all(d in done or d not in names for d in REGISTRY[n].deps):
+                    pending.remove(n)
+                    running[_spawn(_call, REGISTRY[n], proxy, timeout, started)] = n
+
+            wait_for = None
+            if timeout:
+                now = time.monotonic()
+                ends = [started[n] + timeout - now for n in running.values() if n in started]
+                wait_for = max(0.05, min(ends)) if ends else 0.05
+            finished, _ = wait(running, timeout=wait_for, return_when=FIRST_COMPLETED)
+
+            completed = [(running.pop(fut), fut.result()) for fut in finished]
+            if timeout:
+                now = time.monotonic()
+                for fut, n in list(running.items()):
+                    if n in started and now - started[n] >= timeout:
+                        del running[fut]
+                        completed.append((n, _timed_out(n, timeout)))
+            for n, res in completed:
+                done[n] = res
+                if on_complete:
+                    on_complete(res)
+
+            # libera, em ordem, o prefixo contíguo de checagens concluídas
+            while next_idx < len(names) and names[next_idx] in done:
+                res = done[names[next_idx]]
+                proxy.real.write(res.terminal)
+                proxy.real.flush()
+                yield res
+                next_idx += 1
+    finally:
+        # checagens abandonadas seguem em threads daemon; as demais já terminaram
+        sys.stdout = proxy.real
+
+
+def abandoned(results):
+    """True se alguma checagem foi abandonada por timeout (thread ainda vivo)."""
+    return any(r.status == "timeout" for r in results)
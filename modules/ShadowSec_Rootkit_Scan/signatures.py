@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ShadowSec Rootkit Scan — carregamento de assinaturas de data_signatures/
+
+Autor: Luciano Valadão
+
+Objetivo:
+Compilar os arquivos .dat (formato rkhunter) em tabelas de consulta em memória.
+
+backdoorports.dat  →  {porta: [(protocolo, descrição), ...]}
+    Sintaxe: <porta>:<descrição>:<protocolo>:
+
+lkm_signatures.dat →  automato Aho-Corasick (substrings de nomes de módulos)
+    Sintaxe: <substring>:<descrição>:
+    Uma única passada pelo nome encontra todas as assinaturas, então o custo
+    por nome não cresce com o tamanho da lista (milhares de entradas).
+"""
+import os
+import hashlib
+from collections import deque
+
+SIGNATURES_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "data_signatures")
+
+BACKDOOR_PORTS = os.path.join(SIGNATURES_DIR, "backdoorports.dat")
+LKM_SIGNATURES = os.path.join(SIGNATURES_DIR, "lkm_signatures.dat")
+
+
+def load_backdoor_ports(path=BACKDOOR_PORTS):
+    """Lê backdoorports.dat e devolve um índice por porta. Linhas inválidas são ignoradas."""
+    table = {}
+    try:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return table
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#") or line.startswith("Version:"):
+            continue
+        parts = line.split(":")
+        if len(parts) < 3:
+            continue
+        try:
+            port = int(parts[0])
+        except ValueError:
+            continue
+        proto = parts[2].strip().lower()
+        if not 1 <= port <= 65535 or proto not in ("tcp", "udp"):
+            continue
+        table.setdefault(port, []).append((proto, parts[1].strip()))
+    return table
+
+
+def match_port(table, port, proto):
+    """Descrições de assinaturas que casam com (porta, protocolo). proto: 'tcp'/'udp' (aceita tcp6/udp6)."""
+    base = proto.rstrip("6")
+    return [desc for p, desc in table.get(port, ()) if p == base]
+
+
+# ========================= AHO-CORASICK =========================
+def build_automaton(patterns):
+    """
+    Compila {substring: descrição} em um automato Aho-Corasick.
+    Retorna (goto, fail, out): listas indexadas pelo estado.
+    """
+    goto = [{}]
+    out = [[]]
+    for pat, desc in patterns.items():
+        state = 0
+        for ch in pat:
+            nxt = goto[state].get(ch)
+            if nxt is None:
+                nxt = len(goto)
+                goto[state][ch] = nxt
+                goto.append({})
+                out.append([])
+            state = nxt
+        out[state].append((pat, desc))
+
+    fail = [0] * len(goto)
+    queue = deque(goto[0].values())
+    while queue:
+        state = queue.popleft()
+        for ch, nxt in goto[state].items():
+            queue.append(nxt)
+            f = fail[state]
+            while f and ch not in goto[f]:
+                f = fail[f]
+            fail[nxt] = goto[f].get(ch, 0) if goto[f].get(ch, 0) != nxt else 0
+            out[nxt] = out[nxt] + out[fail[nxt]]
+    return goto, fail, out
+
+
+def search(automaton, text):
+    """Todas as assinaturas contidas em `text`: [(substring, descrição)], sem repetição."""
+    goto, fail, out = automaton
+    state = 0
+    found = {}
+    for ch in text:
+        while state and ch not in goto[state]:
+            state = fail[state]
+        state = goto[state].get(ch, 0)
+        for pat, desc in out[state]:
+            found[pat] = desc
+    return list(found.items())
+
+
+def load_lkm_signatures(path=LKM_SIGNATURES):
+    """
+    Lê lkm_signatures.dat → (automato, sha256_do_arquivo).
+    O hash permite invalidar caches de resultados quando as assinaturas mudam.
+    """
+    patterns = {}
+    digest = ""
+    try:
+        with open(path, "rb") as f:
+            raw = f.read()
+        digest = hashlib.sha256(raw).hexdigest()
+        lines = raw.decode("utf-8", "replace").splitlines()
+    except OSError:
+        lines = []
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#") or line.startswith("Version:"):
+            continue
+        parts = line.split(":")
+        if len(parts) < 2 or not parts[0]:
+            continue
+        patterns[parts[0].lower()] = parts[1].strip()
+    return build_automaton(patterns), digest
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ShadowSec Rootkit Scan — modo vigia contínuo (--watch INTERVALO)
+
+Autor: Luciano Valadão
+
+Objetivo:
+Manter em memória o último estado de processos, módulos do kernel, portas em escuta e
+units do systemd, e a cada ciclo reportar apenas as diferenças:
+- novos PIDs rodando de diretórios temporários/ocultos ou com binário deletado
+- LKMs carregados e removidos (um LKM que some de /proc/modules pode estar se ocultando)
+- portas em escuta novas (com processo dono e assinatura de backdoor, se houver) e fechadas
+- units do systemd novas, modificadas e removidas
+
+Cada ciclo lista apenas os PIDs de /proc e lê por completo só os PIDs novos, então o
+custo por ciclo é proporcional ao que mudou, não ao tamanho da tabela de processos.
+"""
+import os
+import time
+from datetime import datetime
+
+import procfs
+import findings
+import signatures
+import persistence  # mesmos diretórios de units (sistema + homes do passwd) do índice de persistência
+
+R = "\033[31m"
+Y = "\033[33m"
+C = "\033[36m"
+RESET = "\033[0m"
+
+MODULE_SOURCES = ["/proc/modules", "/sys/module"]
+
+# ========================= COLETORES =========================
+def list_pids():
+    return {int(p) for p in os.listdir(procfs.PROC) if p.isdigit()}
+
+
+def list_modules():
+    try:
+        with open(MODULE_SOURCES[0]) as f:
+            return {line.split()[0] for line in f if line.strip()}
+    except OSError:
+        # kernel sem /proc/modules: /sys/module inclui built-ins, mas serve para diff
+        try:
+            return set(os.listdir(MODULE_SOURCES[1]))
+        except OSError:
+            return set()
+
+
+def list_ports():
+    """{(proto, ip, porta): inode} dos sockets em escuta."""
+    return {(s.proto, s.local_ip, s.port): s.inode
+            for s in procfs.listening_sockets(procfs.read_sockets())}
+
+
+def list_units():
+    """{caminho_da_unit: mtime_ns} — units de sistema e de usuário, descobertas por persistence."""
+    units = {}
+    for path in persistence.unit_files():
+        try:
+            units[path] = os.lstat(path).st_mtime_ns
+        except OSError:
+            continue
+    return units
+
+
+def collect():
+    return {"pids": list_pids(), "modules": list_modules(), "ports": list_ports(), "units": list_units()}
+
+
+# ========================= DIFF =========================
+def diff(old, new, backdoor_ports=None):
+    """Compara dois estados e devolve a lista de eventos [(severidade, texto, campos)]."""
+    events = []
+
+    for pid in sorted(new["pids"] - old["pids"]):
+        rec = procfs.read_process(pid)
+        if rec is None:
+            continue
+        if rec.deleted:
+            events.append(("high", f"novo processo com binário deletado: {procfs.format_record(rec)}",
+                           {"pid": pid, "path": rec.exe}))
+        elif procfs.SUSPICIOUS_DIRS_RE.search(rec.exe) or procfs.SUSPICIOUS_DIRS_RE.search(rec.cmdline):
+            events.append(("medium", f"novo processo em diretório suspeito: {procfs.format_record(rec)}",
+                           {"pid": pid, "path": rec.exe or None}))
+
+    for mod in sorted(new["modules"] - old["modules"]):
+        events.append(("high", f"novo módulo do kernel carregado: {mod}", {"module": mod}))
+    for mod in sorted(old["modules"] - new["modules"]):
+        # padrão clássico de LKM que se desvincula da lista de módulos para se esconder
+        events.append(("high", f"módulo do kernel removido/oculto: {mod}", {"module": mod, "removed": True}))
+
+    new_ports = set(new["ports"]) - set(old["ports"])
+    if new_ports:
+        owners = procfs.socket_owners(list_pids())
+        for key in sorted(new_ports):
+            proto, ip, port = key
+            pids = owners.get(new["ports"][key], [])
+            sig = signatures.match_port(backdoor_ports or {}, port, proto)
+            sev = "high" if sig else "medium"
+            text = f"nova porta em escuta: {proto} {ip}:{port} pid={pids or '?'}"
+            if sig:
+                text += f" ← {', '.join(sig)}"
+            events.append((sev, text, {"port": port, "pid": pids[0] if pids else None, "proto": proto}))
+    for proto, ip, port in sorted(set(old["ports"]) - set(new["ports"])):
+        events.append(("low", f"porta deixou de escutar: {proto} {ip}:{port}",
+                       {"port": port, "proto": proto, "removed": True}))
+
+    for path, mtime in sorted(new["units"].items()):
+        before = old["units"].get(path)
+        if before is None:
+            events.append(("high", f"nova unit do systemd: {path}", {"path": path}))
+        elif before != mtime:
+            events.append(("medium", f"unit do systemd modificada: {path}", {"path": path}))
+    for path in sorted(set(old["units"]) - set(new["units"])):
+        events.append(("medium", f"unit do systemd removida: {path}", {"path": path, "removed": True}))
+    return events
+
+
+# ========================= LOOP =========================
+def run(interval, ndjson_path=None, cycles=None):
+    """
+    Loop principal. interval em segundos; cycles=None roda até Ctrl+C.
+    Eventos vão para o terminal e, se ndjson_path for informado, para um NDJSON.
+    """
+    backdoor_ports = signatures.load_backdoor_ports()
+    nd = findings.NdjsonWriter(ndjson_path) if ndjson_path else None
+    state = collect()
+    print(f"{C}[+] Vigia ativo: intervalo {interval}s | {len(state['pids'])} PIDs, "
+          f"{len(state['modules'])} módulos, {len(state['ports'])} portas, {len(state['units'])} units{RESET}")
+    n = 0
+    try:
+        while cycles is None or n < cycles:
+            time.sleep(interval)
+            t0 = time.perf_counter()
+            current = collect()
+            events = diff(state, current, backdoor_ports)
+            state = current
+            n += 1
+            ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            for sev, text, fields in events:
+                color = R if sev in ("high", "critical") else Y
+                print(f"{color}[{ts}] [{sev.upper()}] {text}{RESET}")
+            if nd:
+                items = [{"check": "watch", "severity": sev, "evidence": text,
+                          "pid": None, "path": None, "port": None, **fields}
+                         for sev, text, fields in events]
+                nd.write_check("watch", items, round((time.perf_counter() - t0) * 1000, 1))
+    except KeyboardInterrupt:
+        print(f"\n{C}[+] Vigia encerrado após {n} ciclos.{RESET}")
+    finally:
+        if nd:
+            nd.close()
@@ -2,30 +2,293 @@
 # net_scan.py
 # ShadowSec Toolkit - Módulo scan de rede.
 # Por: Luciano Valadão
+#
+# Descoberta de hosts assíncrona: o alvo é dividido em sub-faixas (/24 por padrão) varridas em
+# paralelo por um de dois backends, e cada "host ativo" é emitido assim que aparece.
+# - nmap: vários processos `nmap -sn -oX -` simultâneos, XML lido incrementalmente
+# - tcp:  prober TCP-connect em Python puro (asyncio), sem nmap e sem root; conexão aceita
+#         ou recusada (RST) = host ativo
+# Resultados gravados incrementalmente (JSONL) — uma varredura interrompida retoma de onde
+# parou, pulando as sub-faixas já concluídas.
 
+import os
 import sys
-import nmap
+import json
+import time
+import shutil
+import asyncio
+import argparse
+import ipaddress
+import xml.etree.ElementTree as ET
 
-def scan_network(network):
-    nm = nmap.PortScanner()
-    print(f"Iniciando scan na rede: {network}")
-    nm.scan(hosts=network, arguments='-sn')  # Scan do tipo ping scan
+CHUNK_PREFIX = 24                       # tamanho das sub-faixas
+NMAP_WORKERS = os.cpu_count() or 2      # processos nmap simultâneos
+TCP_CONCURRENCY = 512                   # conexões TCP abertas ao mesmo tempo
+TCP_TIMEOUT = 1.0                       # segundos por tentativa de conexão
+TCP_PORTS = (22, 80, 443, 445, 3389, 139, 8080)
+# Diretórios do estado de retomada (o primeiro gravável vence)
+STATE_DIRS = ["/var/lib/shadowsec/net_scan", os.path.expanduser("~/.cache/shadowsec/net_scan")]
 
-    hosts_up = []
-    for host in nm.all_hosts():
-        if nm[host].state() == 'up':
+
+# ==================== SUB-FAIXAS ====================
+def ipv4_network(network):
+    """
+    Alvo como IPv4Network. IPv6 é recusado (ValueError): uma /64 ficaria numa sub-faixa só,
+    com 2^64 endereços enumerados em memória, e o backend nmap não roda com -6.
+    """
+    net = ipaddress.ip_network(network, strict=False)
+    if net.version != 4:
+        raise ValueError(f"apenas redes IPv4 são suportadas: {network}")
+    return net
+
+
+def split_targets(network, prefix=CHUNK_PREFIX):
+    """Divide o alvo (IP ou CIDR) em sub-faixas /prefix; faixas menores ficam inteiras."""
+    net = ipv4_network(network)
+    if net.prefixlen >= prefix:
+        return [str(net)]
+    return [str(sub) for sub in net.subnets(new_prefix=prefix)]
+
+
+def _hosts(chunk, network):
+    """Endereços da sub-faixa; só o endereço de rede e o broadcast do alvo inteiro ficam de fora."""
+    parent = ipaddress.ip_network(network, strict=False)
+    skip = {parent.network_address, parent.broadcast_address} if parent.num_addresses > 2 else set()
+    return [str(ip) for ip in ipaddress.ip_network(chunk, strict=False) if ip not in skip]
+
+
+# ==================== ESTADO EM DISCO (RETOMADA) ====================
+def state_path(network):
+    """Arquivo de estado do alvo no primeiro diretório gravável de STATE_DIRS (ou no diretório atual)."""
+    name = f"net_scan_{network.replace('/', '_')}.state.jsonl"
+    for d in STATE_DIRS:
+        try:
+            os.makedirs(d, exist_ok=True)
+        except OSError:
+            continue
+        if os.access(d, os.W_OK):
+            return os.path.join(d, name)
+    return name
+
+
+def load_state(path, network):
+    """
+    (sub-faixas concluídas, hosts já encontrados) de uma varredura anterior e INCOMPLETA do
+    mesmo alvo. Uma varredura que chegou ao fim ({"complete": true}) não é retomada.
+    """
+    done, hosts = set(), []
+    try:
+        with open(path) as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue  # última linha truncada por uma interrupção
+                if rec.get("target") not in (None, network) or rec.get("complete"):
+                    return set(), []
+                if "chunk" in rec:
+                    done.add(rec["chunk"])
+                elif "host" in rec and rec["host"] not in hosts:
+                    hosts.append(rec["host"])
+    except OSError:
+        pass
+    return done, hosts
+
+
+class StateWriter:
+    """Acrescenta eventos ao arquivo de estado com flush imediato (sobrevive a Ctrl+C/kill)."""
+
+    def __init__(self, path, network, fresh=False):
+        self.f = open(path, "w" if fresh else "a+")
+        self.network = network
+        if fresh or self.f.tell() == 0:
+            self.write({"target": network, "started": time.time()})
+        else:
+            # fecha a linha cortada por uma interrupção antes de acrescentar novos registros
+            self.f.seek(self.f.tell() - 1)
+            if self.f.read(1) != "\n":
+                self.f.write("\n")
+
+    def write(self, rec):
+        self.f.write(json.dumps(rec) + "\n")
+        self.f.flush()
+
+    def host(self, ip, backend):
+        self.write({"host": ip, "backend": backend, "ts": time.time()})
+
+    def chunk_done(self, chunk):
+        self.write({"chunk": chunk})
+
+    def complete(self, hosts):
+        """Fecha a varredura: a próxima execução começa do zero em vez de retomar."""
+        self.write({"complete": True, "hosts": len(hosts), "ts": time.time()})
+
+    def close(self):
+        self.f.close()
+
+
+# ==================== BACKEND NMAP ====================
+async def nmap_chunk(chunk, on_host):
+    """Um processo `nmap -sn -oX -` por sub-faixa; cada <host> up é entregue quando o XML fecha."""
+    proc = await asyncio.create_subprocess_exec(
+        "nmap", "-sn", "-n", "-oX", "-", chunk,
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL)
+    parser = ET.XMLPullParser(events=("start", "end"))
+    root, depth = None, 0
+    while True:
+        data = await proc.stdout.read(64 * 1024)
+        if not data:
+            break
+        parser.feed(data)
+        for event, elem in parser.read_events():
+            if event == "start":
+                root = elem if root is None else root
+                depth += 1
+                continue
+            depth -= 1
+            if depth != 1:
+                continue  # só filhos diretos de <nmaprun>
+            if elem.tag == "host":
+                status = elem.find("status")
+                addr = elem.find("address[@addrtype='ipv4']")
+                if status is not None and status.get("state") == "up" and addr is not None:
+                    on_host(addr.get("addr"))
+            root.remove(elem)  # clear() deixaria o elemento vazio pendurado na raiz
+    if await proc.wait() != 0:
+        raise RuntimeError(f"nmap falhou na sub-faixa {chunk}")
+
+
+# ==================== BACKEND TCP-CONNECT ====================
+async def tcp_probe(ip, ports, timeout, gate):
+    """Host ativo se alguma porta aceita a conexão ou responde com RST (conexão recusada)."""
+    async def attempt(port):
+        async with gate:
+            try:
+                _, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), timeout)
+                writer.close()
+                return True
+            except ConnectionRefusedError:
+                return True  # RST: a pilha TCP do host respondeu
+            except (OSError, asyncio.TimeoutError):
+                return False
+
+    tasks = [asyncio.ensure_future(attempt(p)) for p in ports]
+    try:
+        for fut in asyncio.as_completed(tasks):
+            if await fut:
+                return True
+        return False
+    finally:
+        for t in tasks:
+            t.cancel()
+
+
+async def tcp_chunk(chunk, on_host, ports=TCP_PORTS, timeout=TCP_TIMEOUT, gate=None, network=None):
+    gate = gate or asyncio.Semaphore(TCP_CONCURRENCY)
+
+    async def one(ip):
+        if await tcp_probe(ip, ports, timeout, gate):
+            on_host(ip)
+
+    await asyncio.gather(*(one(ip) for ip in _hosts(chunk, network or chunk)))
+
+
+# ==================== AGENDADOR ====================
+async def scan_async(network, backend="nmap", workers=None, chunk_prefix=CHUNK_PREFIX, state=None,
+                     skip=(), on_host=None, on_chunk=None, ports=TCP_PORTS, timeout=TCP_TIMEOUT):
+    """
+    Varre as sub-faixas ainda não concluídas com até `workers` em paralelo. on_host(ip) a cada
+    host ativo e on_chunk(faixa, concluídas, total) a cada sub-faixa; o estado é gravado a cada evento.
+    """
+    chunks = split_targets(network, chunk_prefix)
+    pending = [c for c in chunks if c not in set(skip)]
+    workers = workers or (NMAP_WORKERS if backend == "nmap" else 64)
+    gate = asyncio.Semaphore(max(1, workers))
+    tcp_gate = asyncio.Semaphore(TCP_CONCURRENCY)
+    found = []
+    finished = [len(chunks) - len(pending)]
+
+    def host_up(ip):
+        found.append(ip)
+        if state:
+            state.host(ip, backend)
+        if on_host:
+            on_host(ip)
+
+    async def run(chunk):
+        async with gate:
+            if backend == "nmap":
+                await nmap_chunk(chunk, host_up)
+            else:
+                await tcp_chunk(chunk, host_up, ports, timeout, tcp_gate, network)
+        # só marca como concluída depois que a sub-faixa terminou de fato
+        if state:
+            state.chunk_done(chunk)
+        finished[0] += 1
+        if on_chunk:
+            on_chunk(chunk, finished[0], len(chunks))
+
+    await asyncio.gather(*(run(c) for c in pending))
+    return found
+
+
+def scan_network(network, backend=None, workers=None, chunk_prefix=CHUNK_PREFIX, resume=True, state_file=None):
+    """Descoberta de hosts com retomada. Retorna a lista de IPs ativos (incluindo os da execução anterior)."""
+    ipv4_network(network)  # ValueError para IPv6/alvo inválido antes de criar estado
+    backend = backend or ("nmap" if shutil.which("nmap") else "tcp")
+    path = state_file or state_path(network)
+    done, previous = load_state(path, network) if resume else (set(), [])
+    print(f"Iniciando scan na rede: {network} (backend {backend}, sub-faixas /{chunk_prefix})")
+    if done:
+        print(f"Retomando: {len(done)} sub-faixas já concluídas, {len(previous)} hosts já encontrados.")
+        for host in previous:
             print(f"Host ativo encontrado: {host}")
-            hosts_up.append(host)
+
+    hosts_up = list(previous)
+    t0 = time.monotonic()
+
+    def on_host(ip):
+        if ip not in hosts_up:
+            hosts_up.append(ip)
+            print(f"Host ativo encontrado: {ip}")
+
+    def on_chunk(chunk, finished, total):
+        print(f"[{finished}/{total}] sub-faixa {chunk} concluída ({time.monotonic() - t0:.1f}s)")
+
+    state = StateWriter(path, network, fresh=not resume or not done)
+    try:
+        asyncio.run(scan_async(network, backend, workers, chunk_prefix, state, done, on_host, on_chunk))
+        state.complete(hosts_up)  # só chega aqui se todas as sub-faixas terminaram
+    finally:
+        state.close()
     if not hosts_up:
         print("Nenhum host ativo encontrado na rede.")
-    return hosts_up
+    print(f"Scan concluído em {time.monotonic() - t0:.1f}s: {len(hosts_up)} hosts ativos (estado em {path}).")
+    return sorted(hosts_up, key=ipaddress.ip_address)
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Uso: python net_scan.py <rede>")
-        print("Exemplo: python net_scan.py 192.168.0.0/24")
-        sys.exit(1)
-
-    network = sys.argv[1]
-    scan_network(network)
+    parser = argparse.ArgumentParser(description="ShadowSec Toolkit - scan de rede",
+                                     epilog="Exemplo: python net_scan.py 192.168.0.0/24")
+    parser.add_argument("rede", help="IP ou faixa CIDR")
+    parser.add_argument("--backend", choices=("nmap", "tcp"),
+                        help="nmap (padrão, se instalado) ou tcp (TCP-connect em Python puro)")
+    parser.add_argument("--workers", type=int, help="Sub-faixas varridas em paralelo")
+    parser.add_argument("--chunk-prefix", type=int, default=CHUNK_PREFIX, help="Tamanho das sub-faixas (padrão /24)")
+    parser.add_argument("--state", help="Arquivo de estado (padrão: net_scan_<rede>.state.jsonl em "
+                                        "/var/lib/shadowsec/net_scan ou ~/.cache/shadowsec/net_scan)")
+    parser.add_argument("--fresh", action="store_true", help="Ignora o estado anterior e recomeça do zero")
+    args = parser.parse_args()
 
+    try:
+        ipv4_network(args.rede)
+    except ValueError as e:
+        print(f"Rede inválida: {e}")
+        sys.exit(1)
+    try:
+        scan_network(args.rede, args.backend, args.workers, args.chunk_prefix, not args.fresh, args.state)
+    except RuntimeError as e:
+        print(f"Erro: {e} — execute de novo para retomar.")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        print("\nInterrompido — execute de novo para retomar.")
+        sys.exit(130)
@@ -4,17 +4,40 @@
 ShadowSec Permission Auditor & Hardener
 - Verifica permissões, dono e grupo conforme regras seguras.
 - Permite aplicar correções interativamente ou em modo --auto.
+- Um único stat por caminho (PathState) alimenta checagem, relatório e plano de correção;
+  as correções são aplicadas em lote e reverificadas com um stat por caminho corrigido.
+- Baseline compacto e ordenado (caminho, modo, uid, gid, inode, mtime) gravado a cada
+  auditoria; --diff reporta só o que mudou desde a última, via merge em streaming.
+- Nomes de usuário/grupo resolvidos por um índice bidirecional (IdentityMap) com
+  fallback NSS memorizado (LDAP/SSSD).
+- Regras recursivas/glob (TREE_RULES) aplicadas a árvores inteiras com um walker
+  concorrente baseado em os.scandir (um lstat por entrada, violações em streaming).
+- Correções transacionais: plano → journal write-ahead (fsync) → fchown/fchmod pelo fd,
+  em lotes; --dry-run mostra o plano e o custo, --rollback JOURNAL desfaz.
+- Inventário SUID/SGID/world-writable (--inventory) de todos os fs reais (mountinfo), sem
+  cruzar montagens, com índice por inode de diretório: só relê diretórios cujo mtime mudou;
+  novos SUID/SGID são reportados como drift.
+- Políticas em arquivo (JSON/TOML/YAML) com includes e papéis (--policy/--role),
+  compiladas em uma trie de prefixos e mantidas em cache pelo hash dos arquivos.
 - Registro em /var/log/shadowsec_permission_audit.log (se permitido) e ./shadowsec_permission_audit.log
+
+Benchmark do walker em árvore sintética:
+    python3 permission_audit.py --bench-tree 1000000
 """
 
 import os
+import re
+import pwd
+import grp
+import hashlib
 import stat
 import argparse
 import datetime
 import json
 import sys
 import shutil
-from typing import Tuple, Dict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Tuple, Dict, List, Iterator, NamedTuple, Optional
 
 LOG_PATHS = ["/var/log/shadowsec_permission_audit.log", "./shadowsec_permission_audit.log"]
 
@@ -100,37 +123,145 @@ def parse_group() -> Dict[int, str]:
         pass
     return d
 
-PWD_CACHE = parse_passwd()
-GRP_CACHE = parse_group()
+class IdentityMap:
+    """
+    uid/gid <-> nome em O(1) nos dois sentidos.
+    Fonte primária: /etc/passwd e /etc/group. O que não estiver neles (LDAP, SSSD, ...)
+    é consultado via NSS (pwd/grp) uma única vez; acertos e ausências ficam memorizados,
+    então auditar milhões de arquivos custa no máximo uma consulta NSS por id distinto.
+    invalidate() descarta tudo (ex.: após criar usuários/grupos durante a execução).
+    """
+
+    def __init__(self):
+        self.invalidate()
+
+    def invalidate(self):
+        self.uid_to_name = parse_passwd()
+        self.gid_to_name = parse_group()
+        self.name_to_uid: Dict[str, int] = {}
+        self.name_to_gid: Dict[str, int] = {}
+        for uid, name in self.uid_to_name.items():
+            self.name_to_uid.setdefault(name, uid)
+        for gid, name in self.gid_to_name.items():
+            self.name_to_gid.setdefault(name, gid)
+        self._missing = set()  # consultas NSS sem resultado: ("u", uid), ("U", nome), ...
+
+    def _nss(self, key, lookup, forward, reverse):
+        if key in self._missing:
+            return None
+        try:
+            entry = lookup(key[1])
+        except (KeyError, OverflowError):
+            self._missing.add(key)
+            return None
+        name, ident = entry[0], entry[2]
+        forward.setdefault(ident, name)
+        reverse.setdefault(name, ident)
+        return entry
+
+    def user(self, uid: int) -> Optional[str]:
+        name = self.uid_to_name.get(uid)
+        if name is None and self._nss(("u", uid), pwd.getpwuid, self.uid_to_name, self.name_to_uid):
+            name = self.uid_to_name.get(uid)
+        return name
+
+    def uid(self, name: str) -> Optional[int]:
+        uid = self.name_to_uid.get(name)
+        if uid is None and self._nss(("U", name), pwd.getpwnam, self.uid_to_name, self.name_to_uid):
+            uid = self.name_to_uid.get(name)
+        return uid
+
+    def group(self, gid: int) -> Optional[str]:
+        name = self.gid_to_name.get(gid)
+        if name is None and self._nss(("g", gid), grp.getgrgid, self.gid_to_name, self.name_to_gid):
+            name = self.gid_to_name.get(gid)
+        return name
+
+    def gid(self, name: str) -> Optional[int]:
+        gid = self.name_to_gid.get(name)
+        if gid is None and self._nss(("G", name), grp.getgrnam, self.gid_to_name, self.name_to_gid):
+            gid = self.name_to_gid.get(name)
+        return gid
+
+    def group_exists(self, name: str) -> bool:
+        return self.gid(name) is not None
+
+IDENTITIES = IdentityMap()
+
+def invalidate_identities():
+    """Hook de invalidação: relê /etc/passwd e /etc/group e esquece as consultas NSS."""
+    IDENTITIES.invalidate()
+
+def owner_name(uid: int) -> str:
+    name = IDENTITIES.user(uid)
+    return name if name is not None else f"UID{uid}"
+
+def group_name(gid: int) -> str:
+    name = IDENTITIES.group(gid)
+    return name if name is not None else f"GID{gid}"
+
+# ---------------------------
+# Snapshot de estado: UMA chamada stat por caminho.
+# Checagem, relatório e plano de correção consomem o mesmo objeto.
+# ---------------------------
+class PathState(NamedTuple):
+    path: str
+    exists: bool
+    mode: Optional[int] = None      # S_IMODE
+    kind: Optional[str] = None      # "file", "dir", "link", "special"
+    uid: Optional[int] = None
+    gid: Optional[int] = None
+    ino: Optional[int] = None
+    mtime_ns: Optional[int] = None
+
+    @property
+    def owner(self) -> Optional[str]:
+        return owner_name(self.uid) if self.exists else None
+
+    @property
+    def group(self) -> Optional[str]:
+        return group_name(self.gid) if self.exists else None
+
+def _entry_kind(mode: int) -> str:
+    if stat.S_ISDIR(mode):
+        return "dir"
+    if stat.S_ISLNK(mode):
+        return "link"
+    if stat.S_ISREG(mode):
+        return "file"
+    return "special"  # dispositivo, FIFO, socket
+
+def from_stat(path: str, st: os.stat_result) -> PathState:
+    return PathState(path, True, stat.S_IMODE(st.st_mode), _entry_kind(st.st_mode),
+                     st.st_uid, st.st_gid, st.st_ino, st.st_mtime_ns)
+
+def take_snapshot(path: str, follow: bool = True) -> PathState:
+    """stat (ou lstat, se follow=False) único do caminho; inexistente → PathState(exists=False)."""
+    try:
+        st = os.stat(path) if follow else os.lstat(path)
+    except (FileNotFoundError, NotADirectoryError):
+        return PathState(path, False)
+    return from_stat(path, st)
 
 def resolve_owner_group(path: str) -> Tuple[str, str]:
     """
     Retorna (owner_name, group_name). Usa parsing de /etc/passwd e /etc/group como fonte primária.
     Se não resolvido, retorna UID/GID textual.
     """
-    try:
-        st = os.stat(path)
-    except FileNotFoundError:
-        raise
-    uid = st.st_uid
-    gid = st.st_gid
-    owner = PWD_CACHE.get(uid)
-    group = GRP_CACHE.get(gid)
-    if owner is None:
-        owner = f"UID{uid}"
-    if group is None:
-        group = f"GID{gid}"
-    return owner, group
+    snap = take_snapshot(path)
+    if not snap.exists:
+        raise FileNotFoundError(path)
+    return snap.owner, snap.group
 
 # ---------------------------
 # Helpers para aplicar correções
 # ---------------------------
 
 def name_to_uid(name: str) -> int:
-    # tenta mapear via parsing; se falhar, tenta int() e eventualmente levantar
-    for uid, uname in PWD_CACHE.items():
-        if uname == name:
-            return uid
+    # tenta mapear via índice (arquivos + NSS); se falhar, tenta int() e eventualmente levantar
+    uid = IDENTITIES.uid(name)
+    if uid is not None:
+        return uid
     # fallback: try to parse numeric
     try:
         return int(name)
@@ -138,85 +269,1264 @@ def name_to_uid(name: str) -> int:
         raise KeyError(f"Usuário {name} não encontrado")
 
 def name_to_gid(name: str) -> int:
-    for gid, gname in GRP_CACHE.items():
-        if gname == name:
-            return gid
+    gid = IDENTITIES.gid(name)
+    if gid is not None:
+        return gid
     try:
         return int(name)
     except Exception:
         raise KeyError(f"Grupo {name} não encontrado")
 
-def apply_fix(path: str, expected: dict) -> Tuple[bool, str]:
+def fix_target(snap: PathState, expected: dict) -> dict:
     """
-    Aplica chmod e chown conforme esperado.
-    Retorna (success, mensagem).
+    Valores a aplicar para deixar `snap` conforme `expected` (sem syscalls).
+    max_mode remove só os bits excedentes; grupo esperado inexistente → fallback 'root'
+    (ou mantém o atual).
     """
-    messages = []
+    target = {}
+    if "mode" in expected:
+        target["mode"] = expected["mode"]
+    elif "max_mode" in expected and snap.mode is not None:
+        target["mode"] = snap.mode & expected["max_mode"]
+    if "owner" in expected:
+        target["owner"] = expected["owner"]
+    exp_group = expected.get("group")
+    if exp_group:
+        if IDENTITIES.group_exists(exp_group):
+            target["group"] = exp_group
+        else:
+            target["group"] = "root" if IDENTITIES.group_exists("root") else snap.group
+    return target
+
+# ---------------------------
+# Correções transacionais
+# 1) plano: cada violação vira um FixOp com os valores numéricos finais (nomes já resolvidos)
+# 2) por lote: as intenções (estado original + novo) vão para o journal e sofrem fsync
+#    ANTES de qualquer alteração; depois fchown/fchmod pelo fd e registro do commit do lote
+# 3) --rollback JOURNAL restaura o estado original de tudo que o journal registrou
+# ---------------------------
+JOURNAL_DIRS = ["/var/lib/shadowsec/journals", "."]
+FIX_BATCH = 1000
+
+
+class FixOp(NamedTuple):
+    snap: PathState
+    expected: dict
+    mode: Optional[int]   # None = mantém
+    uid: Optional[int]
+    gid: Optional[int]
+
+    def describe(self) -> str:
+        parts = []
+        if self.mode is not None:
+            parts.append(f"modo {oct(self.snap.mode)} → {oct(self.mode)}")
+        if self.uid is not None:
+            parts.append(f"dono {self.snap.owner} → {owner_name(self.uid)}")
+        if self.gid is not None:
+            parts.append(f"grupo {self.snap.group} → {group_name(self.gid)}")
+        return "; ".join(parts)
+
+
+def plan_fix(snap: PathState, expected: dict, target: Optional[dict] = None) -> FixOp:
+    """Converte o alvo em valores numéricos, só para o que difere do snapshot. KeyError se nome inválido."""
+    target = fix_target(snap, expected) if target is None else target
+    mode = target.get("mode")
+    uid = name_to_uid(target["owner"]) if target.get("owner") is not None else None
+    gid = name_to_gid(target["group"]) if target.get("group") is not None else None
+    return FixOp(snap, expected,
+                 mode if mode is not None and mode != snap.mode else None,
+                 uid if uid is not None and uid != snap.uid else None,
+                 gid if gid is not None and gid != snap.gid else None)
+
+
+def _op_message(op: FixOp) -> str:
+    parts = []
+    if op.mode is not None:
+        parts.append(f"mode->{oct(op.mode)}")
+    if op.uid is not None or op.gid is not None:
+        parts.append(f"owner->{owner_name(op.uid) if op.uid is not None else op.snap.owner}, "
+                     f"group->{group_name(op.gid) if op.gid is not None else op.snap.group}")
+    return ", ".join(parts) or "nada a alterar"
+
+
+def _apply_op(op: FixOp, follow: bool = True) -> Tuple[bool, str, PathState]:
+    """
+    Aplica um FixOp. Arquivos regulares e diretórios são abertos UMA vez: o fd garante que
+    fchown/fchmod atingem o mesmo inode auditado (substituições são detectadas pelo fstat)
+    e o fstat final serve de reverificação. chown vem antes do chmod, pois o kernel limpa
+    SUID/SGID na troca de dono — por isso, após qualquer chown, o modo é sempre reaplicado
+    (o do FixOp ou, se ele não altera o modo, o original do snapshot/journal).
+    """
+    path = op.snap.path
+    uid = -1 if op.uid is None else op.uid
+    gid = -1 if op.gid is None else op.gid
+    chown = uid != -1 or gid != -1
+    mode = op.mode if op.mode is not None or not chown else op.snap.mode
     try:
-        # modo
-        mode = expected.get("mode")
-        if mode is not None:
-            os.chmod(path, mode)
-            messages.append(f"mode->{oct(mode)}")
-        # owner/group
-        owner = expected.get("owner")
-        group = expected.get("group")
-        if owner is not None or group is not None:
-            uid = name_to_uid(owner) if owner is not None else os.stat(path).st_uid
-            gid = name_to_gid(group) if group is not None else os.stat(path).st_gid
-            os.chown(path, uid, gid)
-            messages.append(f"owner->{owner}, group->{group}")
-        return True, ", ".join(messages)
+        fd = None
+        if op.snap.kind in ("file", "dir"):
+            flags = os.O_RDONLY | os.O_NONBLOCK | os.O_NOCTTY | os.O_CLOEXEC | (0 if follow else os.O_NOFOLLOW)
+            try:
+                fd = os.open(path, flags)
+            except PermissionError:
+                fd = None  # sem leitura (usuário comum): cai para o caminho
+        if fd is not None:
+            try:
+                if op.snap.ino is not None and os.fstat(fd).st_ino != op.snap.ino:
+                    return False, "Arquivo substituído desde a auditoria (inode diferente) — ignorado.", op.snap
+                if chown:
+                    os.fchown(fd, uid, gid)
+                if mode is not None:
+                    os.fchmod(fd, mode)
+                after = from_stat(path, os.fstat(fd))
+            finally:
+                os.close(fd)
+        else:
+            if chown:
+                os.chown(path, uid, gid, follow_symlinks=follow)
+            if mode is not None and (follow or op.snap.kind != "link"):
+                os.chmod(path, mode)
+            after = take_snapshot(path, follow)
+        return True, _op_message(op), after
     except PermissionError:
-        return False, "Permissão negada (execute como root)."
-    except KeyError as e:
-        return False, f"Falha ao resolver usuário/grupo: {e}"
+        return False, "Permissão negada (execute como root).", op.snap
     except FileNotFoundError:
-        return False, "Arquivo/diretório não encontrado."
+        return False, "Arquivo/diretório não encontrado.", op.snap
     except Exception as e:
-        return False, f"Erro aplicando correção: {e}"
+        return False, f"Erro aplicando correção: {e}", op.snap
 
-# ---------------------------
-# Checagem
-# ---------------------------
-def check_path(path: str, expected: dict) -> Tuple[bool, list]:
+
+def apply_fix(path: str, expected: dict, snap: Optional[PathState] = None) -> Tuple[bool, str]:
     """
-    Retorna (is_ok, list_of_issues)
+    Aplica chmod e chown conforme esperado (um caminho, sem journal).
+    snap: estado já lido do caminho (evita novo stat).
+    Retorna (success, mensagem).
     """
-    issues = []
-    if not os.path.exists(path):
-        issues.append("INEXISTENTE")
-        return False, issues
-
-    st = os.stat(path)
-    current_mode = stat.S_IMODE(st.st_mode)
+    snap = snap if snap is not None and snap.exists else take_snapshot(path)
+    if not snap.exists:
+        return False, "Arquivo/diretório não encontrado."
     try:
-        owner, group = resolve_owner_group(path)
-    except FileNotFoundError:
-        issues.append("INEXISTENTE")
-        return False, issues
+        op = plan_fix(snap, {}, expected)
+    except KeyError as e:
+        return False, f"Falha ao resolver usuário/grupo: {e}"
+    success, message, _ = _apply_op(op)
+    return success, message
+
+
+def _journal_path() -> str:
+    name = f"shadowsec_permission_journal_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.jsonl"
+    for d in JOURNAL_DIRS:
+        try:
+            os.makedirs(d, exist_ok=True)
+        except OSError:
+            continue
+        if os.access(d, os.W_OK):
+            return os.path.join(d, name)
+    return name
+
+
+def _journal_write(f, obj: dict):
+    f.write(json.dumps(obj) + "\n")
+
+
+def _sync(f):
+    f.flush()
+    os.fsync(f.fileno())
+
+
+def plan_fixes(plan: List[Tuple[PathState, dict, dict]]) -> Tuple[List[FixOp], List[Tuple[PathState, str]]]:
+    """Resolve o plano inteiro antes de tocar no disco. Retorna (operações, [(snapshot, erro)])."""
+    ops, errors = [], []
+    for snap, expected, target in plan:
+        try:
+            op = plan_fix(snap, expected, target)
+        except KeyError as e:
+            errors.append((snap, f"Falha ao resolver usuário/grupo: {e}"))
+            continue
+        if op.mode is not None or op.uid is not None or op.gid is not None:
+            ops.append(op)
+    return ops, errors
+
+
+def print_plan(ops: List[FixOp], batch_size: int = FIX_BATCH):
+    """Dry-run: lista as alterações e o custo estimado, sem aplicar nada."""
+    log(f"=== PLANO DE CORREÇÃO (dry-run) — {len(ops)} caminhos ===")
+    journal_bytes = 0
+    for op in ops:
+        log(f"  {op.snap.path}: {op.describe()}")
+        journal_bytes += len(json.dumps(_intent(0, 0, op))) + 1
+    n_chmod = sum(1 for op in ops if op.mode is not None)
+    n_chown = sum(1 for op in ops if op.uid is not None or op.gid is not None)
+    batches = -(-len(ops) // batch_size) if ops else 0
+    # por caminho: open + fstat + [fchown] + [fchmod] + fstat + close (fchmod sempre após fchown)
+    syscalls = 5 * len(ops) + n_chown
+    log(f"chmod: {n_chmod} | chown: {n_chown} | lotes: {batches} (até {batch_size} por lote, "
+        f"1 fsync do journal antes e depois de cada) | syscalls estimadas: ~{syscalls} | "
+        f"journal: ~{max(1, journal_bytes // 1024)} KiB")
+
+
+def _intent(batch: int, seq: int, op: FixOp) -> dict:
+    s = op.snap
+    return {"type": "intent", "batch": batch, "seq": seq, "path": s.path, "ino": s.ino,
+            "old": {"mode": s.mode, "uid": s.uid, "gid": s.gid},
+            "new": {"mode": op.mode, "uid": op.uid, "gid": op.gid}}
+
+
+def apply_fixes(plan: List[Tuple[PathState, dict, dict]], follow: bool = True, batch_size: int = FIX_BATCH):
+    """
+    Fase de correção transacional em lotes. plan: [(snapshot, regra_esperada, alvo)].
+    Gera (snapshot_novo, sucesso, mensagem, problemas) — o snapshot novo vem do fstat
+    do próprio fd, sem nova resolução de caminho nem releitura de /etc/passwd e /etc/group.
+    """
+    ops, errors = plan_fixes(plan)
+    for snap, message in errors:
+        yield snap, False, message, None
+    if not ops:
+        return
+    journal = _journal_path()
+    log(f"[INFO] Journal de correções: {journal} (desfazer com --rollback {journal})")
+    with open(journal, "w") as jf:
+        _journal_write(jf, {"type": "header", "version": 1, "created": datetime.datetime.now().isoformat(),
+                            "follow": follow, "count": len(ops)})
+        for batch, start in enumerate(range(0, len(ops), batch_size)):
+            chunk = ops[start:start + batch_size]
+            for seq, op in enumerate(chunk, start):
+                _journal_write(jf, _intent(batch, seq, op))
+            _sync(jf)  # write-ahead: nada é alterado antes das intenções estarem em disco
+            applied, failed = [], {}
+            results = []
+            for seq, op in enumerate(chunk, start):
+                success, message, after = _apply_op(op, follow)
+                if success:
+                    applied.append(seq)
+                else:
+                    failed[str(seq)] = message
+                results.append((op, success, message, after))
+            _journal_write(jf, {"type": "commit", "batch": batch, "applied": applied, "failed": failed})
+            _sync(jf)
+            for op, success, message, after in results:
+                yield after, success, message, evaluate(after, op.expected) if success else None
 
+
+def rollback(journal: str) -> Tuple[int, int]:
+    """
+    Restaura dono/grupo/modo originais de todas as intenções do journal (em ordem inversa).
+    Intenções de um lote sem commit também são restauradas — restaurar é idempotente.
+    Caminhos cujo inode mudou desde a correção são ignorados. Retorna (restaurados, ignorados).
+    """
+    with open(journal) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    header = records[0] if records and records[0].get("type") == "header" else {}
+    follow = header.get("follow", True)
+    intents = [r for r in records if r.get("type") == "intent"]
+    log(f"=== ROLLBACK {journal} ({len(intents)} intenções) ===")
+    restored = skipped = 0
+    for r in reversed(intents):
+        old, new = r["old"], r["new"]
+        snap = take_snapshot(r["path"], follow)
+        if not snap.exists or (r.get("ino") is not None and snap.ino != r["ino"]):
+            log(f"[AVISO] {r['path']}: ausente ou substituído — não restaurado")
+            skipped += 1
+            continue
+        # a troca de dono/grupo limpou SUID/SGID: o modo original volta junto
+        chowned = new["uid"] is not None or new["gid"] is not None
+        op = FixOp(snap, {}, old["mode"] if new["mode"] is not None or chowned else None,
+                   old["uid"] if new["uid"] is not None else None,
+                   old["gid"] if new["gid"] is not None else None)
+        success, message, _ = _apply_op(op, follow)
+        if success:
+            restored += 1
+            log(f"[RESTAURADO] {r['path']} ({message})")
+        else:
+            skipped += 1
+            log(f"[ERRO] {r['path']}: {message}")
+    with open(journal, "a") as f:
+        _journal_write(f, {"type": "rollback", "ts": datetime.datetime.now().isoformat(),
+                           "restored": restored, "skipped": skipped})
+    log(f"Rollback concluído: {restored} restaurados, {skipped} ignorados.")
+    return restored, skipped
+
+# ---------------------------
+# Checagem
+# ---------------------------
+def evaluate(snap: PathState, expected: dict) -> list:
+    """Compara um snapshot com a regra. Não faz syscalls."""
+    if not snap.exists:
+        return ["INEXISTENTE"]
+    issues = []
     if "mode" in expected:
-        if current_mode != expected["mode"]:
-            issues.append(f"Permissão incorreta: {oct(current_mode)} (esperado {oct(expected['mode'])})")
+        if snap.mode != expected["mode"]:
+            issues.append(f"Permissão incorreta: {oct(snap.mode)} (esperado {oct(expected['mode'])})")
+    if "max_mode" in expected:
+        if snap.mode & ~expected["max_mode"]:
+            issues.append(f"Permissão excessiva: {oct(snap.mode)} (máximo {oct(expected['max_mode'])})")
     if "owner" in expected:
-        if owner != expected["owner"]:
-            issues.append(f"Dono incorreto: {owner} (esperado {expected['owner']})")
+        if snap.owner != expected["owner"]:
+            issues.append(f"Dono incorreto: {snap.owner} (esperado {expected['owner']})")
     if "group" in expected:
         # se esperado é shadow mas shadow não existe, aceitaremos root como fallback (não marcar)
         exp_group = expected["group"]
-        if exp_group not in GRP_CACHE.values():
+        if not IDENTITIES.group_exists(exp_group):
             # fallback: se o grupo esperado não existe, ignorar checagem de grupo
             pass
         else:
-            if group != exp_group:
-                issues.append(f"Grupo incorreto: {group} (esperado {exp_group})")
-    is_ok = (len(issues) == 0)
-    return is_ok, issues
+            if snap.group != exp_group:
+                issues.append(f"Grupo incorreto: {snap.group} (esperado {exp_group})")
+    return issues
+
+def check_path(path: str, expected: dict, snap: Optional[PathState] = None) -> Tuple[bool, list]:
+    """
+    Retorna (is_ok, list_of_issues)
+    """
+    issues = evaluate(snap or take_snapshot(path), expected)
+    return not issues, issues
+
+# ---------------------------
+# Regras recursivas / glob (árvores inteiras)
+# pattern: caminho absoluto com glob — "*" e "?" não cruzam "/", "**" cruza níveis
+# kind: "file" (regular), "dir", "special" ou None (qualquer tipo; symlinks nunca são avaliados)
+# mode: modo exato | max_mode: nenhum bit além destes (ex.: 0o600 → no máximo rw- para o dono)
+# Precedência: prefixo literal mais profundo primeiro; no mesmo prefixo, a primeira
+# regra declarada vence → declare as mais específicas primeiro.
+# ---------------------------
+TREE_RULES = [
+    {"pattern": "/etc/ssh/ssh_host_*_key", "kind": "file", "max_mode": 0o600, "owner": "root", "group": "root"},
+    {"pattern": "/etc/ssh/**", "kind": "dir", "max_mode": 0o755, "owner": "root", "group": "root"},
+    {"pattern": "/etc/ssh/**", "kind": "file", "max_mode": 0o644, "owner": "root", "group": "root"},
+    {"pattern": "/etc/sudoers.d/*", "kind": "file", "max_mode": 0o440, "owner": "root", "group": "root"},
+    {"pattern": "/etc/cron.d/*", "kind": "file", "max_mode": 0o644, "owner": "root"},
+    {"pattern": "/root/.ssh/**", "kind": "dir", "max_mode": 0o700, "owner": "root"},
+    {"pattern": "/root/.ssh/**", "kind": "file", "max_mode": 0o600, "owner": "root"},
+    {"pattern": "/usr/local/bin/**", "kind": "file", "max_mode": 0o755, "owner": "root"},
+]
+
+WALK_WORKERS = min(32, (os.cpu_count() or 1) * 4)  # I/O de metadados → mais threads que núcleos
+_GLOB_CHARS = set("*?[")
+
+
+class Rule(NamedTuple):
+    pattern: str
+    regex: "re.Pattern"
+    root: str
+    kind: Optional[str]
+    expected: dict
+
+
+def glob_to_regex(pattern: str) -> "re.Pattern":
+    out, i = [], 0
+    while i < len(pattern):
+        c = pattern[i]
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")  # zero ou mais diretórios: /a/**/b casa /a/b
+            i += 3
+            continue
+        if pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+            continue
+        if c == "*":
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            j = pattern.find("]", i + 1)
+            if j == -1:
+                out.append(re.escape(c))
+            else:
+                out.append(pattern[i:j + 1].replace("[!", "[^", 1))
+                i = j
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return re.compile("".join(out) + r"\Z")
+
+
+def literal_root(pattern: str) -> str:
+    """Maior diretório sem curingas no início do padrão (ponto de partida da varredura)."""
+    parts = pattern.rstrip("/").split("/")
+    for idx, part in enumerate(parts):
+        if _GLOB_CHARS & set(part):
+            return "/".join(parts[:idx]) or "/"
+    return os.path.dirname(pattern.rstrip("/")) or "/"
+
+
+def _trie_node() -> dict:
+    return {"r": [], "c": {}}
+
+
+class RuleIndex:
+    """
+    Regras indexadas em uma trie por componente do prefixo literal de cada padrão
+    ("/etc/ssh/**" fica no nó etc → ssh). Casar um caminho percorre só os nós ao longo
+    dele — O(profundidade) — e testa apenas as regras penduradas nesses nós.
+    Precedência: nó mais profundo primeiro; no mesmo nó, ordem de declaração.
+    """
+
+    def __init__(self, rules: List[Rule], trie: Optional[dict] = None):
+        self.rules = rules
+        if trie is None:
+            trie = _trie_node()
+            for idx, r in enumerate(rules):
+                node = trie
+                for comp in _components(r.root):
+                    node = node["c"].setdefault(comp, _trie_node())
+                node["r"].append(idx)
+        self.trie = trie
+        # componentes de cada padrão, para a poda da varredura (None = "**", casa qualquer resto)
+        self.parts = [[None if "**" in comp else glob_to_regex(comp) for comp in _components(r.pattern)]
+                      for r in rules]
+
+    def __len__(self):
+        return len(self.rules)
+
+    def __iter__(self):
+        return iter(self.rules)
+
+    def match(self, path: str, kind: str) -> Optional[Rule]:
+        node = self.trie
+        chain = [node]
+        for comp in _components(path):
+            node = node["c"].get(comp)
+            if node is None:
+                break
+            chain.append(node)
+        for node in reversed(chain):
+            for idx in node["r"]:
+                r = self.rules[idx]
+                if (r.kind is None or r.kind == kind) and r.regex.match(path):
+                    return r
+        return None
+
+    def can_descend(self, path: str) -> bool:
+        """
+        True se algum caminho abaixo do diretório `path` pode casar com alguma regra
+        (ex.: com "/home/*/.ssh", desce em /home/ana mas não em /home/ana/Documentos).
+        """
+        comps = _components(path)
+        for parts in self.parts:
+            for idx, comp in enumerate(comps):
+                if idx >= len(parts) or parts[idx] is None or not parts[idx].match(comp):
+                    break
+            else:
+                if len(parts) > len(comps):
+                    return True
+                continue
+            if idx < len(parts) and parts[idx] is None:
+                return True
+        return False
+
+
+def _components(path: str) -> List[str]:
+    return [c for c in path.split("/") if c]
+
+
+def compile_rules(rules: List[dict], trie: Optional[dict] = None) -> RuleIndex:
+    compiled = []
+    for r in rules:
+        expected = {k: v for k, v in r.items() if k in ("mode", "max_mode", "owner", "group")}
+        compiled.append(Rule(r["pattern"], glob_to_regex(r["pattern"]), literal_root(r["pattern"]),
+                             r.get("kind"), expected))
+    return RuleIndex(compiled, trie)
+
+
+def walk_roots(rules: RuleIndex) -> List[str]:
+    """Raízes distintas a varrer (descarta as que já estão dentro de outra raiz)."""
+    roots = []
+    for root in sorted({r.root for r in rules}):
+        if not any(root == p or root.startswith(p.rstrip("/") + "/") for p in roots):
+            roots.append(root)
+    return roots
+
+
+def tree_index() -> RuleIndex:
+    """TREE_RULES compiladas (já vem compilado quando carregado de um arquivo de política)."""
+    return TREE_RULES if isinstance(TREE_RULES, RuleIndex) else compile_rules(TREE_RULES)
+
+
+def match_rule(path: str, st: os.stat_result, rules: RuleIndex) -> Optional[Rule]:
+    kind = _entry_kind(st.st_mode)
+    if kind == "link":
+        return None
+    return rules.match(path, kind)
+
+
+def _scan_dir(path: str):
+    """Lê um diretório: [(caminho, lstat)] de cada entrada + subdiretórios a descer."""
+    entries, subdirs = [], []
+    try:
+        with os.scandir(path) as it:
+            for e in it:
+                try:
+                    st = e.stat(follow_symlinks=False)  # único lstat da entrada
+                except OSError:
+                    continue
+                entries.append((e.path, st))
+                if stat.S_ISDIR(st.st_mode):
+                    subdirs.append(e.path)
+    except OSError:
+        pass
+    return entries, subdirs
+
+
+def walk_tree(roots: List[str], workers: int = WALK_WORKERS,
+              prune: Optional[Callable[[str], bool]] = None) -> Iterator[Tuple[str, os.stat_result]]:
+    """
+    Varredura concorrente: cada diretório é lido por um thread do pool e as entradas são
+    entregues assim que o diretório termina (streaming, ordem não determinística).
+    prune(dir) → False impede a descida no diretório (suas entradas diretas já foram entregues).
+    """
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        pending = set()
+        for root in roots:
+            try:
+                st = os.lstat(root)
+            except OSError:
+                continue
+            yield root, st
+            if stat.S_ISDIR(st.st_mode) and (prune is None or prune(root)):
+                pending.add(pool.submit(_scan_dir, root))
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                entries, subdirs = fut.result()
+                for d in subdirs:
+                    if prune is None or prune(d):
+                        pending.add(pool.submit(_scan_dir, d))
+                yield from entries
+
+
+def audit_tree(rules: RuleIndex, workers: int = WALK_WORKERS, roots: Optional[List[str]] = None):
+    """Gera (snapshot, regra, problemas) para cada violação, à medida que são encontradas."""
+    for path, st in walk_tree(roots or walk_roots(rules), workers, rules.can_descend):
+        rule = match_rule(path, st, rules)
+        if rule is None:
+            continue
+        snap = from_stat(path, st)
+        issues = evaluate(snap, rule.expected)
+        if issues:
+            yield snap, rule, issues
+
+
+def run_tree_audit(workers: int = WALK_WORKERS, auto: bool = False, dry_run: bool = False) -> int:
+    """
+    Audita TREE_RULES gravando as violações em JSONL conforme aparecem.
+    Com auto=True, as correções são acumuladas e aplicadas em lote ao final da varredura;
+    com dry_run=True, o plano é só exibido.
+    Retorna o total de violações.
+    """
+    rules = tree_index()
+    out_path = f"shadowsec_permission_tree_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl"
+    log(f"=== VARREDURA RECURSIVA ({len(rules)} regras, {workers} threads) ===")
+    count = 0
+    plan = []
+    with open(out_path, "w") as out:
+        for snap, rule, issues in audit_tree(rules, workers):
+            count += 1
+            log(f"[ALERTA] {snap.path} (regra {rule.pattern}):")
+            for it in issues:
+                log(f"  - {it}")
+            out.write(json.dumps({"path": snap.path, "rule": rule.pattern, "mode": oct(snap.mode),
+                                  "uid": snap.uid, "gid": snap.gid, "issues": issues}) + "\n")
+            out.flush()
+            if auto or dry_run:
+                plan.append((snap, rule.expected, fix_target(snap, rule.expected)))
+    log(f"Varredura recursiva concluída: {count} violações (detalhes em {out_path})")
+    if plan and dry_run:
+        print_plan(plan_fixes(plan)[0])
+    elif plan:
+        log(f"Aplicando {len(plan)} correções em lote...")
+        report_fixes(apply_fixes(plan, follow=False))
+    return count
+
+# ---------------------------
+# Arquivos de política (--policy / --role)
+# JSON, TOML ou YAML (YAML exige PyYAML). Estrutura:
+#   include = ["base.json"]                     # relativo ao arquivo que inclui
+#   rules   = [{path, kind?, mode?|max_mode?, owner?, group?, remove?}]
+#   mode/max_mode sempre como texto octal entre aspas ("0644"); inteiros são recusados
+#   roles.<nome> = {include?, rules?}           # sobreposição aplicada com --role <nome>
+# "path" sem curingas → regra exata (como SECURE_RULES); com curingas → regra de árvore.
+# Uma regra com o mesmo (path, kind) substitui a anterior; "remove": true a descarta.
+# A política compilada (regras + trie) fica em cache, validada pelo SHA-256 de cada
+# arquivo envolvido — arquivos inalterados não são nem reinterpretados.
+# ---------------------------
+POLICY_CACHE_DIRS = ["/var/cache/shadowsec", os.path.expanduser("~/.cache/shadowsec")]
+POLICY_CACHE_VERSION = 2  # v2: caches de políticas com modos inteiros (mal lidos) são descartados
+
+
+def _parse_mode(value) -> int:
+    """
+    Modo octal em texto ("0644", "0o644", "644"). Inteiros são recusados: `mode = 644`
+    sem aspas vira 644 decimal (0o1204) e `--auto` aplicaria esse modo errado.
+    """
+    if isinstance(value, (int, float)):
+        raise ValueError(f"modo {value!r} sem aspas — coloque o modo octal entre aspas (ex.: \"0644\")")
+    text = str(value).strip().lower()
+    try:
+        mode = int(text[2:] if text.startswith("0o") else text, 8)
+    except ValueError:
+        raise ValueError(f"modo octal inválido: {value!r}")
+    if not 0 <= mode <= 0o7777:
+        raise ValueError(f"modo fora do intervalo 0000-7777: {value!r}")
+    return mode
+
+
+def _read_policy_file(path: str) -> dict:
+    ext = os.path.splitext(path)[1].lower()
+    with open(path, "rb") as f:
+        raw = f.read()
+    if ext == ".json":
+        return json.loads(raw)
+    if ext == ".toml":
+        try:
+            import tomllib
+        except ImportError:  # Python < 3.11
+            try:
+                import tomli as tomllib
+            except ImportError:
+                raise ValueError("Suporte a TOML requer Python 3.11+ ou o pacote tomli")
+        return tomllib.loads(raw.decode("utf-8"))
+    if ext in (".yaml", ".yml"):
+        try:
+            import yaml
+        except ImportError:
+            raise ValueError("Suporte a YAML requer o pacote PyYAML (pip install pyyaml) — ou use JSON/TOML")
+        return yaml.safe_load(raw) or {}
+    raise ValueError(f"Formato de política não suportado: {path}")
+
+
+def _normalize_rules(rules: list, source: str) -> List[dict]:
+    out = []
+    for r in rules or []:
+        if "path" not in r:
+            raise ValueError(f"{source}: regra sem 'path': {r}")
+        rule = {"path": r["path"], "kind": r.get("kind")}
+        for key in ("mode", "max_mode"):
+            if key in r:
+                try:
+                    rule[key] = _parse_mode(r[key])
+                except ValueError as e:
+                    raise ValueError(f"{source}: {r['path']}: {e}")
+        for key in ("owner", "group", "remove"):
+            if key in r:
+                rule[key] = r[key]
+        out.append(rule)
+    return out
+
+
+def _overlay(base: List[dict], extra: List[dict]) -> List[dict]:
+    merged = {(r["path"], r["kind"]): r for r in base}
+    for r in extra:
+        key = (r["path"], r["kind"])
+        if r.get("remove"):
+            merged.pop(key, None)
+        else:
+            merged[key] = r
+    return list(merged.values())
+
+
+def _resolve_policy(path: str, role: Optional[str], stack: tuple, files: Dict[str, str], roles_seen: set):
+    path = os.path.abspath(path)
+    if path in stack:
+        raise ValueError(f"Include circular: {' → '.join(stack + (path,))}")
+    data = _read_policy_file(path)
+    with open(path, "rb") as f:
+        files[path] = hashlib.sha256(f.read()).hexdigest()
+    here = os.path.dirname(path)
+
+    def includes(section):
+        rules = []
+        for inc in section.get("include", []) or []:
+            rules = _overlay(rules, _resolve_policy(os.path.join(here, inc), role, stack + (path,),
+                                                    files, roles_seen))
+        return rules
+
+    rules = _overlay(includes(data), _normalize_rules(data.get("rules"), path))
+    overlay = (data.get("roles") or {}).get(role) if role else None
+    if overlay is not None:
+        roles_seen.add(role)
+        rules = _overlay(rules, includes(overlay))
+        rules = _overlay(rules, _normalize_rules(overlay.get("rules"), f"{path} [role {role}]"))
+    return rules
+
+
+def _policy_cache_path(path: str, role: Optional[str]) -> Optional[str]:
+    key = hashlib.sha256(f"{os.path.abspath(path)}\0{role or ''}".encode()).hexdigest()[:24]
+    for d in POLICY_CACHE_DIRS:
+        try:
+            os.makedirs(d, exist_ok=True)
+        except OSError:
+            continue
+        if os.access(d, os.W_OK):
+            return os.path.join(d, f"permission_policy_{key}.json")
+    return None
+
+
+def _cache_valid(cached: dict) -> bool:
+    if cached.get("version") != POLICY_CACHE_VERSION:
+        return False
+    for path, digest in cached.get("files", {}).items():
+        try:
+            with open(path, "rb") as f:
+                if hashlib.sha256(f.read()).hexdigest() != digest:
+                    return False
+        except OSError:
+            return False
+    return True
+
+
+def load_policy(path: str, role: Optional[str] = None, use_cache: bool = True) -> Tuple[Dict[str, dict], RuleIndex]:
+    """
+    Carrega a política (com includes e sobreposição do papel) e devolve
+    (regras_exatas → formato SECURE_RULES, índice de regras de árvore).
+    """
+    cache_path = _policy_cache_path(path, role) if use_cache else None
+    if cache_path:
+        try:
+            with open(cache_path) as f:
+                cached = json.load(f)
+            if _cache_valid(cached):
+                return cached["exact"], compile_rules(cached["tree"], cached["trie"])
+        except (OSError, ValueError, KeyError):
+            pass
+
+    files: Dict[str, str] = {}
+    roles_seen: set = set()
+    rules = _resolve_policy(path, role, (), files, roles_seen)
+    if role and role not in roles_seen:
+        raise ValueError(f"Papel '{role}' não definido em {path} nem em seus includes")
+
+    fields = ("mode", "max_mode", "owner", "group")
+    exact, tree = {}, []
+    for r in rules:
+        spec = {k: r[k] for k in fields if k in r}
+        if _GLOB_CHARS & set(r["path"]):
+            tree.append({"pattern": r["path"], "kind": r["kind"], **spec})
+        else:
+            exact[r["path"]] = spec
+    index = compile_rules(tree)
+
+    if cache_path:
+        try:
+            tmp = cache_path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump({"version": POLICY_CACHE_VERSION, "files": files, "exact": exact,
+                           "tree": tree, "trie": index.trie}, f)
+            os.replace(tmp, cache_path)
+        except OSError:
+            pass
+    return exact, index
+
+
+def apply_policy(path: str, role: Optional[str] = None):
+    """Substitui SECURE_RULES/TREE_RULES pelas regras da política."""
+    global SECURE_RULES, TREE_RULES
+    exact, index = load_policy(path, role)
+    SECURE_RULES = exact
+    TREE_RULES = index
+    log(f"[INFO] Política {path}{f' (papel {role})' if role else ''}: "
+        f"{len(exact)} regras exatas, {len(index)} regras de árvore")
+
+# ---------------------------
+# Baseline persistido e diff (--diff)
+# Formato: gzip de linhas "caminho\tmodo(octal)\tuid\tgid\tinode\tmtime_ns", ORDENADAS por
+# caminho → comparar dois snapshots é um merge em streaming, sem carregar nenhum em memória.
+# A ordenação é externa: blocos de BASELINE_CHUNK linhas são ordenados, gravados em arquivos
+# temporários e intercalados com heapq.merge.
+# ---------------------------
+BASELINE_PATHS = ["/var/lib/shadowsec/permission_audit_baseline.tsv.gz", "./shadowsec_permission_baseline.tsv.gz"]
+BASELINE_CHUNK = 200_000
+BASELINE_FIELDS = ("mode", "uid", "gid", "inode", "mtime_ns")
+
+
+def _escape(path: str) -> str:
+    return path.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+
+
+def _line_key(line: str) -> str:
+    return line.split("\t", 1)[0]
+
+
+def baseline_line(path: str, st: os.stat_result) -> str:
+    return f"{_escape(path)}\t{st.st_mode:o}\t{st.st_uid}\t{st.st_gid}\t{st.st_ino}\t{st.st_mtime_ns}\n"
+
+
+def iter_baseline_lines(workers: int = WALK_WORKERS) -> Iterator[str]:
+    """Escopo do baseline: caminhos de SECURE_RULES (stat) + tudo sob as raízes de TREE_RULES (lstat)."""
+    for path in SECURE_RULES:
+        try:
+            yield baseline_line(path, os.stat(path))
+        except OSError:
+            continue
+    for path, st in walk_tree(walk_roots(tree_index()), workers):
+        yield baseline_line(path, st)
+
+
+def write_sorted(lines: Iterator[str], dest: str, chunk: int = BASELINE_CHUNK) -> int:
+    """Ordena `lines` por caminho (externamente, em blocos) e grava em dest (gzip). Retorna o total."""
+    import gzip
+    import heapq
+    import tempfile
+    tmp_dir = os.path.dirname(os.path.abspath(dest))
+    runs, buf = [], []
+
+    def spill():
+        buf.sort(key=_line_key)
+        fd, run_path = tempfile.mkstemp(prefix=".perm_run_", dir=tmp_dir)
+        with os.fdopen(fd, "w") as f:
+            f.writelines(buf)
+        runs.append(run_path)
+        buf.clear()
+
+    try:
+        for line in lines:
+            buf.append(line)
+            if len(buf) >= chunk:
+                spill()
+        buf.sort(key=_line_key)
+        sources = [open(r) for r in runs] + [iter(buf)]
+        total, prev = 0, None
+        tmp = dest + ".tmp"
+        with gzip.open(tmp, "wt", compresslevel=3) as out:
+            for line in heapq.merge(*sources, key=_line_key):
+                key = _line_key(line)
+                if key == prev:  # mesmo caminho por duas origens (ex.: /usr/local/bin)
+                    continue
+                prev = key
+                out.write(line)
+                total += 1
+        for s in sources[:-1]:
+            s.close()
+        os.replace(tmp, dest)
+        return total
+    finally:
+        for r in runs:
+            os.unlink(r)
+
+
+def read_sorted(path: str) -> Iterator[Tuple[str, tuple]]:
+    import gzip
+    with gzip.open(path, "rt") as f:
+        for line in f:
+            cols = line.rstrip("\n").split("\t")
+            yield cols[0], (int(cols[1], 8), int(cols[2]), int(cols[3]), int(cols[4]), int(cols[5]))
+
+
+def diff_baselines(old_path: str, new_path: str):
+    """
+    Merge em streaming de dois baselines ordenados.
+    Gera (tipo, caminho, antigo, novo) com tipo "added", "removed" ou "changed".
+    """
+    old_it, new_it = read_sorted(old_path), read_sorted(new_path)
+    a, b = next(old_it, None), next(new_it, None)
+    while a is not None or b is not None:
+        if b is None or (a is not None and a[0] < b[0]):
+            yield "removed", a[0], a[1], None
+            a = next(old_it, None)
+        elif a is None or b[0] < a[0]:
+            yield "added", b[0], None, b[1]
+            b = next(new_it, None)
+        else:
+            if a[1] != b[1]:
+                yield "changed", a[0], a[1], b[1]
+            a, b = next(old_it, None), next(new_it, None)
+
+
+def describe_change(old: tuple, new: tuple) -> List[str]:
+    out = []
+    for name, o, n in zip(BASELINE_FIELDS, old, new):
+        if o == n:
+            continue
+        if name == "mode":
+            out.append(f"modo {oct(o)} → {oct(n)}")
+        elif name == "uid":
+            out.append(f"dono {owner_name(o)} → {owner_name(n)}")
+        elif name == "gid":
+            out.append(f"grupo {group_name(o)} → {group_name(n)}")
+        elif name == "inode":
+            out.append(f"inode {o} → {n} (arquivo substituído)")
+        else:
+            out.append("conteúdo/mtime alterado")
+    return out
+
+
+def existing_baseline() -> Optional[str]:
+    for p in BASELINE_PATHS:
+        if os.path.isfile(p):
+            return p
+    return None
+
+
+def baseline_target() -> str:
+    for p in BASELINE_PATHS:
+        d = os.path.dirname(os.path.abspath(p))
+        try:
+            os.makedirs(d, exist_ok=True)
+        except OSError:
+            continue
+        if os.access(d, os.W_OK):
+            return p
+    return BASELINE_PATHS[-1]
+
+
+def save_baseline(workers: int = WALK_WORKERS) -> Tuple[str, int]:
+    dest = existing_baseline() or baseline_target()
+    return dest, write_sorted(iter_baseline_lines(workers), dest)
+
+
+def run_diff(workers: int = WALK_WORKERS) -> int:
+    """
+    Compara o estado atual com o baseline da última auditoria, reporta só as diferenças
+    (terminal, log e JSONL) e promove o estado atual a novo baseline. Retorna o total de mudanças.
+    """
+    old = existing_baseline()
+    if old is None:
+        dest, total = save_baseline(workers)
+        log(f"[INFO] Nenhum baseline anterior — baseline criado em {dest} ({total} entradas).")
+        return 0
+
+    log(f"=== DIFF CONTRA O BASELINE {old} ===")
+    new = old + ".new"
+    total = write_sorted(iter_baseline_lines(workers), new)
+    out_path = f"shadowsec_permission_diff_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl"
+    labels = {"added": "NOVO", "removed": "REMOVIDO", "changed": "ALTERADO"}
+    count = 0
+    try:
+        with open(out_path, "w") as out:
+            for kind, path, before, after in diff_baselines(old, new):
+                count += 1
+                details = describe_change(before, after) if kind == "changed" else []
+                log(f"[{labels[kind]}] {path}" + (f": {'; '.join(details)}" if details else ""))
+                out.write(json.dumps({
+                    "change": kind, "path": path,
+                    "old": dict(zip(BASELINE_FIELDS, before)) if before else None,
+                    "new": dict(zip(BASELINE_FIELDS, after)) if after else None,
+                }) + "\n")
+        os.replace(new, old)
+    finally:
+        if os.path.exists(new):
+            os.unlink(new)
+    log(f"Diff concluído: {count} mudanças em {total} entradas (detalhes em {out_path}).")
+    return count
+
+# ---------------------------
+# Inventário SUID/SGID e world-writable (--inventory)
+# Varre todos os sistemas de arquivos reais listados em /proc/self/mountinfo (pseudo-fs
+# como proc/sysfs/cgroup são descartados; fs de rede só com --inventory-netfs), uma raiz
+# por dispositivo, sem cruzar fronteiras de st_dev — cada montagem é varrida como raiz própria.
+# Índice persistido por inode: "dev:ino" do diretório → mtime_ns, subdiretórios e entradas
+# sinalizadas. Diretório com mtime inalterado não é relido (nenhum readdir): só os
+# subdiretórios e as entradas já sinalizadas recebem lstat.
+# Limite: chmod u+s em um arquivo já existente não altera o mtime do diretório — só uma
+# varredura completa (--inventory-full) o encontra; agende-a periodicamente.
+# ---------------------------
+INVENTORY_PATHS = ["/var/lib/shadowsec/permission_inventory.json.gz", "./shadowsec_permission_inventory.json.gz"]
+INVENTORY_VERSION = 1
+PSEUDO_FS = {
+    "proc", "sysfs", "devtmpfs", "devpts", "cgroup", "cgroup2", "securityfs", "debugfs", "tracefs",
+    "pstore", "bpf", "mqueue", "hugetlbfs", "configfs", "fusectl", "autofs", "binfmt_misc",
+    "efivarfs", "nsfs", "rpc_pipefs", "selinuxfs", "ramfs", "squashfs", "iso9660",
+}
+NETWORK_FS = {"nfs", "nfs4", "cifs", "smb3", "smbfs", "9p", "afs", "ceph", "glusterfs", "lustre", "fuse.sshfs"}
+
+
+class Mount(NamedTuple):
+    mountpoint: str
+    fstype: str
+    source: str
+
+
+def _unescape_mount(field: str) -> str:
+    # mountinfo escapa espaço, tab, \n e \ como \ooo (octal)
+    return re.sub(r"\\([0-7]{3})", lambda m: chr(int(m.group(1), 8)), field)
+
+
+def read_mounts(path: str = "/proc/self/mountinfo") -> List[Mount]:
+    mounts = []
+    try:
+        with open(path) as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return [Mount("/", "unknown", "")]
+    for line in lines:
+        left, sep, right = line.partition(" - ")
+        cols, tail = left.split(), right.split()
+        if not sep or len(cols) < 5 or len(tail) < 2:
+            continue
+        mounts.append(Mount(_unescape_mount(cols[4]), tail[0], _unescape_mount(tail[1])))
+    return mounts
+
+
+def inventory_roots(mounts: List[Mount], include_network: bool = False) -> List[Tuple[str, os.stat_result]]:
+    """
+    Uma raiz por dispositivo: pseudo-fs (e fs de rede, salvo include_network) descartados;
+    bind mounts do mesmo dispositivo são varridos uma vez só, pelo ponto mais curto.
+    """
+    roots, seen = [], set()
+    for m in sorted(mounts, key=lambda m: (m.mountpoint.count("/"), m.mountpoint)):
+        if m.fstype in PSEUDO_FS or (m.fstype in NETWORK_FS and not include_network):
+            continue
+        try:
+            st = os.lstat(m.mountpoint)
+        except OSError:
+            continue
+        if not stat.S_ISDIR(st.st_mode) or st.st_dev in seen:
+            continue
+        seen.add(st.st_dev)
+        roots.append((m.mountpoint, st))
+    return roots
+
+
+def inventory_flags(mode: int) -> List[str]:
+    """Sinais relevantes de uma entrada: suid/sgid (arquivos), world-writable (arquivos e dirs sem sticky)."""
+    flags = []
+    if stat.S_ISREG(mode):
+        if mode & stat.S_ISUID:
+            flags.append("suid")
+        if mode & stat.S_ISGID:
+            flags.append("sgid")
+        if mode & stat.S_IWOTH:
+            flags.append("world-writable")
+    elif stat.S_ISDIR(mode) and mode & stat.S_IWOTH and not mode & stat.S_ISVTX:
+        flags.append("world-writable")
+    return flags
+
+
+def _dir_key(st: os.stat_result) -> str:
+    return f"{st.st_dev}:{st.st_ino}"
+
+
+def _inventory_dir(path: str, st: os.stat_result, prev: Optional[dict], full: bool):
+    """
+    Processa um diretório. Retorna (sinalizados [(caminho, flags, lstat)], subdirs [(caminho, lstat)],
+    entrada do índice, relido?). Com mtime igual ao do índice, reaproveita a listagem anterior.
+    """
+    dev = st.st_dev
+    hits, subdirs = [], []
+    entry = {"mtime_ns": st.st_mtime_ns, "dirs": [], "flagged": []}
+    if prev is not None and not full and prev.get("mtime_ns") == st.st_mtime_ns:
+        names = prev.get("flagged", []) + prev.get("dirs", [])
+        reread = False
+    else:
+        try:
+            with os.scandir(path) as it:
+                names = [e.name for e in it]
+        except OSError:
+            return hits, subdirs, entry, True
+        reread = True
+    seen = set()
+    for name in names:
+        if name in seen:
+            continue
+        seen.add(name)
+        child = os.path.join(path, name)
+        try:
+            cst = os.lstat(child)
+        except OSError:
+            continue
+        flags = inventory_flags(cst.st_mode)
+        if flags:
+            hits.append((child, flags, cst))
+            entry["flagged"].append(name)
+        if stat.S_ISDIR(cst.st_mode) and cst.st_dev == dev:  # outro st_dev = ponto de montagem
+            subdirs.append((child, cst))
+            entry["dirs"].append(name)
+    return hits, subdirs, entry, reread
+
+
+def load_inventory() -> dict:
+    import gzip
+    for p in INVENTORY_PATHS:
+        try:
+            with gzip.open(p, "rt") as f:
+                data = json.load(f)
+        except (OSError, ValueError, EOFError):
+            continue
+        if data.get("version") == INVENTORY_VERSION:
+            return data
+    return {}
+
+
+def save_inventory(data: dict) -> Optional[str]:
+    import gzip
+    data["version"] = INVENTORY_VERSION
+    for p in INVENTORY_PATHS:
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(p)), exist_ok=True)
+            tmp = p + ".tmp"
+            with gzip.open(tmp, "wt", compresslevel=3) as f:
+                json.dump(data, f)
+            os.replace(tmp, p)
+            return p
+        except OSError:
+            continue
+    return None
+
+
+def scan_inventory(roots: List[Tuple[str, os.stat_result]], index: Dict[str, dict],
+                   workers: int = WALK_WORKERS, full: bool = False):
+    """
+    Varredura concorrente com o índice de diretórios. Retorna
+    (itens {caminho: [flags, modo, uid, gid, inode, mtime_ns]}, novo índice, relidos, reaproveitados).
+    """
+    items, new_index = {}, {}
+    reread = reused = 0
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        pending = {pool.submit(_inventory_dir, path, st, index.get(_dir_key(st)), full): st for path, st in roots}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                st = pending.pop(fut)
+                hits, subdirs, entry, was_read = fut.result()
+                new_index[_dir_key(st)] = entry
+                if was_read:
+                    reread += 1
+                else:
+                    reused += 1
+                for path, flags, cst in hits:
+                    items[path] = [flags, cst.st_mode, cst.st_uid, cst.st_gid, cst.st_ino, cst.st_mtime_ns]
+                for sub, sst in subdirs:
+                    pending[pool.submit(_inventory_dir, sub, sst, index.get(_dir_key(sst)), full)] = sst
+    return items, new_index, reread, reused
+
+
+def inventory_drift(old: Dict[str, list], new: Dict[str, list]):
+    """Gera (tipo, caminho, antigo, novo): "added", "removed" ou "changed" (modo/dono/inode/mtime)."""
+    for path in sorted(new):
+        before = old.get(path)
+        if before is None:
+            yield "added", path, None, new[path]
+        elif before[1:] != new[path][1:]:
+            yield "changed", path, before, new[path]
+    for path in sorted(set(old) - set(new)):
+        yield "removed", path, old[path], None
+
+
+def _item_dict(item: Optional[list]) -> Optional[dict]:
+    if item is None:
+        return None
+    return {"flags": item[0], "mode": oct(item[1]), "owner": owner_name(item[2]),
+            "group": group_name(item[3]), "inode": item[4], "mtime_ns": item[5]}
+
+
+def run_inventory(workers: int = WALK_WORKERS, full: bool = False, include_network: bool = False) -> int:
+    """
+    Inventário SUID/SGID/world-writable de todos os fs reais. Na primeira execução lista tudo
+    e grava o índice; nas seguintes reporta como drift o que surgiu, mudou ou sumiu.
+    Retorna o número de itens novos com SUID/SGID.
+    """
+    import time
+    t0 = time.perf_counter()
+    state = load_inventory()
+    first_run = not state
+    roots = inventory_roots(read_mounts(), include_network)
+    log(f"=== INVENTÁRIO SUID/SGID/WORLD-WRITABLE ({len(roots)} sistemas de arquivos, {workers} threads"
+        f"{', completo' if full or first_run else ''}) ===")
+    items, index, reread, reused = scan_inventory(roots, state.get("dirs", {}), workers, full)
+    out_path = f"shadowsec_permission_inventory_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl"
+    labels = {"added": "NOVO", "removed": "REMOVIDO", "changed": "ALTERADO"}
+    new_priv = 0
+    with open(out_path, "w") as out:
+        if first_run:
+            for path in sorted(items):
+                out.write(json.dumps({"change": "baseline", "path": path, "new": _item_dict(items[path])}) + "\n")
+                if "suid" in items[path][0] or "sgid" in items[path][0]:
+                    write_log_line(f"[INVENTÁRIO] {path} ({'+'.join(items[path][0])}, {oct(items[path][1])})")
+        else:
+            for kind, path, before, after in inventory_drift(state.get("items", {}), items):
+                flags = (after or before)[0]
+                privileged = "suid" in flags or "sgid" in flags
+                if kind == "added" and privileged:
+                    new_priv += 1
+                    tag = f"[DRIFT] [NOVO {'+'.join(f.upper() for f in flags if f != 'world-writable')}]"
+                else:
+                    tag = f"[{labels[kind]}]"
+                details = describe_change(before[1:], after[1:]) if kind == "changed" else []
+                log(f"{tag} {path} ({'+'.join(flags)})" + (f": {'; '.join(details)}" if details else ""))
+                out.write(json.dumps({"change": kind, "path": path, "drift": kind == "added" and privileged,
+                                      "old": _item_dict(before), "new": _item_dict(after)}) + "\n")
+    dest = save_inventory({"dirs": index, "items": items})
+    privileged = sum(1 for v in items.values() if "suid" in v[0] or "sgid" in v[0])
+    log(f"Inventário concluído em {time.perf_counter() - t0:.1f}s: {privileged} SUID/SGID, "
+        f"{len(items) - privileged} só world-writable; {reread} diretórios relidos, {reused} reaproveitados "
+        f"do índice ({dest or 'índice não gravado'}); detalhes em {out_path}.")
+    if first_run:
+        log("[INFO] Primeira execução — inventário gravado como referência para as próximas.")
+    elif new_priv:
+        log(f"[ALERTA] {new_priv} novos binários SUID/SGID desde o último inventário.")
+    return new_priv
+
+# ---------------------------
+# Benchmark em árvore sintética
+# ---------------------------
+def make_synthetic_tree(root: str, n_files: int, per_dir: int = 1000, bad_every: int = 97) -> int:
+    """Cria n_files arquivos vazios em subdiretórios de per_dir; 1 a cada bad_every fica 0o666."""
+    created = 0
+    d = 0
+    while created < n_files:
+        sub = os.path.join(root, f"d{d // 100:04d}", f"s{d:06d}")
+        os.makedirs(sub, exist_ok=True)
+        for i in range(min(per_dir, n_files - created)):
+            p = os.path.join(sub, f"f{i:05d}")
+            os.close(os.open(p, os.O_CREAT | os.O_WRONLY, 0o666 if created % bad_every == 0 else 0o644))
+            created += 1
+        d += 1
+    return created
+
+
+def benchmark_tree(n_files: int = 1_000_000, workers: int = WALK_WORKERS, root: Optional[str] = None):
+    """Compara os.walk + stats por caminho com o walker concorrente (1 thread e N threads)."""
+    import tempfile
+    import time
+    base = root or tempfile.mkdtemp(prefix="shadowsec_perm_bench_")
+    old_umask = os.umask(0)
+    try:
+        if not os.path.exists(os.path.join(base, ".ready")):
+            t0 = time.perf_counter()
+            made = make_synthetic_tree(base, n_files)
+            open(os.path.join(base, ".ready"), "w").close()
+            print(f"Árvore sintética: {made} arquivos em {base} ({time.perf_counter() - t0:.1f}s)")
+        rules = compile_rules([{"pattern": base + "/**", "kind": "file", "max_mode": 0o644}])
+
+        def legacy():
+            # caminho antigo: exists + stat + stat (resolve_owner_group) por arquivo
+            bad = 0
+            for dirpath, _, files in os.walk(base):
+                for name in files:
+                    p = os.path.join(dirpath, name)
+                    if os.path.exists(p):
+                        mode = stat.S_IMODE(os.stat(p).st_mode)
+                        os.stat(p)
+                        bad += bool(mode & ~0o644)
+            return bad
+
+        timings = [("os.walk + 3 stats/arquivo", legacy),
+                   ("walker scandir, 1 thread", lambda: sum(1 for _ in audit_tree(rules, 1, [base]))),
+                   (f"walker scandir, {workers} threads", lambda: sum(1 for _ in audit_tree(rules, workers, [base])))]
+        for label, fn in timings:
+            t0 = time.perf_counter()
+            bad = fn()
+            dt = time.perf_counter() - t0
+            print(f"{label:<32} {dt:8.2f}s  {n_files / dt:12,.0f} arquivos/s  violações={bad}")
+    finally:
+        os.umask(old_umask)
+        if root is None:
+            shutil.rmtree(base, ignore_errors=True)
 
 # ---------------------------
 # Report generation
 # ---------------------------
+def make_entry(snap: PathState, expected: dict, issues: list) -> dict:
+    return {
+        "exists": snap.exists,
+        "current_mode": oct(snap.mode) if snap.exists else None,
+        "current_owner": snap.owner,
+        "current_group": snap.group,
+        "expected": expected,
+        "ok": not issues,
+        "issues": issues,
+    }
+
 def generate_report(results: dict, out_json: str = None):
     ts = datetime.datetime.now().isoformat()
     report = {
@@ -261,116 +1571,131 @@ def generate_report(results: dict, out_json: str = None):
 # Main flow
 # ---------------------------
 
+def confirm_fix(path: str) -> bool:
+    prompt = f" → Deseja aplicar correções em {path}? (s/n): "
+    try:
+        resp = input(prompt).strip().lower()
+    except KeyboardInterrupt:
+        log("Interrompido pelo usuário.")
+        sys.exit(1)
+    return resp.startswith("s")
+
+def report_fixes(outcomes) -> list:
+    """Registra o resultado da fase de correção. Retorna [(snapshot_novo, problemas)] dos aplicados."""
+    done = []
+    for after, success, message, issues in outcomes:
+        if not success:
+            log(f"[ERRO] Não foi possível aplicar correção em {after.path}: {message}")
+            continue
+        log(f"[APLICADO] Correções aplicadas em {after.path} ({message})")
+        if issues:
+            log(f"[AVISO] {after.path} ainda possui problemas: {issues}")
+        else:
+            log(f"[VERIFICADO] {after.path} agora está ok.")
+        done.append((after, issues))
+    return done
+
 def main(args):
     auto = args.auto
+    dry_run = getattr(args, "dry_run", False)
     results = {}
 
     log("=== SHADOWSEC PERMISSION AUDIT ===")
     # ensure caches
-    global PWD_CACHE, GRP_CACHE
-    PWD_CACHE = parse_passwd()
-    GRP_CACHE = parse_group()
+    invalidate_identities()
 
+    # 1) avaliação: um stat por caminho; o mesmo snapshot alimenta checagem, relatório e plano
+    plan = []
     for path, expected in SECURE_RULES.items():
-        entry = {
-            "exists": False,
-            "current_mode": None,
-            "current_owner": None,
-            "current_group": None,
-            "expected": expected,
-            "ok": False,
-            "issues": []
-        }
-        if not os.path.exists(path):
-            entry["issues"].append("inexistente")
-            results[path] = entry
+        snap = take_snapshot(path)
+        issues = evaluate(snap, expected)
+        results[path] = make_entry(snap, expected, issues)
+        if not snap.exists:
             log(f"[WARN] {path} inexistente. Pulando.")
             continue
-
-        st = os.stat(path)
-        entry["exists"] = True
-        entry["current_mode"] = oct(stat.S_IMODE(st.st_mode))
-        try:
-            owner, group = resolve_owner_group(path)
-        except FileNotFoundError:
-            owner, group = ("?", "?")
-        entry["current_owner"] = owner
-        entry["current_group"] = group
-
-        ok, issues = check_path(path, expected)
-        entry["ok"] = ok
-        entry["issues"] = issues
-
-        if ok:
+        if not issues:
             log(f"[OK] {path} está seguro.")
-        else:
-            log(f"[ALERTA] {path} está inseguro:")
-            for it in issues:
-                log(f"  - {it}")
+            continue
 
-            # If group expected does not exist, advise and skip changing group
+        log(f"[ALERTA] {path} está inseguro:")
+        for it in issues:
+            log(f"  - {it}")
+        if auto or dry_run or confirm_fix(path):
+            target = fix_target(snap, expected)
             expected_group = expected.get("group")
-            group_exists = expected_group in GRP_CACHE.values() if expected_group else True
+            if expected_group and target.get("group") != expected_group:
+                log(f"[INFO] Grupo esperado '{expected_group}' não existe — usando fallback '{target.get('group')}'")
+            plan.append((snap, expected, target))
 
-            do_fix = False
-            if auto:
-                do_fix = True
-            else:
-                # interactive prompt
-                prompt = f" → Deseja aplicar correções em {path}? (s/n): "
-                try:
-                    resp = input(prompt).strip().lower()
-                except KeyboardInterrupt:
-                    log("Interrompido pelo usuário.")
-                    sys.exit(1)
-                if resp.startswith("s"):
-                    do_fix = True
-
-            if do_fix:
-                # if expected group doesn't exist, fallback logic:
-                if expected_group and not group_exists:
-                    # choose fallback: 'root' if exists, else keep current group
-                    fallback = "root" if "root" in GRP_CACHE.values() else entry["current_group"]
-                    log(f"[INFO] Grupo esperado '{expected_group}' não existe — usando fallback '{fallback}'")
-                    expected_to_apply = dict(expected)
-                    expected_to_apply["group"] = fallback
-                else:
-                    expected_to_apply = expected
-
-                success, message = apply_fix(path, expected_to_apply)
-                if success:
-                    log(f"[APLICADO] Correções aplicadas em {path} ({message})")
-                    # refresh caches and entry
-                    PWD_CACHE = parse_passwd()
-                    GRP_CACHE = parse_group()
-                    try:
-                        owner2, group2 = resolve_owner_group(path)
-                    except Exception:
-                        owner2, group2 = ("?", "?")
-                    entry["current_owner"] = owner2
-                    entry["current_group"] = group2
-                    entry["current_mode"] = oct(stat.S_IMODE(os.stat(path).st_mode))
-                    # re-evaluate
-                    ok2, issues2 = check_path(path, expected)
-                    entry["ok"] = ok2
-                    entry["issues"] = issues2
-                    if ok2:
-                        log(f"[VERIFICADO] {path} agora está ok.")
-                    else:
-                        log(f"[AVISO] {path} ainda possui problemas: {issues2}")
-                else:
-                    log(f"[ERRO] Não foi possível aplicar correção em {path}: {message}")
-
-        results[path] = entry
+    # 2) correções em lote (journal + fd) + reverificação pelo fstat do mesmo fd
+    if dry_run:
+        ops, errors = plan_fixes(plan)
+        for snap, message in errors:
+            log(f"[ERRO] {snap.path}: {message}")
+        print_plan(ops)
+    else:
+        if plan:
+            log(f"Aplicando {len(plan)} correções...")
+        for after, issues in report_fixes(apply_fixes(plan)):
+            results[after.path] = make_entry(after, SECURE_RULES[after.path], issues)
 
     # finalize
     generate_report(results)
+    if getattr(args, "tree", False):
+        run_tree_audit(args.workers, auto, dry_run)
+    # o baseline (walk completo das raízes) só é regravado quando pedido explicitamente
+    if getattr(args, "baseline", False) and not dry_run:
+        dest, total = save_baseline(getattr(args, "workers", WALK_WORKERS))
+        write_log_line(f"Baseline atualizado em {dest} ({total} entradas)")
     log("Scan finalizado.")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="ShadowSec Permission Auditor & Hardener")
     parser.add_argument("--auto", action="store_true", help="Aplica correções automaticamente sem perguntar.")
+    parser.add_argument("--tree", action="store_true", help="Também audita as regras recursivas (TREE_RULES).")
+    parser.add_argument("--workers", type=int, default=WALK_WORKERS, help="Threads do walker recursivo.")
+    parser.add_argument("--bench-tree", type=int, metavar="N",
+                        help="Benchmark do walker em uma árvore sintética com N arquivos e sai.")
+    parser.add_argument("--diff", action="store_true",
+                        help="Reporta só o que mudou desde a última auditoria e atualiza o baseline.")
+    parser.add_argument("--baseline", action="store_true",
+                        help="Ao final da auditoria, grava o estado atual como baseline do --diff.")
+    parser.add_argument("--policy", metavar="ARQUIVO",
+                        help="Arquivo de política (JSON/TOML/YAML) no lugar das regras embutidas.")
+    parser.add_argument("--role", help="Papel do servidor cuja sobreposição da política será aplicada.")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Mostra o plano de correção e o custo estimado sem alterar nada.")
+    parser.add_argument("--rollback", metavar="JOURNAL", help="Desfaz as correções registradas em um journal.")
+    parser.add_argument("--inventory", action="store_true",
+                        help="Inventário SUID/SGID/world-writable de todos os fs montados e sai (exit 1 se houver SUID novo).")
+    parser.add_argument("--inventory-full", action="store_true",
+                        help="Com --inventory: ignora o índice de diretórios e relê tudo.")
+    parser.add_argument("--inventory-netfs", action="store_true",
+                        help="Com --inventory: inclui sistemas de arquivos de rede (NFS, CIFS, ...).")
     args = parser.parse_args()
+    if args.rollback:
+        try:
+            rollback(args.rollback)
+        except (OSError, ValueError) as e:
+            log(f"[ERRO] Journal inválido: {e}")
+            sys.exit(2)
+        sys.exit(0)
+    if args.policy:
+        try:
+            apply_policy(args.policy, args.role)
+        except (OSError, ValueError) as e:
+            log(f"[ERRO] Política inválida: {e}")
+            sys.exit(2)
+    elif args.role:
+        parser.error("--role exige --policy")
+    if args.inventory:
+        sys.exit(1 if run_inventory(args.workers, args.inventory_full, args.inventory_netfs) else 0)
+    if args.diff:
+        run_diff(args.workers)
+        sys.exit(0)
+    if args.bench_tree:
+        benchmark_tree(args.bench_tree, args.workers)
+        sys.exit(0)
     try:
         main(args)
     except KeyboardInterrupt:
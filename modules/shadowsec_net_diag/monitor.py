@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ShadowSec Net Diag - Monitor contínuo de conflitos de IP e ARP spoofing (--monitor)
+# Autor: Luciano Valadão / 2025.
+# Descrição: Conflitos intermitentes e envenenamento ARP só aparecem ao longo do tempo.
+# O monitor mantém um histórico limitado (ring buffer) do mapeamento IP→MAC e gera eventos:
+# - "mac-change": o IP passou a responder com outro MAC
+# - "conflict":   dois ou mais MACs reivindicaram o mesmo IP dentro da janela
+# Atualização incremental, sem revarrer a rede:
+# - notificações netlink do grupo RTNLGRP_NEIGH (toda alteração da tabela de vizinhos)
+# - com root, escuta passiva de ARP (AF_PACKET) — vê também respostas que o kernel descarta
+# Memória constante: deque(maxlen) por IP, no máximo MAX_IPS IPs (LRU) e supressão de
+# alertas repetidos com poda por tempo.
+
+import time                        # Timestamps e janela deslizante
+import select                      # Espera simultânea nos sockets netlink/AF_PACKET
+import socket                      # Sockets de notificação
+from collections import deque, namedtuple, OrderedDict
+
+import neighbors                   # Parser netlink, tabela de vizinhos e frames ARP
+
+HISTORY = 32            # observações guardadas por IP
+WINDOW = 300.0          # janela (s) para "vários MACs no mesmo IP"
+MAX_IPS = 4096          # IPs acompanhados (os menos recentes saem primeiro)
+RTNLGRP_NEIGH = 3       # linux/rtnetlink.h
+POLL_INTERVAL = 5.0     # fallback sem netlink: releitura de /proc/net/arp (tabela local, não a rede)
+
+# Um evento do monitor: tipo, IP, MACs envolvidos, quando e de qual fonte veio a observação
+Event = namedtuple("Event", "kind ip macs timestamp source detail")
+
+
+# ==================== ESTADO COM HISTÓRICO LIMITADO ====================
+class ConflictMonitor:
+    """
+    Histórico IP→MAC em ring buffers. observe() devolve os eventos gerados pela observação.
+    `gateways` marca IPs cuja troca de MAC é tratada como possível ARP spoofing.
+    """
+
+    def __init__(self, history=HISTORY, window=WINDOW, max_ips=MAX_IPS, gateways=()):
+        self.history = history
+        self.window = window
+        self.max_ips = max_ips
+        self.gateways = set(gateways)
+        self.ips = OrderedDict()        # ip → deque[(timestamp, mac)]
+        self.alerted = OrderedDict()    # (tipo, ip, macs) → último alerta (supressão)
+
+    def observe(self, ip, mac, timestamp=None, source="table"):
+        if not mac or mac == neighbors.ZERO_MAC:
+            return []
+        ts = time.time() if timestamp is None else timestamp
+        mac = mac.upper()
+        ring = self.ips.get(ip)
+        if ring is None:
+            ring = self.ips[ip] = deque(maxlen=self.history)
+            if len(self.ips) > self.max_ips:
+                self.ips.popitem(last=False)
+        else:
+            self.ips.move_to_end(ip)
+        last = ring[-1][1] if ring else None
+        if last == mac:
+            # mesma resposta: só atualiza o horário (não enche o buffer com repetições)
+            ring[-1] = (ts, mac)
+            return []
+        ring.append((ts, mac))
+
+        events = []
+        if last is not None:
+            detail = "possível ARP spoofing do gateway" if ip in self.gateways else ""
+            events.append(Event("mac-change", ip, (last, mac), ts, source, detail))
+        recent = []
+        for seen_at, m in ring:
+            if ts - seen_at <= self.window and m not in recent:
+                recent.append(m)
+        if len(recent) > 1:
+            events.append(Event("conflict", ip, tuple(recent), ts, source,
+                                f"{len(recent)} MACs em {int(self.window)}s"))
+        return [e for e in events if self._fresh(e)]
+
+    def _fresh(self, event):
+        """Suprime o mesmo alerta (tipo, IP, MACs) repetido dentro da janela."""
+        key = (event.kind, event.ip, tuple(sorted(event.macs)))
+        last = self.alerted.get(key)
+        # poda: as chaves mais antigas saem quando expiram ou quando o limite é atingido
+        while self.alerted:
+            oldest_key, oldest_ts = next(iter(self.alerted.items()))
+            if event.timestamp - oldest_ts > self.window or len(self.alerted) > self.max_ips:
+                self.alerted.popitem(last=False)
+            else:
+                break
+        if last is not None and event.timestamp - last <= self.window:
+            return False
+        self.alerted[key] = event.timestamp
+        self.alerted.move_to_end(key)
+        return True
+
+    def current(self):
+        """{IP: último MAC} — estado atual para o relatório."""
+        return {ip: ring[-1][1] for ip, ring in self.ips.items() if ring}
+
+
+# ==================== FONTES INCREMENTAIS ====================
+def open_neigh_listener():
+    """Socket netlink assinando RTNLGRP_NEIGH (RTM_NEWNEIGH/RTM_DELNEIGH a cada mudança)."""
+    sock = neighbors.netlink_socket(groups=1 << (RTNLGRP_NEIGH - 1))
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+    return sock
+
+
+def open_arp_listener(iface):
+    """Escuta passiva de ARP; None sem permissão (a monitoração segue só com netlink)."""
+    try:
+        return neighbors.open_arp_socket(iface)
+    except (PermissionError, OSError, AttributeError):
+        return None
+
+
+def read_netlink_events(sock):
+    """
+    Observações (ip, mac, fonte) de um recv do socket de notificações. Se o buffer do
+    multicast transbordou (ENOBUFS, comum com muita troca de ARP), notificações se perderam:
+    a tabela inteira é relida para ressincronizar e o monitor segue.
+    """
+    try:
+        data = sock.recv(65536)
+    except BlockingIOError:
+        return []
+    except OSError:
+        return [(nb.ip, nb.mac, "resync") for nb in neighbors.neighbor_table()]
+    out = []
+    for msg_type, nb in neighbors.parse_neigh_messages(data):
+        if nb is not None and msg_type == neighbors.RTM_NEWNEIGH and nb.mac and \
+                neighbors.NUD_USABLE & set(nb.state.split("|")):
+            out.append((nb.ip, nb.mac, "netlink"))
+    return out
+
+
+def read_arp_events(sock):
+    """Observações (ip, mac, fonte) de todos os frames ARP já recebidos."""
+    out = []
+    while True:
+        try:
+            frame = sock.recv(2048)
+        except (BlockingIOError, InterruptedError):
+            break
+        except OSError:
+            break  # ex.: ENETDOWN quando a interface cai/volta — o erro é consumido, segue no próximo ciclo
+        rec = neighbors.parse_arp_frame(frame)
+        if rec and rec[1] != "0.0.0.0":  # 0.0.0.0 = sondagem de DAD, não reivindica o IP
+            out.append((rec[1], rec[2], "arp"))
+    return out
+
+
+# ==================== LAÇO PRINCIPAL ====================
+def run(on_event, iface=None, networks=None, gateways=(), duration=None, monitor=None,
+        history=HISTORY, window=WINDOW):
+    """
+    Monitora até `duration` segundos (None = para sempre). `networks` (CIDRs) restringe os IPs
+    acompanhados. on_event(Event) é chamado para cada evento. Retorna o ConflictMonitor.
+    """
+    import ipaddress
+    nets = [ipaddress.ip_network(n, strict=False) for n in (networks or [])]
+    mon = monitor or ConflictMonitor(history, window, gateways=gateways)
+
+    def wanted(ip):
+        try:
+            addr = ipaddress.ip_address(ip)
+        except ValueError:
+            return False
+        return addr.version == 4 and (not nets or any(addr in n for n in nets))
+
+    def feed(observations):
+        now = time.time()
+        for ip, mac, source in observations:
+            if wanted(ip):
+                for event in mon.observe(ip, mac, now, source):
+                    on_event(event)
+
+    # estado inicial: a tabela atual (uma leitura), depois só mudanças
+    feed((nb.ip, nb.mac, "table") for nb in neighbors.neighbor_table())
+
+    sources = {}
+    try:
+        nl = open_neigh_listener()
+        sources[nl.fileno()] = (nl, read_netlink_events)
+    except (OSError, AttributeError):
+        nl = None
+    arp = open_arp_listener(iface) if iface else None
+    if arp is not None:
+        sources[arp.fileno()] = (arp, read_arp_events)
+
+    deadline = None if duration is None else time.monotonic() + duration
+    try:
+        while deadline is None or time.monotonic() < deadline:
+            timeout = POLL_INTERVAL if deadline is None else max(0.0, min(POLL_INTERVAL, deadline - time.monotonic()))
+            if sources:
+                ready, _, _ = select.select(list(sources), [], [], timeout)
+                for fd in ready:
+                    sock, reader = sources[fd]
+                    feed(reader(sock))
+            else:
+                time.sleep(timeout)
+            if nl is None:
+                # sem netlink: relê a tabela local (barato) — nenhum pacote sai na rede
+                feed((nb.ip, nb.mac, "proc") for nb in neighbors.read_proc_arp())
+    finally:
+        for sock, _ in sources.values():
+            sock.close()
+    return mon
@@ -0,0 +1,647 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ShadowSec Net Diag - Motor de descoberta (tabela de vizinhos + varredura ARP)
+# Autor: Luciano Valadão / 2025.
+# Descrição: Uma única fonte de (IP, MAC, timestamp) para a listagem de hosts e para a
+# detecção de conflitos, no lugar de `nmap -sn` + `arp-scan` (duas varreduras da mesma rede).
+# - Lê a tabela de vizinhos do kernel via netlink (RTM_GETNEIGH) ou /proc/net/arp
+# - Varredura ARP assíncrona por socket AF_PACKET (root): envia as requisições em ritmo
+#   controlado e entrega cada resposta assim que chega
+# - Sem root: provoca a resolução ARP do próprio kernel (datagrama UDP por IP), em lotes do
+#   tamanho da tabela de vizinhos (gc_thresh3), e lê a tabela após cada lote
+# Todas as fontes aceitam caminho/bytes/interface como parâmetro, então podem ser exercitadas
+# com uma tabela falsa (fixture) ou dentro de um netns com um par veth.
+
+import os                          # /sys/class/net (detecção de bridges)
+import time                        # Timestamps das observações
+import struct                      # Montagem/parsing de frames ARP e mensagens netlink
+import socket                      # AF_PACKET, AF_NETLINK, UDP
+import asyncio                     # Laço de envio/recepção da varredura
+import ipaddress                   # Alvos da varredura e filtragem por rede
+from collections import namedtuple, defaultdict
+
+# Uma observação: IP, MAC, quando foi vista e de onde veio ("arp" = resposta ao vivo, "table" = kernel)
+Sighting = namedtuple("Sighting", "ip mac timestamp source")
+# Entrada da tabela de vizinhos do kernel
+Neighbor = namedtuple("Neighbor", "ip mac iface state")
+
+PROC_ARP = "/proc/net/arp"
+PROC_ROUTE = "/proc/net/route"
+
+ARP_RATE = 500          # requisições ARP por segundo (arp-scan usa ~ 1 por 2ms)
+ARP_TIMEOUT = 1.5       # espera por respostas após a última requisição (s)
+ARP_RETRIES = 2         # passadas de envio; a segunda só para IPs ainda mudos
+CHUNK_PREFIX = 24       # redes maiores são varridas em blocos /24
+SWEEP_WORKERS = 4       # blocos varridos ao mesmo tempo (o teto de pacotes/s é global)
+MAX_SCAN_PREFIX = 16    # redes maiores que /16 são reduzidas ao /16 do endereço local
+GC_THRESH3 = "/proc/sys/net/ipv4/neigh/default/gc_thresh3"  # teto rígido da tabela de vizinhos
+# Bridges/interfaces virtuais de contêineres e VMs: ignoradas por padrão (docker0 costuma ser /16)
+VIRTUAL_IFACE_PREFIXES = ("docker", "br-", "veth", "virbr", "vnet", "lxcbr", "lxdbr", "cni", "flannel", "cali")
+ZERO_MAC = "00:00:00:00:00:00"
+
+# ==================== CONSTANTES NETLINK (linux/rtnetlink.h, linux/neighbour.h) ====================
+NETLINK_ROUTE = 0
+RTM_NEWNEIGH, RTM_DELNEIGH, RTM_GETNEIGH = 28, 29, 30
+NLMSG_ERROR, NLMSG_DONE = 2, 3
+NLM_F_REQUEST, NLM_F_DUMP = 0x1, 0x300
+NDA_DST, NDA_LLADDR = 1, 2
+RTM_GETADDR, RTM_NEWADDR = 22, 20
+IFA_ADDRESS, IFA_LOCAL = 1, 2
+IFADDRMSG = struct.Struct("=BBBBI")    # family, prefixlen, flags, scope, index
+NLMSG_HDR = struct.Struct("=LHHLL")    # len, type, flags, seq, pid
+NDMSG = struct.Struct("=BxxxiHBB")     # family, ifindex, state, flags, type
+RTATTR = struct.Struct("=HH")          # len, type
+
+NUD_STATES = {
+    0x01: "INCOMPLETE", 0x02: "REACHABLE", 0x04: "STALE", 0x08: "DELAY",
+    0x10: "PROBE", 0x20: "FAILED", 0x40: "NOARP", 0x80: "PERMANENT",
+}
+NUD_USABLE = {"REACHABLE", "STALE", "DELAY", "PROBE", "PERMANENT"}  # estados com MAC válido
+
+# ==================== FRAME ARP (Ethernet + ARP IPv4) ====================
+ETH_P_ARP = 0x0806
+ETH_HDR = struct.Struct("!6s6sH")
+ARP_PKT = struct.Struct("!HHBBH6s4s6s4s")
+ARP_REQUEST, ARP_REPLY = 1, 2
+BROADCAST = b"\xff" * 6
+
+
+def mac_to_str(raw):
+    """bytes → "AA:BB:CC:DD:EE:FF" (mesmo formato que o relatório já usava)."""
+    return ":".join(f"{b:02X}" for b in raw)
+
+
+def mac_to_bytes(mac):
+    return bytes(int(p, 16) for p in mac.replace("-", ":").split(":"))
+
+
+# ==================== TABELA DE VIZINHOS: /proc/net/arp ====================
+def read_proc_arp(path=PROC_ARP):
+    """Entradas completas de /proc/net/arp (flag ATF_COM = 0x2). Lista de Neighbor."""
+    table = []
+    try:
+        with open(path) as f:
+            next(f, None)  # cabeçalho
+            for line in f:
+                cols = line.split()
+                if len(cols) < 6:
+                    continue
+                ip, flags, mac, iface = cols[0], int(cols[2], 16), cols[3], cols[5]
+                if not flags & 0x2 or mac == ZERO_MAC:
+                    continue  # incompleta (sem resposta)
+                state = "PERMANENT" if flags & 0x4 else "REACHABLE"
+                table.append(Neighbor(ip, mac.upper(), iface, state))
+    except OSError:
+        pass
+    return table
+
+
+# ==================== TABELA DE VIZINHOS: netlink ====================
+def parse_neigh_messages(data):
+    """
+    Decodifica mensagens RTM_NEWNEIGH/RTM_DELNEIGH de um buffer netlink.
+    Gera (tipo_msg, Neighbor) — o mesmo parser serve ao dump e às notificações (RTNLGRP_NEIGH).
+    Devolve também NLMSG_DONE/NLMSG_ERROR como (tipo, None) para quem estiver esperando o fim.
+    """
+    offset = 0
+    while offset + NLMSG_HDR.size <= len(data):
+        length, msg_type, _, _, _ = NLMSG_HDR.unpack_from(data, offset)
+        if length < NLMSG_HDR.size:
+            break
+        body = offset + NLMSG_HDR.size
+        end = offset + length
+        if msg_type in (NLMSG_DONE, NLMSG_ERROR):
+            yield msg_type, None
+        elif msg_type in (RTM_NEWNEIGH, RTM_DELNEIGH) and end - body >= NDMSG.size:
+            family, ifindex, state, _, _ = NDMSG.unpack_from(data, body)
+            ip = mac = None
+            attr = body + NDMSG.size
+            while attr + RTATTR.size <= end:
+                alen, atype = RTATTR.unpack_from(data, attr)
+                if alen < RTATTR.size:
+                    break
+                value = data[attr + RTATTR.size:attr + alen]
+                if atype == NDA_DST:
+                    ip = socket.inet_ntop(family, value) if family in (socket.AF_INET, socket.AF_INET6) else None
+                elif atype == NDA_LLADDR and len(value) == 6:
+                    mac = mac_to_str(value)
+                attr += (alen + 3) & ~3  # atributos alinhados em 4 bytes
+            if ip:
+                try:
+                    iface = socket.if_indextoname(ifindex)
+                except OSError:
+                    iface = str(ifindex)
+                names = [n for bit, n in NUD_STATES.items() if state & bit]
+                yield msg_type, Neighbor(ip, mac, iface, "|".join(names) or "NONE")
+        offset += (length + 3) & ~3
+
+
+def netlink_socket(groups=0):
+    """Socket NETLINK_ROUTE; groups != 0 assina notificações (ex.: RTNLGRP_NEIGH)."""
+    sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_ROUTE)
+    sock.bind((0, groups))
+    return sock
+
+
+def read_netlink_neighbors(family=socket.AF_INET):
+    """Dump da tabela de vizinhos via RTM_GETNEIGH. Só entradas com MAC utilizável."""
+    table = []
+    with netlink_socket() as sock:
+        req = NLMSG_HDR.pack(NLMSG_HDR.size + NDMSG.size, RTM_GETNEIGH, NLM_F_REQUEST | NLM_F_DUMP, 1, 0)
+        sock.send(req + NDMSG.pack(family, 0, 0, 0, 0))
+        while True:
+            data = sock.recv(65536)
+            if not data:
+                break
+            finished = False
+            for msg_type, nb in parse_neigh_messages(data):
+                if nb is None:
+                    finished = True
+                elif msg_type == RTM_NEWNEIGH and nb.mac and nb.mac != ZERO_MAC:
+                    table.append(nb)
+            if finished:
+                break
+    return [nb for nb in table if NUD_USABLE & set(nb.state.split("|"))]
+
+
+def neighbor_table(proc_path=PROC_ARP, use_netlink=True):
+    """Tabela ARP do kernel: netlink quando disponível, senão /proc/net/arp."""
+    if use_netlink and hasattr(socket, "AF_NETLINK"):
+        try:
+            return read_netlink_neighbors()
+        except OSError:
+            pass
+    return read_proc_arp(proc_path)
+
+
+# ==================== INTERFACES E PREFIXOS LOCAIS ====================
+# Uma rede local por endereço IPv4 configurado, com o prefixo real (/16, /20, /24, ...)
+LocalNet = namedtuple("LocalNet", "iface ip network")
+
+
+def parse_addr_messages(data):
+    """Gera (ifindex, IPv4, prefixo) de mensagens RTM_NEWADDR; (None, None, None) no fim do dump."""
+    offset = 0
+    while offset + NLMSG_HDR.size <= len(data):
+        length, msg_type, _, _, _ = NLMSG_HDR.unpack_from(data, offset)
+        if length < NLMSG_HDR.size:
+            break
+        body, end = offset + NLMSG_HDR.size, offset + length
+        if msg_type in (NLMSG_DONE, NLMSG_ERROR):
+            yield None, None, None
+        elif msg_type == RTM_NEWADDR and end - body >= IFADDRMSG.size:
+            family, prefixlen, _, _, index = IFADDRMSG.unpack_from(data, body)
+            attrs = {}
+            attr = body + IFADDRMSG.size
+            while attr + RTATTR.size <= end:
+                alen, atype = RTATTR.unpack_from(data, attr)
+                if alen < RTATTR.size:
+                    break
+                attrs[atype] = data[attr + RTATTR.size:attr + alen]
+                attr += (alen + 3) & ~3
+            # IFA_LOCAL é o endereço da interface; IFA_ADDRESS é o do par em links ponto-a-ponto
+            raw = attrs.get(IFA_LOCAL) or attrs.get(IFA_ADDRESS)
+            if family == socket.AF_INET and raw and len(raw) == 4:
+                yield index, socket.inet_ntoa(raw), prefixlen
+        offset += (length + 3) & ~3
+
+
+def netlink_addresses():
+    """[(interface, IPv4, prefixo)] via RTM_GETADDR."""
+    out = []
+    with netlink_socket() as sock:
+        req = NLMSG_HDR.pack(NLMSG_HDR.size + IFADDRMSG.size, RTM_GETADDR, NLM_F_REQUEST | NLM_F_DUMP, 1, 0)
+        sock.send(req + IFADDRMSG.pack(socket.AF_INET, 0, 0, 0, 0))
+        finished = False
+        while not finished:
+            data = sock.recv(65536)
+            if not data:
+                break
+            for index, ip, prefix in parse_addr_messages(data):
+                if index is None:
+                    finished = True
+                    continue
+                try:
+                    out.append((socket.if_indextoname(index), ip, prefix))
+                except OSError:
+                    continue
+    return out
+
+
+def route_addresses(route_path=PROC_ROUTE):
+    """
+    Fallback sem netlink: rotas conectadas (gateway 0.0.0.0, máscara != 0) de /proc/net/route
+    dão o prefixo de cada interface; o endereço vem do ioctl SIOCGIFADDR.
+    """
+    out = []
+    for iface, route, gateway in _read_routes(route_path):
+        if gateway != "0.0.0.0" or route.prefixlen == 0:
+            continue
+        try:
+            ip, _ = interface_address(iface)
+        except OSError:
+            continue
+        out.append((iface, ip, route.prefixlen))
+    return out
+
+
+def _read_routes(route_path=PROC_ROUTE):
+    """[(interface, rede, gateway)] das rotas ativas de /proc/net/route."""
+    routes = []
+    try:
+        with open(route_path) as f:
+            next(f, None)
+            for line in f:
+                cols = line.split()
+                if len(cols) < 8 or not int(cols[3], 16) & 0x1:  # RTF_UP
+                    continue
+                # /proc/net/route guarda endereços em hexadecimal little-endian
+                dest = ipaddress.IPv4Address(struct.pack("<L", int(cols[1], 16)))
+                gateway = ipaddress.IPv4Address(struct.pack("<L", int(cols[2], 16)))
+                mask = ipaddress.IPv4Address(struct.pack("<L", int(cols[7], 16)))
+                routes.append((cols[0], ipaddress.ip_network(f"{dest}/{mask}", strict=False), str(gateway)))
+    except (OSError, ValueError):
+        pass
+    return routes
+
+
+def default_gateways(route_path=PROC_ROUTE):
+    """IPs dos gateways das rotas padrão (alvos preferidos de ARP spoofing)."""
+    return sorted({gw for _, route, gw in _read_routes(route_path) if route.prefixlen == 0 and gw != "0.0.0.0"})
+
+
+def is_bridge(iface, sys_net="/sys/class/net"):
+    """Bridge (tem /sys/class/net/<if>/bridge) ou interface virtual de contêiner/VM pelo nome."""
+    return iface.startswith(VIRTUAL_IFACE_PREFIXES) or os.path.isdir(f"{sys_net}/{iface}/bridge")
+
+
+def local_networks(route_path=PROC_ROUTE, use_netlink=True, include_bridges=False):
+    """
+    Todas as redes IPv4 locais (exceto loopback/link-local), interface da rota padrão primeiro.
+    Netlink (RTM_GETADDR) quando disponível; senão /proc/net/route + ioctl.
+    Bridges e interfaces de contêineres ficam de fora (include_bridges=True as inclui),
+    exceto quando carregam a rota padrão (ex.: br0 de um hypervisor).
+    """
+    addrs = []
+    if use_netlink and hasattr(socket, "AF_NETLINK"):
+        try:
+            addrs = netlink_addresses()
+        except OSError:
+            addrs = []
+    if not addrs:
+        addrs = route_addresses(route_path)
+    default_ifaces = [iface for iface, route, _ in _read_routes(route_path) if route.prefixlen == 0]
+    nets, seen = [], set()
+    for iface, ip, prefix in addrs:
+        iface_net = ipaddress.ip_interface(f"{ip}/{prefix}")
+        if iface_net.ip.is_loopback or iface_net.ip.is_link_local or prefix >= 31:
+            continue
+        if not include_bridges and iface not in default_ifaces and is_bridge(iface):
+            continue
+        key = (iface, iface_net.network)
+        if key in seen:
+            continue
+        seen.add(key)
+        nets.append(LocalNet(iface, ip, iface_net.network))
+    nets.sort(key=lambda n: (n.iface not in default_ifaces, n.iface, n.network))
+    return nets
+
+
+def scan_scope(local, max_prefix=MAX_SCAN_PREFIX):
+    """Rede efetivamente varrida: a do próprio endereço, limitada a /max_prefix (ex.: /8 → /16)."""
+    net = local.network
+    if net.prefixlen < max_prefix:
+        net = ipaddress.ip_interface(f"{local.ip}/{max_prefix}").network
+    return net
+
+
+# ==================== INTERFACE DE SAÍDA PARA UMA REDE ====================
+def route_interface(network, route_path=PROC_ROUTE):
+    """Interface cuja rota (mais específica) cobre a rede; cai na rota padrão."""
+    net = ipaddress.ip_network(network, strict=False)
+    best = None
+    for iface, route, _ in _read_routes(route_path):
+        if net.version == 4 and net.subnet_of(route) and (best is None or route.prefixlen > best[1]):
+            best = (iface, route.prefixlen)
+    return best[0] if best else None
+
+
+def interface_address(iface):
+    """(IPv4, MAC) de uma interface: ioctl SIOCGIFADDR + /sys/class/net/<if>/address."""
+    import fcntl
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        packed = fcntl.ioctl(s.fileno(), 0x8915, struct.pack("256s", iface.encode()[:15]))  # SIOCGIFADDR
+    ip = socket.inet_ntoa(packed[20:24])
+    with open(f"/sys/class/net/{iface}/address") as f:
+        mac = f.read().strip().upper()
+    return ip, mac
+
+
+# ==================== VARREDURA ARP ASSÍNCRONA (AF_PACKET) ====================
+class RateLimiter:
+    """Balde de fichas compartilhado pelas varreduras concorrentes: teto global de pacotes/s."""
+
+    def __init__(self, rate):
+        self.rate = float(max(1, rate))
+        self.capacity = max(1.0, self.rate / 100)  # rajadas de até 10ms de tráfego
+        self.tokens = self.capacity
+        self.last = time.monotonic()
+
+    async def acquire(self):
+        # Um único laço de eventos → sem lock
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def build_arp_request(src_mac, src_ip, target_ip):
+    sha = mac_to_bytes(src_mac)
+    eth = ETH_HDR.pack(BROADCAST, sha, ETH_P_ARP)
+    arp = ARP_PKT.pack(1, 0x0800, 6, 4, ARP_REQUEST, sha, socket.inet_aton(src_ip),
+                       b"\x00" * 6, socket.inet_aton(target_ip))
+    return eth + arp
+
+
+def parse_arp_frame(frame):
+    """(op, IP do remetente, MAC do remetente) de um frame ARP IPv4/Ethernet; None se não for."""
+    if len(frame) < ETH_HDR.size + ARP_PKT.size:
+        return None
+    _, _, ethertype = ETH_HDR.unpack_from(frame)
+    if ethertype != ETH_P_ARP:
+        return None
+    htype, ptype, hlen, plen, op, sha, spa, _, _ = ARP_PKT.unpack_from(frame, ETH_HDR.size)
+    if htype != 1 or ptype != 0x0800 or hlen != 6 or plen != 4:
+        return None
+    return op, socket.inet_ntoa(spa), mac_to_str(sha)
+
+
+def open_arp_socket(iface):
+    """Socket AF_PACKET preso à interface e filtrado por ethertype ARP (exige CAP_NET_RAW)."""
+    sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ARP))
+    sock.bind((iface, 0))
+    sock.setblocking(False)
+    return sock
+
+
+async def arp_sweep(iface, targets, src_ip, src_mac, rate=ARP_RATE, timeout=ARP_TIMEOUT,
+                    retries=ARP_RETRIES, sock=None, limiter=None, on_slot=None):
+    """
+    Gerador assíncrono de Sighting: envia uma requisição ARP por alvo (ritmo ditado por `limiter`,
+    ou por um limitador próprio de `rate` pacotes/s) e entrega cada resposta no momento em que
+    chega. Respostas de MACs diferentes para o mesmo IP são todas entregues — é exatamente o que a
+    detecção de conflito precisa. Também registra requisições espontâneas de hosts da faixa.
+    on_slot(n) é chamado a cada n "vagas" de envio concluídas (targets × retries no total; IPs já
+    respondidos contam como concluídos nas passadas seguintes) — base do progresso/ETA.
+    """
+    wanted = {str(ip) for ip in targets}
+    own = sock is None
+    sock = sock or open_arp_socket(iface)
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    answered = set()
+    limiter = limiter or RateLimiter(rate)
+
+    def on_readable():
+        # drena tudo o que já chegou; recv não bloqueia
+        while True:
+            try:
+                frame = sock.recv(2048)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                return
+            rec = parse_arp_frame(frame)
+            if rec is None:
+                continue
+            op, ip, mac = rec
+            if mac == src_mac or ip not in wanted or op not in (ARP_REQUEST, ARP_REPLY):
+                continue
+            answered.add(ip)
+            queue.put_nowait(Sighting(ip, mac, time.time(), "arp"))
+
+    async def sender():
+        passes = max(1, retries)
+        for attempt in range(passes):
+            pending = [ip for ip in sorted(wanted, key=ipaddress.ip_address) if ip not in answered]
+            if on_slot and len(wanted) > len(pending):
+                on_slot(len(wanted) - len(pending))
+            for ip in pending:
+                await limiter.acquire()
+                try:
+                    sock.send(build_arp_request(src_mac, src_ip, ip))
+                except BlockingIOError:
+                    await asyncio.sleep(0.001)
+                if on_slot:
+                    on_slot(1)
+            await asyncio.sleep(timeout if attempt == passes - 1 else timeout / 2)
+
+    loop.add_reader(sock.fileno(), on_readable)
+    task = asyncio.ensure_future(sender())
+    try:
+        while not (task.done() and queue.empty()):
+            try:
+                yield await asyncio.wait_for(queue.get(), 0.05)
+            except asyncio.TimeoutError:
+                continue
+        task.result()  # propaga erro de envio, se houve
+    finally:
+        task.cancel()
+        loop.remove_reader(sock.fileno())
+        if own:
+            sock.close()
+
+
+# ==================== SEM ROOT: RESOLUÇÃO PELO PRÓPRIO KERNEL ====================
+def kick_batch_size(path=GC_THRESH3):
+    """
+    Alvos por lote do kick: metade de gc_thresh3 (padrão 1024). Acima do teto o kernel
+    descarta entradas — inclusive as que acabaram de ser resolvidas — e recusa novas.
+    """
+    try:
+        with open(path) as f:
+            thresh = int(f.read().strip())
+    except (OSError, ValueError):
+        thresh = 1024
+    return max(64, thresh // 2)
+
+
+def kick_estimate(network, rate=ARP_RATE, settle=ARP_TIMEOUT, batch=None):
+    """Duração prevista (s) do kick em lotes: envio ao teto de `rate` + uma espera por lote."""
+    n = len(_targets(network))
+    return n / rate + -(-n // (batch or kick_batch_size())) * settle
+
+
+def kick_neighbors(targets, rate=ARP_RATE, settle=ARP_TIMEOUT, batch=None, on_progress=None):
+    """
+    Envia um datagrama UDP (porta discard) a cada alvo: o kernel precisa resolver o MAC e
+    dispara o ARP sozinho. Os alvos vão em lotes do tamanho da tabela de vizinhos (ver
+    kick_batch_size); após cada lote espera `settle` segundos e lê a tabela, antes que a
+    coleta de lixo do kernel descarte as respostas. Retorna a lista de Neighbor acumulada.
+    on_progress(feitos, total, decorrido) é chamado a cada lote.
+    """
+    targets = list(targets)
+    batch = batch or kick_batch_size()
+    seen = {}
+    start = time.monotonic()
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        s.setblocking(False)
+        for first in range(0, len(targets), batch):
+            for i, ip in enumerate(targets[first:first + batch]):
+                try:
+                    s.sendto(b"", (str(ip), 9))
+                except OSError:
+                    pass
+                if rate and i % max(1, rate // 100) == 0:
+                    time.sleep(0.01)
+            time.sleep(settle)
+            for nb in neighbor_table():
+                if nb.mac:
+                    seen[nb.ip] = nb
+            if on_progress:
+                on_progress(min(first + batch, len(targets)), len(targets), time.monotonic() - start)
+    return list(seen.values())
+
+
+# ==================== MOTOR DE DESCOBERTA ====================
+def _targets(network):
+    net = ipaddress.ip_network(network, strict=False)
+    return list(net.hosts()) if net.num_addresses > 1 else [net.network_address]
+
+
+def table_sightings(network, table=None):
+    """Observações vindas da tabela de vizinhos, filtradas pela rede."""
+    net = ipaddress.ip_network(network, strict=False)
+    now = time.time()
+    table = neighbor_table() if table is None else table
+    out = []
+    for nb in table:
+        try:
+            if ipaddress.ip_address(nb.ip) in net and nb.mac:
+                out.append(Sighting(nb.ip, nb.mac, now, "table"))
+        except ValueError:
+            continue
+    return out
+
+
+def chunk_network(network, prefix=CHUNK_PREFIX):
+    """Divide a rede em blocos /prefix (redes menores ficam inteiras)."""
+    net = ipaddress.ip_network(network, strict=False)
+    if net.prefixlen >= prefix:
+        return [net]
+    return list(net.subnets(new_prefix=prefix))
+
+
+def sweep_estimate(network, rate=ARP_RATE, timeout=ARP_TIMEOUT, retries=ARP_RETRIES):
+    """Duração prevista (s): todas as vagas ao teto de `rate` + as esperas por respostas."""
+    return len(_targets(network)) * max(1, retries) / rate + timeout * max(1, retries)
+
+
+async def sweep_chunks(iface, network, src_ip, src_mac, rate=ARP_RATE, timeout=ARP_TIMEOUT,
+                       retries=ARP_RETRIES, chunk_prefix=CHUNK_PREFIX, workers=SWEEP_WORKERS,
+                       on_sighting=None, on_progress=None, progress_every=0.5):
+    """
+    Agendador: os blocos da rede são varridos por até `workers` varreduras concorrentes que
+    dividem um único RateLimiter — o tráfego total nunca passa de `rate` pacotes/s, então o
+    tempo de uma /16 é previsível (~65k × retries / rate). on_progress(feitas, total, decorrido)
+    é chamado no máximo a cada `progress_every` segundos e uma vez ao final.
+    """
+    chunks = chunk_network(network, chunk_prefix)
+    limiter = RateLimiter(rate)
+    gate = asyncio.Semaphore(max(1, workers))
+    total = sum(len(_targets(c)) for c in chunks) * max(1, retries)
+    state = {"done": 0, "last": 0.0}
+    start = time.monotonic()
+    seen = []
+
+    def on_slot(n):
+        state["done"] += n
+        now = time.monotonic()
+        if on_progress and now - state["last"] >= progress_every:
+            state["last"] = now
+            on_progress(state["done"], total, now - start)
+
+    async def run(chunk):
+        async with gate:
+            async for s in arp_sweep(iface, _targets(chunk), src_ip, src_mac, rate, timeout, retries,
+                                     limiter=limiter, on_slot=on_slot):
+                seen.append(s)
+                if on_sighting:
+                    on_sighting(s)
+
+    await asyncio.gather(*(run(c) for c in chunks))
+    if on_progress:
+        on_progress(total, total, time.monotonic() - start)
+    return seen
+
+
+def format_progress(done, total, elapsed, rate=ARP_RATE):
+    """
+    "1234/65534 (1.9%) 12s decorridos, ETA 2m10s" — ETA pelo teto de taxa ou, se mais lento
+    (esperas entre lotes do kick sem root), pelo ritmo observado até aqui.
+    """
+    pct = 100.0 * done / total if total else 100.0
+    eta = 0
+    if done < total:
+        eta = (total - done) / rate
+        if done:
+            eta = max(eta, elapsed / done * (total - done))
+    return f"{done}/{total} ({pct:.1f}%) {fmt_secs(elapsed)} decorridos, ETA {fmt_secs(eta)}"
+
+
+def fmt_secs(secs):
+    secs = int(round(secs))
+    return f"{secs // 60}m{secs % 60:02d}s" if secs >= 60 else f"{secs}s"
+
+
+def discover(network, iface=None, rate=ARP_RATE, timeout=ARP_TIMEOUT, on_sighting=None, table=None,
+             src_ip=None, chunk_prefix=CHUNK_PREFIX, workers=SWEEP_WORKERS, on_progress=None):
+    """
+    Uma varredura da rede → lista de Sighting para hosts_from() e conflicts_from().
+    Com CAP_NET_RAW usa a varredura ARP própria (em blocos, ver sweep_chunks); sem ela,
+    kick_neighbors em lotes do tamanho da tabela do kernel (lida após cada lote). A tabela completa o resultado com IPs que não
+    responderam à varredura. `table` permite injetar uma tabela falsa (lista de Neighbor).
+    """
+    targets = _targets(network)
+    sightings = []
+    iface = iface or route_interface(network)
+    swept = False
+    if iface and hasattr(socket, "AF_PACKET"):
+        try:
+            if_ip, src_mac = interface_address(iface)
+            sightings = asyncio.run(sweep_chunks(iface, network, src_ip or if_ip, src_mac, rate, timeout,
+                                                 chunk_prefix=chunk_prefix, workers=workers,
+                                                 on_sighting=on_sighting, on_progress=on_progress))
+            swept = True
+        except (PermissionError, OSError):
+            sightings = []
+    if not swept and table is None:
+        table = kick_neighbors(targets, rate, timeout, on_progress=on_progress)
+    live = {s.ip for s in sightings}
+    for s in table_sightings(network, table):
+        if s.ip not in live:  # a tabela só complementa; nunca contradiz uma resposta ao vivo
+            sightings.append(s)
+            if on_sighting:
+                on_sighting(s)
+    return sightings
+
+
+def hosts_from(sightings):
+    """[(IP, MAC)] únicos, ordenados por IP (primeiro MAC observado para cada IP)."""
+    first = {}
+    for s in sightings:
+        first.setdefault(s.ip, s.mac or "MAC Unknown")
+    return sorted(first.items(), key=lambda h: ipaddress.ip_address(h[0]))
+
+
+def conflicts_from(sightings):
+    """{IP: [MACs]} para IPs reivindicados por mais de um MAC."""
+    macs = defaultdict(list)
+    for s in sightings:
+        if s.mac and s.mac not in macs[s.ip]:
+            macs[s.ip].append(s.mac)
+    return {ip: m for ip, m in macs.items() if len(m) > 1}
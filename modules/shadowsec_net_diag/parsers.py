@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ShadowSec Net Diag - Camada de parsing em streaming (nmap, arp-scan, arp -a)
+# Autor: Luciano Valadão / 2025.
+# Descrição: Em vez de bufferizar a saída inteira do comando e aplicar re.search não compilado
+# em cada linha, consome o stdout do subprocesso linha a linha (ou em blocos, no caso do XML)
+# e entrega um HostRecord assim que o host termina de ser descrito.
+# - nmap saída normal, -oG (grepable) e -oX (XML, via xml.etree.XMLPullParser incremental)
+# - arp-scan e arp -a (Linux/macOS/Windows)
+# Memória proporcional a um host, não à varredura; primeiro resultado antes do fim do comando.
+
+import re                          # Padrões pré-compilados (uma vez, no import)
+import subprocess                  # Execução com stdout em pipe
+import xml.etree.ElementTree as ET # XMLPullParser para o -oX incremental
+from collections import namedtuple
+
+# Um host descoberto: IP, MAC (None se desconhecido), fabricante e estado ("up"/"down")
+HostRecord = namedtuple("HostRecord", "ip mac vendor status")
+
+# ==================== PADRÕES PRÉ-COMPILADOS ====================
+IPV4 = r"(\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})"
+MAC = r"([0-9A-Fa-f]{2}(?:[:-][0-9A-Fa-f]{2}){5})"
+NMAP_REPORT_RE = re.compile(r"^Nmap scan report for (?:.*?\()?" + IPV4 + r"\)?\s*$")
+NMAP_MAC_RE = re.compile(r"^MAC Address: " + MAC + r"(?: \((.*)\))?")
+NMAP_DOWN_RE = re.compile(r"^Host seems down")
+NMAP_GREP_RE = re.compile(r"^Host: " + IPV4 + r" \(.*?\)\s+Status: (\w+)")
+ARP_LINE_RE = re.compile(r"\(?" + IPV4 + r"\)?\s+(?:at\s+)?" + MAC + r"(?:\s+(.*))?")
+
+XML_CHUNK = 64 * 1024
+
+
+def normalize_mac(mac):
+    """Padroniza "aa-bb-..." / "aa:bb:..." em "AA:BB:..." (mesmo formato do relatório)."""
+    return mac.upper().replace("-", ":") if mac else None
+
+
+# ==================== SUBPROCESSO EM STREAMING ====================
+def stream_lines(args):
+    """
+    Executa `args` (lista, sem shell) e gera as linhas do stdout conforme são escritas.
+    Ao final, levanta CalledProcessError se o comando falhou; FileNotFoundError se não existe.
+    """
+    proc = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, bufsize=1)
+    try:
+        for line in proc.stdout:
+            yield line.rstrip("\n")
+    finally:
+        proc.stdout.close()
+        rc = proc.wait()
+    if rc != 0:
+        raise subprocess.CalledProcessError(rc, args)
+
+
+def stream_chunks(args, size=XML_CHUNK):
+    """Como stream_lines, mas em blocos binários (para o parser XML incremental)."""
+    proc = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            chunk = proc.stdout.read1(size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        proc.stdout.close()
+        rc = proc.wait()
+    if rc != 0:
+        raise subprocess.CalledProcessError(rc, args)
+
+
+# ==================== NMAP: SAÍDA NORMAL ====================
+def parse_nmap_normal(lines):
+    """
+    "Nmap scan report for ..." abre um host; "MAC Address: ..." o completa. O host é entregue
+    ao ver o MAC (ou ao abrir o próximo / no fim) — não espera a varredura terminar.
+    """
+    current = None
+    for line in lines:
+        m = NMAP_REPORT_RE.match(line)
+        if m:
+            if current:
+                yield current
+            current = HostRecord(m.group(1), None, None, "up")
+            continue
+        if current is None:
+            continue
+        m = NMAP_MAC_RE.match(line)
+        if m:
+            yield current._replace(mac=normalize_mac(m.group(1)), vendor=m.group(2))
+            current = None
+        elif NMAP_DOWN_RE.match(line):
+            current = current._replace(status="down")
+    if current:
+        yield current
+
+
+# ==================== NMAP: -oG (GREPABLE) ====================
+def parse_nmap_grepable(lines):
+    """Linhas "Host: IP (nome)\\tStatus: Up". O formato -oG não traz MAC."""
+    for line in lines:
+        m = NMAP_GREP_RE.match(line)
+        if m:
+            yield HostRecord(m.group(1), None, None, m.group(2).lower())
+
+
+# ==================== NMAP: -oX (XML INCREMENTAL) ====================
+def parse_nmap_xml(chunks):
+    """
+    Alimenta um XMLPullParser com blocos da saída -oX e entrega cada <host> quando o elemento
+    fecha. Cada filho de <nmaprun> já processado é removido da raiz (clear() sozinho deixaria
+    o elemento vazio pendurado nela) — a memória fica proporcional a um host.
+    """
+    parser = ET.XMLPullParser(events=("start", "end"))
+    state = {"root": None, "depth": 0}
+    for chunk in chunks:
+        parser.feed(chunk)
+        yield from _xml_hosts(parser, state)
+    parser.close()
+    yield from _xml_hosts(parser, state)
+
+
+def _xml_hosts(parser, state):
+    for event, elem in parser.read_events():
+        if event == "start":
+            if state["root"] is None:
+                state["root"] = elem
+            state["depth"] += 1
+            continue
+        state["depth"] -= 1
+        if state["depth"] != 1:
+            continue  # só filhos diretos de <nmaprun> (host, hosthint, runstats...)
+        record = None
+        if elem.tag == "host":
+            status = elem.find("status")
+            ip = mac = vendor = None
+            for addr in elem.iter("address"):
+                kind = addr.get("addrtype")
+                if kind == "ipv4":
+                    ip = addr.get("addr")
+                elif kind == "mac":
+                    mac, vendor = normalize_mac(addr.get("addr")), addr.get("vendor")
+            if ip:
+                record = HostRecord(ip, mac, vendor, status.get("state") if status is not None else "up")
+        state["root"].remove(elem)
+        if record:
+            yield record
+
+
+# ==================== ARP-SCAN / ARP -A ====================
+def parse_arp_lines(lines):
+    """
+    arp-scan ("IP<tab>MAC<tab>fabricante"), arp -a no Linux/macOS ("? (IP) at MAC ...") e no
+    Windows ("IP   aa-bb-...   dinâmico"). Uma linha = um HostRecord.
+    """
+    for line in lines:
+        m = ARP_LINE_RE.search(line)
+        if m:
+            vendor = m.group(3).strip() if m.group(3) and "\t" in line else None
+            yield HostRecord(m.group(1), normalize_mac(m.group(2)), vendor, "up")
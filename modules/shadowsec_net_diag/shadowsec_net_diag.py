@@ -11,8 +11,12 @@ import os                          # Interage com o sistema operacional (ex: ver
 import json                        # Salva o relatório em formato JSON legível
 import datetime                    # Gera data/hora para timestamp nos arquivos
 import platform                    # Detecta o sistema operacional atual (Linux, Windows, Darwin/macOS)
+import argparse                    # Opções de linha de comando (--monitor)
 from collections import defaultdict  # Dicionário que cria listas automaticamente (útil para agrupar MACs por IP)
 
+import neighbors                   # Motor de descoberta: tabela de vizinhos + varredura ARP (uma só passada)
+import parsers                     # Parsing em streaming da saída de nmap/arp-scan/arp -a
+
 # ==================== CORES PARA O TERMINAL (estilo dark cyberpunk) ====================
 RESET = "\033[0m"                  # Reseta a cor do terminal para o padrão
 VIOLET = "\033[38;2;170;50;220m"   # Cor violeta profunda
@@ -64,12 +68,33 @@ def get_local_info():
         ip = mac = "Unknown"  # SO não suportado
     return ip or "Unknown", mac or "Unknown"
 
-# ==================== DETECTA A SUB-REDE LOCAL (ex: 192.168.1.0/24) ====================
+# ==================== DETECTA AS SUB-REDES LOCAIS (prefixo real: /16, /20, /24...) ====================
+def get_local_networks(include_bridges=False):
+    """
+    Linux: todas as redes IPv4 das interfaces (netlink RTM_GETADDR ou /proc/net/route), com o
+    prefixo configurado — a interface da rota padrão vem primeiro. Redes maiores que /16 são
+    reduzidas ao /16 do próprio endereço. Bridges/docker ficam de fora, salvo include_bridges.
+    Demais SOs: a rede única de get_local_network().
+    Retorna lista de strings CIDR.
+    """
+    if OS == "Linux":
+        nets = []
+        for local in neighbors.local_networks(include_bridges=include_bridges):
+            scope = str(neighbors.scan_scope(local))
+            if scope != str(local.network):
+                print(f"{BLOOD_RED}[!] {local.network} ({local.iface}) é grande demais; varrendo só {scope}.{RESET}")
+            if scope not in nets:
+                nets.append(scope)
+        return nets
+    network = get_local_network()
+    return [network] if network else []
+
 def get_local_network():
     """Descobre a sub-rede da rede atual baseada no gateway padrão"""
     if OS == "Linux":
-        output = run_command("ip route | grep default")
-        match = re.search(r'src (\d+\.\d+\.\d+\.\d+)', output)
+        # Prefixo real da interface da rota padrão (não mais um /24 fixo)
+        nets = neighbors.local_networks()
+        return str(neighbors.scan_scope(nets[0])) if nets else None
     elif OS == "Windows":
         output = run_command("ipconfig")
         match = re.search(r'Gateway.*: (\d+\.\d+\.\d+\.\d+)', output)
@@ -85,53 +110,69 @@ def get_local_network():
         return f"{'.'.join(ip.split('.')[:-1])}.0/24"
     return None
 
+# ==================== DESCOBERTA ÚNICA (LINUX) ====================
+def discover_network(network):
+    """
+    Linux: uma única varredura ARP (ou tabela de vizinhos, sem root) que alimenta tanto a
+    listagem de hosts quanto a detecção de conflitos. Retorna lista de neighbors.Sighting.
+    """
+    print(f"{VIOLET}[+] Descobrindo hosts em {network} (tabela de vizinhos + varredura ARP)...{RESET}")
+    # sem root a descoberta cai no kick em lotes (espera por lote), mais lento que a varredura
+    estimate = neighbors.sweep_estimate(network) if os.geteuid() == 0 else neighbors.kick_estimate(network)
+    if estimate > 10:
+        print(f"{CYAN}[*] Tempo previsto: {neighbors.fmt_secs(estimate)} "
+              f"(teto de {neighbors.ARP_RATE} pacotes/s){RESET}")
+
+    def progress(done, total, elapsed):
+        # Atualiza a mesma linha do terminal com progresso e ETA
+        end = "\n" if done >= total else ""
+        print(f"\r{CYAN}[*] {neighbors.format_progress(done, total, elapsed)}{RESET}\033[K", end=end, flush=True)
+
+    try:
+        return neighbors.discover(network, on_progress=progress if estimate > 10 else None)
+    except (OSError, ValueError) as e:
+        print(f"{BLOOD_RED}[!] Descoberta nativa falhou ({e}); usando nmap/arp-scan.{RESET}")
+        return None
+
 # ==================== ESCANEIA HOSTS ATIVOS COM NMAP ====================
-def scan_for_hosts(network):
+def scan_for_hosts(network, sightings=None):
     """Faz um ping scan com nmap para descobrir dispositivos ativos na rede"""
+    if sightings is not None:
+        # Já temos as observações da descoberta nativa: nada de uma segunda varredura
+        return neighbors.hosts_from(sightings)
     print(f"{VIOLET}[+] Escaneando hosts em {network}...{RESET}")
-    output = run_command(f"nmap -sn {network}")
-    if not output:
-        print(f"{BLOOD_RED}[!] nmap não encontrado ou falhou. Instale para melhor resultado.{RESET}")
-        return []
-
     hosts = []
-    current_ip = None
-    for line in output.splitlines():
-        # Procura por linhas com IP
-        ip_match = re.search(r'Nmap scan report for .*?(\d+\.\d+\.\d+\.\d+)', line)
-        if ip_match:
-            current_ip = ip_match.group(1)
-        # Procura por MAC e fabricante
-        mac_match = re.search(r'MAC Address: (\S+) \((.+)\)', line)
-        if current_ip and mac_match:
-            hosts.append((current_ip, mac_match.group(1)))
-            current_ip = None
-        elif current_ip:
-            # Se achou IP mas não MAC
-            hosts.append((current_ip, "MAC Unknown"))
-            current_ip = None
+    try:
+        # Saída XML (-oX -) lida em blocos: cada host chega assim que o nmap o conclui
+        for host in parsers.parse_nmap_xml(parsers.stream_chunks(["nmap", "-sn", "-oX", "-", network])):
+            if host.status == "up":
+                hosts.append((host.ip, host.mac or "MAC Unknown"))
+    except (OSError, subprocess.CalledProcessError, parsers.ET.ParseError) as e:
+        print(f"{BLOOD_RED}[!] Erro ao executar nmap: {e}{RESET}")
+        if not hosts:
+            print(f"{BLOOD_RED}[!] nmap não encontrado ou falhou. Instale para melhor resultado.{RESET}")
     return hosts
 
 # ==================== VERIFICA CONFLITOS DE IP VIA TABELA ARP ====================
-def check_ip_conflicts(network):
+def check_ip_conflicts(network, sightings=None):
     """Compara tabela ARP para ver se algum IP está associado a mais de um MAC"""
     print(f"{VIOLET}[+] Verificando conflitos de IP...{RESET}")
+    if sightings is not None:
+        # Respostas ARP de MACs diferentes para o mesmo IP, vindas da mesma varredura
+        return neighbors.conflicts_from(sightings)
     if OS == "Linux":
-        output = run_command(f"arp-scan {network}")
+        cmd = ["arp-scan", network]
     else:
-        output = run_command("arp -a")  # Windows e macOS usam arp -a
-
-    if not output:
-        return {}
+        cmd = ["arp", "-a"]  # Windows e macOS usam arp -a
 
     ip_mac = defaultdict(list)  # Dicionário que cria listas automaticamente
-    for line in output.splitlines():
-        # Expressão regular flexível para capturar IP e MAC em vários formatos
-        match = re.search(r'(\d+\.\d+\.\d+\.\d+)\s+([0-9a-f:-]+)', line, re.IGNORECASE)
-        if match:
-            ip, mac = match.groups()
-            mac = mac.upper().replace('-', ':')  # Padroniza formato MAC
-            ip_mac[ip].append(mac)
+    try:
+        # Linha a linha, direto do pipe do comando, com padrões pré-compilados
+        for host in parsers.parse_arp_lines(parsers.stream_lines(cmd)):
+            if host.mac not in ip_mac[host.ip]:  # o mesmo MAC repetido (DUP) não é conflito
+                ip_mac[host.ip].append(host.mac)
+    except (OSError, subprocess.CalledProcessError) as e:
+        print(f"{BLOOD_RED}[!] Erro ao executar comando: {e}{RESET}")
 
     # IPs com mais de um MAC = conflito
     conflicts = {ip: macs for ip, macs in ip_mac.items() if len(macs) > 1}
@@ -150,8 +191,52 @@ def renew_ip():
         run_command("sudo ipconfig set en0 DHCP", capture_output=False)
     print(f"{MIDNIGHT}[+] IP renovado. Execute novamente para verificar.{RESET}")
 
+# ==================== MONITOR CONTÍNUO (--monitor) ====================
+def monitor_network(window=None, duration=None):
+    """
+    Acompanha a tabela de vizinhos (netlink) e o ARP da rede sem revarrer, alertando quando um IP
+    troca de MAC ou é reivindicado por vários MACs dentro da janela. Eventos vão para o terminal
+    e para um arquivo NDJSON. Só Linux.
+    """
+    import monitor  # importado aqui: o modo normal não precisa dele
+
+    if OS != "Linux":
+        print(f"{BLOOD_RED}[!] --monitor depende de netlink/AF_PACKET e só está disponível no Linux.{RESET}")
+        return 1
+    networks = get_local_networks()
+    gateways = neighbors.default_gateways()
+    iface = neighbors.route_interface(networks[0]) if networks else None
+    window = window or monitor.WINDOW
+    filename = f"shadowsec_net_monitor_{datetime.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.jsonl"
+    print(f"{CYAN}[*] Monitorando {', '.join(networks) or 'todas as redes'} "
+          f"(janela {int(window)}s, gateways: {', '.join(gateways) or 'nenhum'}). Ctrl+C para sair.{RESET}")
+
+    with open(filename, "a", encoding="utf-8") as out:
+        def on_event(event):
+            # Cada evento: linha colorida no terminal + linha JSON no arquivo
+            when = datetime.datetime.fromtimestamp(event.timestamp).strftime("%d/%m/%Y %H:%M:%S")
+            if event.kind == "mac-change":
+                text = f"IP {event.ip} trocou de MAC: {event.macs[0]} → {event.macs[1]}"
+            else:
+                text = f"IP {event.ip} reivindicado por vários MACs: {', '.join(event.macs)}"
+            extra = f" — {event.detail}" if event.detail else ""
+            print(f"{BLOOD_RED}[!] {when} {text}{extra} ({event.source}){RESET}")
+            out.write(json.dumps({"timestamp": when, "event": event.kind, "ip": event.ip,
+                                  "macs": list(event.macs), "source": event.source,
+                                  "detail": event.detail}, ensure_ascii=False) + "\n")
+            out.flush()
+
+        try:
+            mon = monitor.run(on_event, iface=iface, networks=networks, gateways=gateways,
+                              duration=duration, window=window)
+            print(f"{MIDNIGHT}[+] Monitor encerrado: {len(mon.current())} IPs acompanhados.{RESET}")
+        except KeyboardInterrupt:
+            print(f"\n{MIDNIGHT}[+] Monitor encerrado pelo usuário.{RESET}")
+    print(f"{VIOLET}[+] Eventos salvos em: {filename}{RESET}")
+    return 0
+
 # ==================== FUNÇÃO PRINCIPAL ====================
-def main():
+def main(include_bridges=False):
     # Exibe o SO detectado
     print(f"{CYAN}[*] ShadowSec Net Diag v1.0 | SO Detectado: {OS}{RESET}")
 
@@ -161,15 +246,30 @@ def main():
 
     # Pega informações locais
     my_ip, my_mac = get_local_info()
-    network = get_local_network() or "Desconhecida"
+    networks = get_local_networks(include_bridges)
+    network = networks[0] if networks else "Desconhecida"
 
     # Exibe informações iniciais
     print(f"{CYAN}[*] Diagnóstico iniciado em: {timestamp_readable}{RESET}")
     print(f"{CYAN}[*] Sua máquina: {my_ip} ({my_mac}){RESET}")
-    print(f"{CYAN}[*] Rede detectada: {network}{RESET}\n")
+    print(f"{CYAN}[*] Rede detectada: {network}{RESET}")
+    if len(networks) > 1:
+        print(f"{CYAN}[*] Outras redes locais: {', '.join(networks[1:])}{RESET}")
+    print()
+
+    # Linux: uma só varredura (por rede) alimenta hosts e conflitos; demais SOs seguem com nmap/arp -a
+    sightings = None
+    if OS == "Linux" and networks:
+        sightings = []
+        for net in networks:
+            found = discover_network(net)
+            if found is None:  # descoberta nativa indisponível → caminho antigo na rede principal
+                sightings = None
+                break
+            sightings.extend(found)
 
     # Escaneia hosts
-    hosts = scan_for_hosts(network)
+    hosts = scan_for_hosts(network, sightings)
     # Garante que o próprio dispositivo apareça na lista
     if my_ip != "Unknown" and not any(h[0] == my_ip for h in hosts):
         hosts.append((my_ip, my_mac))
@@ -181,7 +281,7 @@ def main():
         print(f"  - {ip} ({mac}) {status}")
 
     # Verifica conflitos
-    conflicts = check_ip_conflicts(network)
+    conflicts = check_ip_conflicts(network, sightings)
 
     # Se houver conflitos, alerta e oferece solução
     if conflicts:
@@ -204,6 +304,7 @@ def main():
         "os": OS,
         "your_device": {"ip": my_ip, "mac": my_mac},
         "network": network,
+        "networks": networks,
         "hosts": hosts,
         "conflicts": conflicts
     }
@@ -215,4 +316,16 @@ def main():
 
 # ==================== EXECUÇÃO DO SCRIPT ====================
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="ShadowSec Net Diag")
+    parser.add_argument("--monitor", action="store_true",
+                        help="Monitora continuamente conflitos de IP e trocas de MAC (ARP spoofing).")
+    parser.add_argument("--window", type=float, metavar="SEG",
+                        help="Janela (s) para considerar vários MACs no mesmo IP um conflito (padrão 300).")
+    parser.add_argument("--duration", type=float, metavar="SEG",
+                        help="Com --monitor: encerra após SEG segundos (padrão: até Ctrl+C).")
+    parser.add_argument("--include-bridges", action="store_true",
+                        help="Também varre redes de bridges/contêineres (docker0, br-*, virbr*...).")
+    args = parser.parse_args()
+    if args.monitor:
+        raise SystemExit(monitor_network(args.window, args.duration))
+    main(args.include_bridges)
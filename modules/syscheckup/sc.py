@@ -13,6 +13,11 @@ import tempfile # Para obter o diretório temporário do sistema (usado na limpe
 import datetime # Para manipular datas e horários (usado para logs e timestamps)
 import time # Para funções relacionadas a tempo (usado no spinner e pausas)
 from pathlib import Path # Para manipulação moderna de caminhos de arquivos (melhor que 'os.path')
+import sys # Para incluir a raiz do repositório no path de importação
+
+# Raiz do repositório no path → módulos compartilhados em toolkit/
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from toolkit import dpkg_verify # Verificação nativa dos md5sums do dpkg (substitui o debsums)
 
 # ====== CORES ======
 # Define códigos ANSI para colorir o texto no terminal, melhorando a saída visual
@@ -417,20 +422,44 @@ def conexoes_rede():
         print(out)
     pause()
 
+def verificar_com_sudo():
+    """Roda 'python3 -m toolkit.dpkg_verify' com sudo e produz as linhas conforme chegam."""
+    root = Path(__file__).resolve().parents[2]
+    proc = subprocess.Popen(["sudo", sys.executable, "-m", "toolkit.dpkg_verify"], cwd=root,
+                            stdout=subprocess.PIPE, text=True)
+    for line in proc.stdout:
+        yield line.rstrip("\n")
+    if proc.wait() != 0:
+        log(f"{RED}sudo/verificador falhou (código {proc.returncode}) — execute como root.{NC}")
+
 def integridade_sistema():
     """Verifica a integridade dos arquivos do sistema (debsums no Linux, sfc no Windows)."""
     log(f"{YELLOW}[11/12] Checando integridade de pacotes/sistema...{NC}")
     if is_linux():
-        if not shutil.which("debsums"): # Se debsums não está instalado, instala
-            log("debsums não encontrado. Instalando...")
-            run_cmd("sudo apt install debsums -y")
-        # Roda debsums para verificar arquivos modificados
-        out, err, rc = run_cmd("sudo debsums -s || true")
-        if out.strip():
-            log("Verificações de integridade encontraram problemas (listados abaixo):")
-            print(out)
+        if os.path.isdir(dpkg_verify.DPKG_INFO):
+            # Verificador nativo: md5sums do dpkg em paralelo, com cache por stat
+            # Saída no mesmo formato do 'debsums -s'; divergências aparecem conforme são encontradas
+            if os.geteuid() == 0:
+                lines = (dpkg_verify.format_debsums(*res) for res in dpkg_verify.verify_packages())
+            elif shutil.which("sudo"):
+                # Sem root, arquivos ilegíveis virariam "problemas": roda o verificador via sudo
+                # (como o antigo 'sudo debsums -s')
+                log("Executando a verificação via sudo (arquivos de pacotes exigem root)...")
+                lines = verificar_com_sudo()
+            else:
+                log(f"{RED}Execute como root: sem privilégios os arquivos ilegíveis seriam reportados como divergentes.{NC}")
+                pause()
+                return
+            problems = 0
+            for line in lines:
+                if problems == 0:
+                    log("Verificações de integridade encontraram problemas (listados abaixo):")
+                print(line, flush=True)
+                problems += 1
+            if problems == 0:
+                log(f"{GREEN}✅ Verificações concluídas (sem erros relatados).{NC}")
         else:
-            log(f"{GREEN}✅ Verificações concluídas (sem erros relatados).{NC}")
+            log("Banco do dpkg não encontrado — verificação de pacotes indisponível neste sistema.")
     elif is_windows():
         # System File Checker (SFC)
         log("Executando 'sfc /scannow' (pode pedir privilégios de administrador).")
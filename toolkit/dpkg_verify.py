@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ShadowSec Toolkit — verificador nativo de integridade de pacotes (substituto do debsums)
+
+Autor: Luciano Valadão
+
+Objetivo:
+Ler /var/lib/dpkg/info/*.md5sums e conferir os arquivos instalados em um pool de
+threads (um worker por núcleo; o hashlib libera o GIL nos blocos de 1 MiB). Arquivos
+cuja tupla de stat não mudou desde a última verificação são pulados via cache SQLite. Divergências são produzidas à medida que
+aparecem, no mesmo formato texto do `debsums -s` / `debsums -c`.
+
+Usado por:
+- modules/ShadowSec_Rootkit_Scan/rtk.py  (check_debsums)
+- modules/syscheckup/sc.py               (integridade_sistema)
+
+Uso isolado:
+    sudo python3 -m toolkit.dpkg_verify        # saída estilo `debsums -s`
+    sudo python3 -m toolkit.dpkg_verify -c     # saída estilo `debsums -c`
+"""
+import os
+import glob
+import hashlib
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+DPKG_INFO = "/var/lib/dpkg/info"
+DIVERSIONS = "/var/lib/dpkg/diversions"
+CHUNK = 256  # arquivos por tarefa enviada ao pool
+
+CACHE_PATHS = [
+    "/var/cache/shadowsec/dpkg_verify.db",
+    os.path.join(os.path.expanduser("~"), ".cache", "shadowsec", "dpkg_verify.db"),
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS verified (
+    path     TEXT PRIMARY KEY,
+    ino      INTEGER NOT NULL,
+    size     INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    ctime_ns INTEGER NOT NULL,
+    md5      TEXT NOT NULL,
+    ok       INTEGER NOT NULL
+)
+"""
+
+
+# ========================= LEITURA DO BANCO DPKG =========================
+def read_diversions(path=DIVERSIONS):
+    """{caminho_original: (caminho_desviado, pacote_que_desviou)}"""
+    out = {}
+    try:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return out
+    for i in range(0, len(lines) - 2, 3):
+        out[lines[i]] = (lines[i + 1], lines[i + 2])
+    return out
+
+
+def iter_md5sums(info_dir=DPKG_INFO):
+    """Produz (pacote, caminho_absoluto, md5_esperado) para todos os pacotes."""
+    diversions = read_diversions()
+    for md5file in sorted(glob.glob(os.path.join(info_dir, "*.md5sums"))):
+        pkg = os.path.basename(md5file)[:-len(".md5sums")].split(":", 1)[0]
+        try:
+            with open(md5file, encoding="utf-8", errors="surrogateescape") as f:
+                for line in f:
+                    digest, sep, rel = line.rstrip("\n").partition("  ")
+                    if not sep:
+                        continue
+                    path = "/" + rel.lstrip("/")
+                    div = diversions.get(path)
+                    if div and div[1] != pkg:
+                        path = div[0]  # arquivo do pacote foi movido por dpkg-divert
+                    yield pkg, path, digest.lower()
+        except OSError:
+            continue
+
+
+def open_cache(path=None):
+    for p in ([path] if path else CACHE_PATHS):
+        try:
+            os.makedirs(os.path.dirname(p) or ".", exist_ok=True)
+            conn = sqlite3.connect(p)
+            conn.execute(SCHEMA)
+            return conn
+        except (OSError, sqlite3.Error):
+            continue
+    return None
+
+
+# ========================= WORKER =========================
+def _md5_file(path):
+    h = hashlib.md5()
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            block = f.read(1024 * 1024)
+            if not block:
+                break
+            h.update(block)
+    return h.hexdigest()
+
+
+def _verify_chunk(items):
+    """items: [(pkg, path, md5, statkey)] → [(status, pkg, path, md5, statkey, erro)]"""
+    out = []
+    for pkg, path, expected, key in items:
+        detail = None
+        try:
+            status = "ok" if _md5_file(path) == expected else "changed"
+        except FileNotFoundError:
+            status = "missing"
+        except OSError as e:
+            status, detail = "error", e.strerror or str(e)
+        out.append((status, pkg, path, expected, key, detail))
+    return out
+
+
+# ========================= VERIFICAÇÃO =========================
+def verify_packages(info_dir=DPKG_INFO, workers=None, cache_path=None, use_cache=True):
+    """
+    Gerador de divergências: produz (status, pacote, caminho, erro) com status
+    'changed', 'missing' ou 'error', conforme vão sendo encontradas; erro é o strerror
+    do OSError real (só para 'error', senão None).
+    Threads, não processos: um fork dentro do escalonador do rtk.py (outros threads e o
+    proxy de stdout segurando locks) pode travar os filhos.
+    """
+    conn = open_cache(cache_path) if use_cache else None
+    cached = {}
+    if conn is not None:
+        cached = {r[0]: r[1:] for r in conn.execute(
+            "SELECT path, ino, size, mtime_ns, ctime_ns, md5, ok FROM verified")}
+
+    todo = []
+    for pkg, path, expected in iter_md5sums(info_dir):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            yield "missing", pkg, path, None
+            continue
+        except OSError as e:
+            yield "error", pkg, path, e.strerror or str(e)
+            continue
+        key = (st.st_ino, st.st_size, st.st_mtime_ns, st.st_ctime_ns)
+        hit = cached.get(path)
+        if hit is not None and tuple(hit[:4]) == key and hit[4] == expected:
+            if not hit[5]:
+                yield "changed", pkg, path, None
+            continue
+        todo.append((pkg, path, expected, key))
+
+    rows = []
+    try:
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+            futures = [pool.submit(_verify_chunk, todo[i:i + CHUNK]) for i in range(0, len(todo), CHUNK)]
+            for fut in as_completed(futures):
+                for status, pkg, path, expected, key, detail in fut.result():
+                    if status in ("ok", "changed"):
+                        rows.append((path, *key, expected, int(status == "ok")))
+                    if status != "ok":
+                        yield status, pkg, path, detail
+    finally:
+        if conn is not None:
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO verified VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            conn.close()
+
+
+def format_debsums(status, pkg, path, detail=None, changed_only=False):
+    """
+    Linha no formato do debsums:
+    - changed_only=False → `debsums -s`:  "debsums: changed file /x (from pkg package)"
+    - changed_only=True  → `debsums -c`:  "/x"  (arquivos ausentes/erros não entram)
+    """
+    if changed_only:
+        return path if status == "changed" else None
+    if status == "error":
+        return f"debsums: can't open {pkg} file {path} ({detail or 'erro desconhecido'})"
+    return f"debsums: {status} file {path} (from {pkg} package)"
+
+
+if __name__ == "__main__":
+    import sys
+    changed_only = "-c" in sys.argv[1:]
+    for res in verify_packages():
+        line = format_debsums(*res, changed_only=changed_only)
+        if line:
+            print(line, flush=True)